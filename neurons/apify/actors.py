@@ -18,8 +18,10 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import os
+import time
 import logging
 from apify_client import ApifyClient, ApifyClientAsync
+from neurons import metrics
 
 # Set up logger for the script
 logger = logging.getLogger(__name__)
@@ -27,6 +29,21 @@ logger = logging.getLogger(__name__)
 from dotenv import load_dotenv
 
 load_dotenv()
+
+ACTOR_SECONDS = metrics.histogram('apify_actor_seconds', "Wall time of an actor run including the dataset fetch.", ['actor_id', 'status'])
+ACTOR_ITEMS = metrics.counter('apify_actor_items_total', "Dataset items fetched from actor runs.", ['actor_id'])
+ACTOR_RUNS_IN_FLIGHT = metrics.gauge('apify_actor_runs_in_flight', "Actor runs started and not finished yet.", ['actor_id'])
+
+
+def observe_actor_run(actor_id: str, seconds: float, items: int = 0, status: str = 'ok'):
+    """
+    Records one finished actor run. Callers that run actors in a child process report the run here from the parent,
+    since the child's registry is not the one served.
+    """
+    ACTOR_SECONDS.observe(seconds, actor_id=actor_id, status=status)
+    ACTOR_ITEMS.inc(items, actor_id=actor_id)
+
+
 class ActorConfig:
     """
     Configuration class for actors in Apify.
@@ -41,6 +58,8 @@ class ActorConfig:
         # self.api_key = os.environ.get('APIFY_API_KEY')  # Get the Apify API key from environment variable
         self.api_key = os.getenv("APIFY_API_KEY")
         self.actor_id = actor_id  # Actor ID
+        # Base url of the Apify API, e.g. a local neurons.benchmarks.fake_apify server. None uses api.apify.com.
+        self.api_url = os.getenv("APIFY_API_URL") or None
         self.timeout_secs = 45
         self.memory_mbytes = 1024 
 
@@ -58,17 +77,26 @@ def run_actor(actor_config: ActorConfig, run_input: dict, default_dataset_id: st
         list[dict]: List of items fetched from the dataset.
     """
     # Initialize the Apify client with the API key
-    client = ApifyClient(actor_config.api_key)
+    client = ApifyClient(actor_config.api_key, api_url=actor_config.api_url)
     logger.info(f"Running actor: {actor_config.actor_id}")
     
-     # Start the actor run
-    run = client.actor(actor_config.actor_id).call(run_input=run_input, 
-                                                   timeout_secs=actor_config.timeout_secs, 
-                                                   memory_mbytes=actor_config.memory_mbytes)
-    logger.info(f"Actor run: {run}")
-
-    # Fetch data items from the specified dataset
-    data_set = [item for item in client.dataset(run[default_dataset_id]).iterate_items()]
+    start = time.perf_counter()
+    ACTOR_RUNS_IN_FLIGHT.inc(actor_id=actor_config.actor_id)
+    try:
+        # Start the actor run
+        run = client.actor(actor_config.actor_id).call(run_input=run_input, 
+                                                       timeout_secs=actor_config.timeout_secs, 
+                                                       memory_mbytes=actor_config.memory_mbytes)
+        logger.info(f"Actor run: {run}")
+
+        # Fetch data items from the specified dataset
+        data_set = [item for item in client.dataset(run[default_dataset_id]).iterate_items()]
+    except Exception:
+        observe_actor_run(actor_config.actor_id, time.perf_counter() - start, status='error')
+        raise
+    finally:
+        ACTOR_RUNS_IN_FLIGHT.inc(-1, actor_id=actor_config.actor_id)
+    observe_actor_run(actor_config.actor_id, time.perf_counter() - start, len(data_set))
 
     logger.info(f"Fetched {len(data_set)} items from dataset")
     return data_set
@@ -86,19 +114,28 @@ async def run_actor_async(actor_config: ActorConfig, run_input: dict, default_da
         list[dict]: List of items fetched from the dataset.
     """
     # Initialize the Apify client with the API key
-    client = ApifyClientAsync(actor_config.api_key)
+    client = ApifyClientAsync(actor_config.api_key, api_url=actor_config.api_url)
     logger.info(f"Running actor: {actor_config.actor_id}")
-    run = await client.actor(actor_config.actor_id).call(run_input=run_input, timeout_secs=actor_config.timeout_secs, memory_mbytes=actor_config.memory_mbytes)  # Start the actor run
-    logger.info(f"Actor run: {run}")
-
-    # Fetch data items from the specified dataset
-    dataset = client.dataset(run[default_dataset_id])
-    items = dataset.iterate_items()
-
-    fetched_items = []
-
-    async for item in items:
-        fetched_items.append(item)
+    start = time.perf_counter()
+    ACTOR_RUNS_IN_FLIGHT.inc(actor_id=actor_config.actor_id)
+    try:
+        run = await client.actor(actor_config.actor_id).call(run_input=run_input, timeout_secs=actor_config.timeout_secs, memory_mbytes=actor_config.memory_mbytes)  # Start the actor run
+        logger.info(f"Actor run: {run}")
+
+        # Fetch data items from the specified dataset
+        dataset = client.dataset(run[default_dataset_id])
+        items = dataset.iterate_items()
+
+        fetched_items = []
+
+        async for item in items:
+            fetched_items.append(item)
+    except Exception:
+        observe_actor_run(actor_config.actor_id, time.perf_counter() - start, status='error')
+        raise
+    finally:
+        ACTOR_RUNS_IN_FLIGHT.inc(-1, actor_id=actor_config.actor_id)
+    observe_actor_run(actor_config.actor_id, time.perf_counter() - start, len(fetched_items))
 
     logger.info(f"Fetched {len(fetched_items)} items from dataset")
     return fetched_items
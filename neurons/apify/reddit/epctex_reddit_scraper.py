@@ -1,5 +1,6 @@
 import logging
 from neurons.apify.actors import run_actor, ActorConfig
+from neurons import timestamps
 from datetime import datetime
 
 # Setting up logger for debugging and information purposes
@@ -111,7 +112,7 @@ class EpctexRedditScraper:
              'text': item['text'], 
              'likes': item['score'], 
              'dataType': item['type'], 
-             'timestamp': datetime.utcfromtimestamp(item['createdAt']).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+             'timestamp': timestamps.format_iso_timestamp(item['createdAt'])
              } for item in input]
         return filtered_input
 
@@ -2,9 +2,12 @@ from datetime import datetime, timedelta, timezone
 import time
 import logging
 import traceback
-from neurons.apify.actors import run_actor, ActorConfig
+from neurons.apify.actors import run_actor, ActorConfig, observe_actor_run, ACTOR_RUNS_IN_FLIGHT
+from neurons import timestamps
+from neurons.relevance import RelevanceMatcher
 #import neurons.score.reddit_score 
 import multiprocessing
+import threading
 import xml.etree.ElementTree
 
 from io import StringIO
@@ -41,6 +44,9 @@ class TrudaxRedditScraper:
         Initialize the RedditScraperLite.
         """
         self.actor_config = ActorConfig("4YJmyaThjcRuUvQZg")
+        # One manager server process for the lifetime of the scraper, each Manager() call starts a new one.
+        self.manager = None
+        self.manager_lock = threading.Lock()
         self.timeout_secs = 60
         self.memory_mbytes = 32768 
         
@@ -123,7 +129,10 @@ class TrudaxRedditScraper:
             return ()
 
         # Launch 3 request in parallel
-        results_queue = multiprocessing.Manager().Queue() 
+        with self.manager_lock:
+            if self.manager is None:
+                self.manager = multiprocessing.Manager()
+        results_queue = self.manager.Queue()
         fourth_process = multiprocessing.Process(target=fourth_request, args=[run_input.copy(), results_queue])
         first_process = multiprocessing.Process(target=first_request, args=[run_input.copy(), results_queue])
         second_process = multiprocessing.Process(target=second_request, args=[run_input.copy(), results_queue])
@@ -135,6 +144,9 @@ class TrudaxRedditScraper:
         fourth_process.start()
 
         # Get results of the requests
+        # The runs happen in the child processes, so their metrics are recorded here as the results arrive.
+        actor_id = self.actor_config.actor_id
+        ACTOR_RUNS_IN_FLIGHT.inc(4, actor_id=actor_id)
         results = {}
         start_time = datetime.now()
         while (len(results) != 4) and ((datetime.now() - start_time ) < timedelta(seconds=65)):
@@ -142,7 +154,18 @@ class TrudaxRedditScraper:
                 while (results_queue.qsize() > 0):
                     message = results_queue.get()
                     results[message[0]] = message[1]
+                    ACTOR_RUNS_IN_FLIGHT.inc(-1, actor_id=actor_id)
+                    observe_actor_run(actor_id, (datetime.now() - start_time).total_seconds(), len(message[1]))
             time.sleep(1)
+        for _ in range(4 - len(results)):
+            ACTOR_RUNS_IN_FLIGHT.inc(-1, actor_id=actor_id)
+            observe_actor_run(actor_id, (datetime.now() - start_time).total_seconds(), status='timeout')
+
+        # Runs that missed the deadline would otherwise keep their process and actor results around.
+        for process in (first_process, second_process, third_process, fourth_process):
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
 
         # Check results
         #starting_point = ""
@@ -175,6 +198,9 @@ class TrudaxRedditScraper:
                     
         # Sort the message by their age
         sorted_message = sorted(starting_list, key=lambda message: message['age_in_seconds'])
+        # Relevance of each message, computed once for the selection passes below.
+        relevance = RelevanceMatcher([first_search])
+        relevant = [relevance.matches(str(message['text']), str(message['title'])) for message in sorted_message]
         sorted_message_relevant = []
 
         # Compute an estimage max average age
@@ -197,7 +223,7 @@ class TrudaxRedditScraper:
             nb_message_to_send = i + 1
 
             # Check if the message is relevant
-            if (first_search.lower() in str(message_to_check['text']).lower()) or (first_search.lower() in str(message_to_check['title']).lower()):
+            if relevant[i]:
                 relevant_count += 1
                 age_sum_relevant +=  message_to_check['age_in_seconds']
 
@@ -226,7 +252,7 @@ class TrudaxRedditScraper:
                 sorted_message[0]['contribution_all'] = sorted_message[0]['score_messages_all']
 
             # Compute final score if we are in a relevant message
-            if (first_search.lower() in str(message_to_check['text']).lower()) or (first_search.lower() in str(message_to_check['title']).lower()):
+            if relevant[i]:
                 relevant_message = message_to_check.copy()
                 relevant_message['score_messages_relevant'] = relevancy_contribution_relevant + length_contribution_relevant + age_contribution_relevant
                 if (len(sorted_message_relevant) > 0):
@@ -263,7 +289,7 @@ class TrudaxRedditScraper:
             if (sorted_message[ab]['contribution_all'] > 0):
                 contribution_all.append(sorted_message[ab])
                 age_sum_contribution_all += sorted_message[ab]['age_in_seconds']
-                if (first_search.lower() in str(sorted_message[ab]['text']).lower()) or (first_search.lower() in str(sorted_message[ab]['title']).lower()):
+                if relevant[ab]:
                     contribution_relevant_count += 1
                     
         # Then compute the score of those 2 new groups
@@ -330,15 +356,13 @@ class TrudaxRedditScraper:
 
         
         filtered_input = []
+        now = time.time()
         for item in input:
             try:
                 #print(item['content'])
-                original_string = item['created_at']
-                datetime_obj = datetime.strptime(original_string, '%Y-%m-%dT%H:%M:%S.%f%z')
-                formatted_date = datetime_obj.strftime('%Y-%m-%dT%H:%M:%S')
-                milliseconds = datetime_obj.strftime('%f')[:3]  
-                corrected_output_with_milliseconds = f"{formatted_date}.{milliseconds}Z"
-                age_in_seconds = (datetime.now(timezone.utc) - datetime_obj).total_seconds()
+                created_at = timestamps.parse_offset_timestamp(item['created_at'])
+                corrected_output_with_milliseconds = timestamps.format_iso_timestamp(created_at)
+                age_in_seconds = now - created_at
                 
                 filtered_input.append({
                     'id': item['id'], 
@@ -1,5 +1,6 @@
 import logging
 from neurons.apify.actors import run_actor, run_actor_async, ActorConfig
+from neurons import timestamps
 from datetime import datetime, timezone
 import asyncio
 
@@ -84,8 +85,6 @@ class MicroworldsTwitterScraper:
                 images.append(media_urls[media_key])
 
 
-        date_format = "%a %b %d %H:%M:%S %z %Y"
-        parsed_date = datetime.strptime(item["created_at"], date_format)
 
         return {
             'id': item['id_str'], 
@@ -95,7 +94,7 @@ class MicroworldsTwitterScraper:
             'images': images, 
             'username': item['user']['screen_name'],
             'hashtags': hashtags,
-            'timestamp': self.format_date(parsed_date)
+            'timestamp': timestamps.format_twitter_timestamp(timestamps.parse_twitter_created_at(item["created_at"]))
         } 
 
     def map(self, input: list) -> list:
@@ -1,7 +1,11 @@
 import logging
 from neurons.apify.actors import run_actor, run_actor_async, ActorConfig
+from neurons import timestamps
+from neurons.relevance import RelevanceMatcher
 from datetime import datetime, timezone, timedelta
 import asyncio
+import time
+from collections import deque
 
 # Setting up logger for debugging and information purposes
 logger = logging.getLogger(__name__)
@@ -23,7 +27,8 @@ class TwitterScraperV2:
         self.actor_config.memory_mbytes = 512
         self.actor_config.timeout_secs = 90
 
-        self.keywords_past = []
+        # Recent searches only, the miner runs for weeks.
+        self.keywords_past = deque(maxlen=1000)
 
     
     async def searchSingleUrl(self, url: str, max_tweets: int):
@@ -83,7 +88,7 @@ class TwitterScraperV2:
         self.first_search = search_queries[0]
 
         self.keywords_past.append(search_queries)
-        print(self.keywords_past)
+        logger.debug(f"Searching {search_queries}, {len(self.keywords_past)} recent searches")
         
         return self.map(run_actor(self.actor_config, run_input))
     
@@ -92,7 +97,7 @@ class TwitterScraperV2:
         return date.isoformat(sep=' ', timespec='seconds')
 
     
-    def map_item(self, item) -> dict:
+    def map_item(self, item, now: float = None) -> dict:
         hashtags = ["#" + x["text"] for x in item.get("entities", {}).get('hashtags', [])]
 
         images = []
@@ -107,10 +112,8 @@ class TwitterScraperV2:
                 images.append(media_urls[media_key])
 
 
-        date_format = "%a %b %d %H:%M:%S %z %Y"
-        parsed_date = datetime.strptime(item["createdAt"], date_format)
-        
-        age_in_seconds = (datetime.now(timezone.utc) - parsed_date).total_seconds()
+        created_at = timestamps.parse_twitter_created_at(item["createdAt"])
+        age_in_seconds = (now if now is not None else time.time()) - created_at
         return {
             'id': item['id'], 
             'url': item['twitterUrl'], 
@@ -120,7 +123,7 @@ class TwitterScraperV2:
             'images': images, 
             'username': item['author']['userName'],
             'hashtags': hashtags,
-            'timestamp': self.format_date(parsed_date),
+            'timestamp': timestamps.format_twitter_timestamp(created_at),
             'age_in_seconds': age_in_seconds
         } 
 
@@ -137,11 +140,15 @@ class TwitterScraperV2:
         filtered_input = []
         first_search = self.first_search
         print("NUMBER OF ORIGINAL TWEETS " + str(len(input))) 
+        now = time.time()
         for item in input:
-            filtered_input.append(self.map_item(item))
+            filtered_input.append(self.map_item(item, now))
 
         # Sort the message by their age
         sorted_message = sorted(filtered_input, key=lambda message: message['age_in_seconds'])
+        # Relevance of each message, computed once for the selection passes below.
+        relevance = RelevanceMatcher([first_search])
+        relevant = [relevance.matches(str(message['text']), str(message['title'])) for message in sorted_message]
         sorted_message_relevant = []
 
         # Compute an estimage max average age
@@ -164,7 +171,7 @@ class TwitterScraperV2:
             nb_message_to_send = i + 1
 
             # Check if the message is relevant
-            if (first_search.lower() in str(message_to_check['text']).lower()) or (first_search.lower() in str(message_to_check['title']).lower()):
+            if relevant[i]:
                 relevant_count += 1
                 age_sum_relevant +=  message_to_check['age_in_seconds']
 
@@ -193,7 +200,7 @@ class TwitterScraperV2:
                 sorted_message[0]['contribution_all'] = sorted_message[0]['score_messages_all']
 
             # Compute final score if we are in a relevant message
-            if (first_search.lower() in str(message_to_check['text']).lower()) or (first_search.lower() in str(message_to_check['title']).lower()):
+            if relevant[i]:
                 relevant_message = message_to_check.copy()
                 relevant_message['score_messages_relevant'] = relevancy_contribution_relevant + length_contribution_relevant + age_contribution_relevant
                 if (len(sorted_message_relevant) > 0):
@@ -230,7 +237,7 @@ class TwitterScraperV2:
             if (sorted_message[ab]['contribution_all'] > 0):
                 contribution_all.append(sorted_message[ab])
                 age_sum_contribution_all += sorted_message[ab]['age_in_seconds']
-                if (first_search.lower() in str(sorted_message[ab]['text']).lower()) or (first_search.lower() in str(sorted_message[ab]['title']).lower()):
+                if relevant[ab]:
                     contribution_relevant_count += 1
                     
         # Then compute the score of those 2 new groups
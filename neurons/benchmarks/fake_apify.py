@@ -0,0 +1,406 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# A local stand-in for the subset of the Apify API used by apify.actors.run_actor/run_actor_async:
+# starting an actor run, polling its status and paging through its dataset.
+#
+# Runs take a latency drawn from a configurable distribution, can fail, and return either fixture
+# datasets ({actor_id}.json in --fixtures_dir) or items generated in the raw format of the actor.
+#
+# Usage:
+#   python -m neurons.benchmarks.fake_apify --port 8010 --latency lognormal:2,0.5 --failure_rate 0.05
+#   APIFY_API_URL=http://127.0.0.1:8010 python neurons/miner.py ...
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from neurons.benchmarks.synthetic import twitter_item, reddit_item
+
+TWITTER_DATE_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+
+
+def parse_latency(spec):
+    """
+    Parses a latency distribution into a function of a random.Random returning seconds.
+
+    Accepts a number of seconds or "fixed:s", "uniform:low,high", "normal:mean,stddev" and
+    "lognormal:median,sigma". Negative samples are clamped to 0.
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, _, params = str(spec).partition(':')
+    if params == '':
+        value = float(kind)
+        return lambda rng: value
+    args = [float(x) for x in params.split(',')]
+    if kind == 'fixed':
+        return lambda rng: args[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _search_term(run_input: dict) -> str:
+    for key in ('searchTerms', 'queries', 'searchQueries', 'searches'):
+        if run_input.get(key):
+            return str(run_input[key][0]).split(' ')[0]
+    return str(run_input.get('query') or run_input.get('search') or 'bittensor').split(' ')[0]
+
+
+def _url_tweet(url: str) -> dict:
+    parts = urlparse(url).path.strip('/').split('/')
+    return {'username': parts[0], 'id': parts[-1]} if len(parts) >= 3 else None
+
+
+def _raw_tweet_scraper_v2(rng, run_input, now):
+    # 61RPP7dywgiy0JPD0, see TwitterScraperV2.map_item
+    items = []
+    for _ in range(int(run_input.get('maxItems') or run_input.get('maxTweets') or 20)):
+        tweet = twitter_item(rng, _search_term(run_input), now)
+        created = datetime.strptime(tweet['timestamp'], '%Y-%m-%d %H:%M:%S+00:00').replace(tzinfo=timezone.utc)
+        items.append({
+            'type': 'tweet',
+            'id': tweet['id'],
+            'url': tweet['url'].replace('twitter.com', 'x.com'),
+            'twitterUrl': tweet['url'],
+            'text': tweet['text'],
+            'likeCount': tweet['likes'],
+            'author': {'userName': tweet['username']},
+            'entities': {'hashtags': [{'text': tag[1:]} for tag in tweet['hashtags']]},
+            'createdAt': created.strftime(TWITTER_DATE_FORMAT),
+        })
+    return items
+
+
+def _raw_microworlds(rng, run_input, now):
+    # heLL6fUofdPgRXZie, see MicroworldsTwitterScraper.map_item. Url lookups echo the requested tweet ids.
+    requested = [_url_tweet(url) for url in run_input.get('urls', [])]
+    count = len(requested) if requested else int(run_input.get('maxTweets') or 20)
+    items = []
+    for i in range(count):
+        tweet = twitter_item(rng, _search_term(run_input), now)
+        if requested and requested[i]:
+            tweet.update(requested[i])
+            tweet['url'] = run_input['urls'][i]
+        created = datetime.strptime(tweet['timestamp'], '%Y-%m-%d %H:%M:%S+00:00').replace(tzinfo=timezone.utc)
+        items.append({
+            'id_str': tweet['id'],
+            'url': tweet['url'],
+            'full_text': tweet['text'],
+            'favorite_count': tweet['likes'],
+            'user': {'screen_name': tweet['username']},
+            'entities': {'hashtags': [{'text': tag[1:]} for tag in tweet['hashtags']]},
+            'created_at': created.strftime(TWITTER_DATE_FORMAT),
+        })
+    return items
+
+
+def _raw_trudax_reddit(rng, run_input, now):
+    # 4YJmyaThjcRuUvQZg, see TrudaxRedditScraper.map
+    items = []
+    for _ in range(int(run_input.get('limit') or 20)):
+        post = reddit_item(rng, _search_term(run_input), now)
+        created = datetime.strptime(post['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
+        items.append({
+            'id': post['id'],
+            'url': post['url'],
+            'title': post['title'],
+            'content': {'markdown': post['text']},
+            'language': 'en',
+            'counter': {'upvote': post['likes']},
+            'subreddit': {'name': post['community'][2:]},
+            'author': {'name': post['username']},
+            'created_at': created.strftime('%Y-%m-%dT%H:%M:%S.%f%z'),
+        })
+    return items
+
+
+def _raw_epctex_reddit(rng, run_input, now):
+    # jwR5FKaWaGSmkeq2b, see EpctexRedditScraper.map
+    items = []
+    for _ in range(int(run_input.get('maxItems') or 20)):
+        post = reddit_item(rng, _search_term(run_input), now)
+        created = datetime.strptime(post['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
+        items.append({
+            'id': post['id'],
+            'url': post['url'],
+            'title': post['title'],
+            'text': post['text'],
+            'score': post['likes'],
+            'type': post['dataType'],
+            'createdAt': created.timestamp(),
+            'comments': [],
+        })
+    return items
+
+
+GENERATORS = {
+    '61RPP7dywgiy0JPD0': _raw_tweet_scraper_v2,
+    'heLL6fUofdPgRXZie': _raw_microworlds,
+    '4YJmyaThjcRuUvQZg': _raw_trudax_reddit,
+    'jwR5FKaWaGSmkeq2b': _raw_epctex_reddit,
+}
+
+
+class FakeApifyServer:
+    """
+    Serves GET /v2/acts, POST /v2/acts/{actor}/runs (or /v2/actors/...), GET /v2/actor-runs/{run} and GET /v2/datasets/{dataset}/items.
+
+    Point `apify.actors.ActorConfig` at it with APIFY_API_URL, or pass `server.url` as `api_url`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency="0", failure_rate: float = 0.0,
+                 error_rate: float = 0.0, fixtures: dict = None, actors: dict = None, seed: int = None):
+        """
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port to listen on, 0 picks a free one.
+            latency: How long each run takes, see parse_latency.
+            failure_rate (float): Fraction of runs that end FAILED with an empty dataset.
+            error_rate (float): Fraction of API requests answered with a 500 (the client retries them).
+            fixtures (dict): Items returned by every run, per actor id. Actors without fixtures get generated items.
+            actors (dict): Per actor id overrides of "latency" and "failure_rate".
+            seed (int): Seed for latencies, failures and generated items.
+        """
+        self.latency = parse_latency(latency)
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.fixtures = fixtures or {}
+        self.actors = {actor_id: dict(overrides) for actor_id, overrides in (actors or {}).items()}
+        for overrides in self.actors.values():
+            if 'latency' in overrides:
+                overrides['latency'] = parse_latency(overrides['latency'])
+        self.rng = random.Random(seed)
+        self.runs = {}
+        self.datasets = {}
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_run(self, actor_id: str, run_input: dict, params: dict) -> dict:
+        overrides = self.actors.get(actor_id, {})
+        now = datetime.utcnow()
+        with self.lock:
+            duration = overrides.get('latency', self.latency)(self.rng)
+            failed = self.rng.random() < overrides.get('failure_rate', self.failure_rate)
+            item_seed = self.rng.random()
+        if failed:
+            items = []
+        elif actor_id in self.fixtures:
+            items = self.fixtures[actor_id]
+        elif actor_id in GENERATORS:
+            items = GENERATORS[actor_id](random.Random(item_seed), run_input, now)
+        else:
+            items = []
+        run_id = uuid.uuid4().hex[:17]
+        dataset_id = uuid.uuid4().hex[:17]
+        started = time.time()
+        run = {
+            'id': run_id,
+            'actId': actor_id,
+            'userId': 'fake',
+            'startedAt': now.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            'finishedAt': None,
+            'status': 'RUNNING',
+            'meta': {'origin': 'API'},
+            'options': {
+                'build': 'latest',
+                'timeoutSecs': int(params.get('timeout', 0) or 0),
+                'memoryMbytes': int(params.get('memory', 1024) or 1024),
+                'diskMbytes': 2048,
+            },
+            'buildId': 'fake',
+            'buildNumber': '0.0.1',
+            'defaultKeyValueStoreId': uuid.uuid4().hex[:17],
+            'defaultDatasetId': dataset_id,
+            'defaultRequestQueueId': uuid.uuid4().hex[:17],
+            'containerUrl': self.url,
+            'stats': {'computeUnits': 0},
+        }
+        with self.lock:
+            self.runs[run_id] = {'run': run, 'finish_at': started + duration, 'failed': failed}
+            self.datasets[dataset_id] = items
+        return self.get_run(run_id)
+
+    def get_run(self, run_id: str, wait: float = 0.0) -> dict:
+        with self.lock:
+            state = self.runs.get(run_id)
+        if state is None:
+            return None
+        remaining = state['finish_at'] - time.time()
+        if remaining > 0 and wait > 0:
+            time.sleep(min(remaining, wait))
+        with self.lock:
+            run = state['run']
+            if run['status'] == 'RUNNING' and time.time() >= state['finish_at']:
+                run['status'] = 'FAILED' if state['failed'] else 'SUCCEEDED'
+                run['finishedAt'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+            return dict(run)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body, headers: dict = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self):
+                return self._reply(404, {"error": {"type": "record-not-found", "message": "Not found"}})
+
+            def _failed_request(self) -> bool:
+                with server.lock:
+                    server.requests += 1
+                    if server.rng.random() < server.error_rate:
+                        server.errors += 1
+                        return True
+                return False
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                if self._failed_request():
+                    return self._reply(500, {"error": {"type": "internal-error", "message": "Injected failure"}})
+                parts = url.path.strip('/').split('/')
+                # Older clients call the collection 'acts', newer ones 'actors'.
+                if len(parts) != 4 or parts[0] != 'v2' or parts[1] not in ('acts', 'actors') or parts[3] != 'runs':
+                    return self._not_found()
+                run = server.start_run(parts[2], json.loads(body or b"{}"), params)
+                wait = float(params.get('waitForFinish', 0) or 0)
+                if wait > 0:
+                    run = server.get_run(run['id'], wait)
+                return self._reply(201, {"data": run})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if self._failed_request():
+                    return self._reply(500, {"error": {"type": "internal-error", "message": "Injected failure"}})
+                parts = url.path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'v2' and parts[1] in ('acts', 'actors'):
+                    actors = [{'id': actor_id, 'name': actor_id, 'username': 'fake', 'createdAt': '2023-01-01T00:00:00.000Z', 'modifiedAt': '2023-01-01T00:00:00.000Z'} for actor_id in sorted(set(GENERATORS) | set(server.fixtures))]
+                    return self._reply(200, {"data": {"total": len(actors), "offset": 0, "limit": 1000, "count": len(actors), "desc": False, "items": actors}})
+                if len(parts) == 3 and parts[:2] == ['v2', 'actor-runs']:
+                    run = server.get_run(parts[2], float(params.get('waitForFinish', 0) or 0))
+                    return self._reply(200, {"data": run}) if run else self._not_found()
+                if len(parts) == 4 and parts[:2] == ['v2', 'datasets'] and parts[3] == 'items':
+                    with server.lock:
+                        items = server.datasets.get(parts[2])
+                    if items is None:
+                        return self._not_found()
+                    desc = params.get('desc', '').lower() in ('1', 'true')
+                    ordered = list(reversed(items)) if desc else items
+                    offset = int(params.get('offset', 0) or 0)
+                    limit = int(params.get('limit', 0) or 0) or 999999999999
+                    page = ordered[offset:offset + limit]
+                    return self._reply(200, page, {
+                        'x-apify-pagination-total': len(items),
+                        'x-apify-pagination-offset': offset,
+                        'x-apify-pagination-limit': limit,
+                        'x-apify-pagination-count': len(page),
+                        'x-apify-pagination-desc': 'true' if desc else 'false',
+                    })
+                return self._not_found()
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-apify", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def load_fixtures(directory: str) -> dict:
+    """
+    Loads {actor_id}.json files holding a list of raw dataset items each.
+    """
+    fixtures = {}
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                fixtures[name[:-len('.json')]] = json.load(f)
+    return fixtures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Apify API.")
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--latency', type=str, default='0', help="Run duration: seconds, fixed:s, uniform:low,high, normal:mean,stddev or lognormal:median,sigma.")
+    parser.add_argument('--actor_latency', type=str, action='append', default=[], help="Per actor run duration as ACTOR_ID=DISTRIBUTION, repeatable.")
+    parser.add_argument('--failure_rate', type=float, default=0.0, help="Fraction of runs that end FAILED.")
+    parser.add_argument('--error_rate', type=float, default=0.0, help="Fraction of requests answered with a 500.")
+    parser.add_argument('--fixtures_dir', type=str, default=None, help="Directory of {actor_id}.json dataset fixtures.")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    actors = {}
+    for value in args.actor_latency:
+        actor_id, _, latency = value.partition('=')
+        actors[actor_id] = {'latency': latency}
+    server = FakeApifyServer(port=args.port, latency=args.latency, failure_rate=args.failure_rate, error_rate=args.error_rate,
+                             fixtures=load_fixtures(args.fixtures_dir) if args.fixtures_dir else None, actors=actors, seed=args.seed)
+    print(f"Fake Apify API listening on {server.url}, set APIFY_API_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Served {len(server.runs)} runs in {server.requests} requests ({server.errors} failed)")
@@ -0,0 +1,139 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# A local stand-in for the indexing API, for exercising storage.indexing.IndexingClient without the network.
+#
+# Usage:
+#   python -m neurons.benchmarks.fake_indexing --port 8000 --latency 0.05 --failure_rate 0.1
+#   INDEXING_API_URL=http://127.0.0.1:8000 python neurons/validator.py ...
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeIndexingServer:
+    """
+    Serves POST /addRow (one row) and POST /addRows ({"rows": [...]}) and keeps every received row in memory.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, failure_rate: float = 0.0,
+                 failure_status: int = 503, reject_files: set = ()):
+        """
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port to listen on, 0 picks a free one.
+            latency (float): Seconds to wait before answering each request.
+            failure_rate (float): Fraction of requests answered with failure_status.
+            failure_status (int): The status of failed requests, e.g. 401 for a rejected api key.
+            reject_files (set): File names whose rows are answered with a 422, like rows the API can't take.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.reject_files = set(reject_files)
+        self.rows = []
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.requests += 1
+                    if random.random() < server.failure_rate:
+                        server.failures += 1
+                        failed = True
+                    else:
+                        failed = False
+                if failed:
+                    return self._reply(server.failure_status, {"msg": "unavailable"})
+                if self.path == "/addRow":
+                    rows = [payload]
+                elif self.path == "/addRows":
+                    rows = payload.get("rows", [])
+                else:
+                    return self._reply(404, {"msg": "not found"})
+                if any(row.get("file_name") in server.reject_files for row in rows):
+                    return self._reply(422, {"msg": "invalid row"})
+                with server.lock:
+                    server.rows += [{k: v for k, v in row.items() if k != "api_key"} for row in rows]
+                return self._reply(200, {"msg": "ok", "count": len(rows)})
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-indexing", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the indexing API.")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before answering each request.")
+    parser.add_argument('--failure_rate', type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    args = parser.parse_args()
+    server = FakeIndexingServer(port=args.port, latency=args.latency, failure_rate=args.failure_rate)
+    print(f"Fake indexing API listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Received {len(server.rows)} rows in {server.requests} requests ({server.failures} failed)")
@@ -0,0 +1,147 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# A local stand-in for the percip.io reddit id lookup, for exercising services.PercipioRedditLookup without the network.
+#
+# Usage:
+#   python -m neurons.benchmarks.fake_percipio --port 8020 --items 2000 --latency 0.2 --failure_rate 0.1
+#   PERCIPIO_API_URL=http://127.0.0.1:8020 python neurons/validator.py ...
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+from neurons.benchmarks.synthetic import reddit_item
+
+
+class FakePercipioServer:
+    """
+    Serves GET /reddit_ids/<id>,<id>,... with the known items among the ids, like the percipio API.
+    """
+
+    def __init__(self, items: list = (), host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 failure_rate: float = 0.0, max_url_length: int = 8000):
+        """
+        Args:
+            items (list): The items lookups are answered from, keyed by id.
+            host (str): The interface to listen on.
+            port (int): The port to listen on, 0 picks a free one.
+            latency (float): Seconds to wait before answering each request.
+            failure_rate (float): Fraction of requests answered with a 503.
+            max_url_length (int): Longer request paths are answered with a 414, like a proxy in front of the API.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_url_length = max_url_length
+        self.items = {}
+        self.requests = 0
+        self.failures = 0
+        self.ids_requested = 0
+        self.lock = threading.Lock()
+        self.add(items)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def add(self, items: list):
+        with self.lock:
+            for item in items:
+                self.items.setdefault(item['id'], item)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.requests += 1
+                    failed = random.random() < server.failure_rate
+                    if failed:
+                        server.failures += 1
+                if failed:
+                    return self._reply(503, {"msg": "unavailable"})
+                if len(self.path) > server.max_url_length:
+                    return self._reply(414, {"msg": "uri too long"})
+                if not self.path.startswith("/reddit_ids/"):
+                    return self._reply(404, {"msg": "not found"})
+                ids = [unquote(id) for id in self.path[len("/reddit_ids/"):].split(',') if id]
+                with server.lock:
+                    server.ids_requested += len(ids)
+                    found = [server.items[id] for id in ids if id in server.items]
+                return self._reply(200, found)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-percipio", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the percip.io reddit id lookup.")
+    parser.add_argument('--port', type=int, default=8020)
+    parser.add_argument('--items', type=int, default=1000, help="Synthetic reddit items to serve, their ids are printed.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before answering each request.")
+    parser.add_argument('--failure_rate', type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    items = [reddit_item(rng, 'bitcoin', now, True) for _ in range(args.items)]
+    server = FakePercipioServer(items, port=args.port, latency=args.latency, failure_rate=args.failure_rate)
+    print(f"Fake percipio API listening on {server.url}, serving {len(items)} items, e.g. {', '.join(item['id'] for item in items[:3])}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Answered {server.requests} requests for {server.ids_requested} ids ({server.failures} failed)")
@@ -0,0 +1,417 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# End-to-end load generator: runs the real validator loop (validator.main) against a simulated miner fleet.
+#
+# The wallet, subtensor, metagraph and dendrite are replaced by in-process mocks; every uid is served by a
+# fake axon answering TwitterScrap/RedditScrap with synthetic items according to its honesty profile.
+# Spot check verification is answered from the items honest miners served, S3 is kept in memory and the
+# indexing and Apify APIs are local stand-ins. Everything from query to set_weights is the validator's own code.
+#
+# Usage:
+#   python -m neurons.benchmarks.fleet --fleet 64 128 256 --rounds 8 --time_scale 0.1
+#   python -m neurons.benchmarks.fleet --fleet 256 --profiles honest=0.6,fake=0.1,stale=0.1,copycat=0.1,slow=0.05,empty=0.05
+
+import argparse
+import asyncio
+import copy
+import importlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import torch
+import bittensor as bt
+from neurons.benchmarks.fake_apify import FakeApifyServer, parse_latency
+from neurons.benchmarks.fake_indexing import FakeIndexingServer
+from neurons.benchmarks.local_s3 import LocalS3Client
+from neurons.benchmarks.lookups import RecordedTwitterLookup, RecordedRedditLookup
+from neurons.benchmarks.synthetic import twitter_item, reddit_item
+from neurons.checkpoint import CheckpointStore
+from neurons.memory import current_rss
+
+NEURONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(NEURONS_DIR)
+
+PROFILES = ['honest', 'lazy', 'stale', 'fake', 'copycat', 'slow', 'empty']
+
+
+class FakeAxon:
+    """
+    A simulated miner. Answers scraping synapses with synthetic items according to its honesty profile:
+
+    honest: fresh, relevant, verifiable items.
+    lazy: a handful of honest items.
+    stale: honest items that are days old.
+    fake: items whose text was altered after scraping, so the spot check fails.
+    copycat: replays what other miners returned in earlier rounds.
+    slow: honest items, but answers after the query timeout.
+    empty: answers without data.
+    """
+
+    def __init__(self, uid: int, profile: str, fleet, latency, items: int, seed: int):
+        self.uid = uid
+        self.profile = profile
+        self.fleet = fleet
+        self.latency = latency
+        self.items = items
+        self.rng = random.Random(seed)
+        self.hotkey = f"5Fake{uid:04d}"
+        self.ip = f"10.0.{uid // 256}.{uid % 256}"
+        self.port = 8091
+        self.served = 0
+
+    @property
+    def axon_info(self):
+        return self
+
+    def sample_latency(self) -> float:
+        latency = self.latency(self.rng)
+        return latency + self.fleet.timeout if self.profile == 'slow' else latency
+
+    def respond(self, platform: str, search_key: str) -> list:
+        if self.profile == 'empty':
+            return None
+        if self.profile == 'copycat' and self.fleet.served[platform]:
+            return copy.deepcopy(self.rng.choice(self.fleet.served[platform]))
+        now = datetime.utcnow()
+        make_item = twitter_item if platform == 'twitter' else reddit_item
+        count = self.rng.randint(1, 3) if self.profile == 'lazy' else self.items
+        max_age = 7 * 24 * 3600 if self.profile == 'stale' else 6 * 3600
+        items = [make_item(self.rng, search_key, now, self.rng.random() < 0.9, max_age_seconds=max_age) for _ in range(count)]
+        self.fleet.verified(platform, items)
+        if self.profile == 'fake':
+            items = [dict(item, text=item['text'] + ' ' + search_key) for item in items]
+        self.fleet.served[platform].append(items)
+        return items
+
+
+class FakeDendrite:
+    """
+    Queries fake axons concurrently, like bt.dendrite.query: one deserialized response per axon, None for
+    axons that did not answer within the timeout. call() is the single request coroutine streaming queries
+    (--streaming_query) use; it answers with the same per-miner latency model.
+    """
+
+    def __init__(self, fleet, wallet=None):
+        self.fleet = fleet
+        self.executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='fake-axon')
+        self.in_flight = 0
+        self.round_start = None
+
+    def _call(self, axon: FakeAxon, synapse, timeout: float, deserialize: bool):
+        latency = axon.sample_latency()
+        time.sleep(min(latency, timeout) * self.fleet.time_scale)
+        if latency > timeout:
+            return None
+        response = copy.deepcopy(synapse)
+        platform = 'twitter' if type(synapse).__name__ == 'TwitterScrap' else 'reddit'
+        response.scrap_output = axon.respond(platform, synapse.scrap_input["search_key"][0])
+        axon.served += 1
+        return response.deserialize() if deserialize else response
+
+    async def call(self, target_axon: FakeAxon, synapse, timeout: float = 12, deserialize: bool = True):
+        # The single request coroutine used by streaming queries; the first call after all others finished starts a round.
+        if self.in_flight == 0:
+            self.fleet.round_started(type(synapse).__name__, 0)
+            self.round_start = time.perf_counter()
+            self.fleet.query_seconds.append(0.0)
+        self.fleet.round_starts[-1][3] += 1
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, target_axon, synapse, timeout, deserialize)
+        finally:
+            self.in_flight -= 1
+            # Requests cut off after the quorum are cancelled here too, so the query ends with the last of them.
+            self.fleet.query_seconds[-1] = time.perf_counter() - self.round_start
+
+    def query(self, axons, synapse, deserialize: bool = True, timeout: float = 12):
+        self.fleet.round_started(type(synapse).__name__, len(axons))
+        start = time.perf_counter()
+        responses = list(self.executor.map(lambda axon: self._call(axon, synapse, timeout, deserialize), axons))
+        self.fleet.query_seconds.append(time.perf_counter() - start)
+        return responses
+
+
+class MockMetagraph:
+    def __init__(self, fleet):
+        self.fleet = fleet
+        n = len(fleet.axons)
+        self.n = n
+        self.uids = torch.arange(n)
+        self.axons = fleet.axons
+        self.neurons = fleet.axons
+        self.hotkeys = [axon.hotkey for axon in fleet.axons]
+        self.S = torch.ones(n, dtype=torch.float32)
+        self.total_stake = self.S
+
+    def sync(self, subtensor=None, lite: bool = True):
+        pass
+
+
+class MockSubtensor:
+    """
+    A chain that advances `blocks_per_round` blocks every query round and accepts every set_weights.
+    """
+
+    def __init__(self, fleet, config=None):
+        self.fleet = fleet
+        self.metagraph_ = MockMetagraph(fleet)
+
+    @property
+    def block(self) -> int:
+        return self.fleet.block
+
+    def metagraph(self, netuid: int = 1, lite: bool = True):
+        return self.metagraph_
+
+    def min_allowed_weights(self, netuid: int) -> int:
+        return 1
+
+    def max_weight_limit(self, netuid: int) -> float:
+        return 1.0
+
+    def set_weights(self, netuid: int, wallet, uids, weights, **kwargs) -> bool:
+        self.fleet.weights.append((self.block, torch.as_tensor(uids).tolist(), torch.as_tensor(weights).tolist()))
+        return True
+
+
+class MockWallet:
+    def __init__(self, fleet, config=None):
+        self.hotkey = type('Keypair', (), {'ss58_address': fleet.axons[0].hotkey})()
+
+    def __str__(self):
+        return f"MockWallet({self.hotkey.ss58_address})"
+
+
+class Fleet:
+    """
+    The simulated network: uid 0 is the validator (no axon ip), the other uids are fake miners.
+    """
+
+    def __init__(self, size: int, profiles: dict, latency, items: int, timeout: float, time_scale: float,
+                 rounds: int, blocks_per_round: int = 20, seed: int = 0):
+        rng = random.Random(seed)
+        self.timeout = timeout
+        self.time_scale = time_scale
+        self.rounds = rounds
+        self.blocks_per_round = blocks_per_round
+        self.block = 1000
+        self.lock = threading.Lock()
+        self.served = {'twitter': [], 'reddit': []}
+        self.lookups = {'twitter': RecordedTwitterLookup([]), 'reddit': RecordedRedditLookup([])}
+        names, weights = zip(*profiles.items())
+        self.axons = []
+        for uid in range(size + 1):
+            profile = 'validator' if uid == 0 else rng.choices(names, weights)[0]
+            self.axons.append(FakeAxon(uid, profile, self, latency, items, seed * 100003 + uid))
+        self.axons[0].ip = '0.0.0.0'
+        self.round_starts = []
+        self.query_seconds = []
+        self.weights = []
+        self.rss = []
+
+    def verified(self, platform: str, items: list):
+        with self.lock:
+            self.lookups[platform].add(items)
+
+    def round_started(self, synapse_name: str, queried: int):
+        # The previous round (score, store, weights, save) ends where the next query starts.
+        self.round_starts.append([time.perf_counter(), time.process_time(), synapse_name, queried])
+        self.rss.append(current_rss())
+        if len(self.round_starts) > self.rounds:
+            raise KeyboardInterrupt()
+        self.block += self.blocks_per_round
+
+    def rounds_summary(self) -> list:
+        rounds = []
+        for (wall, cpu, name, queried), (next_wall, next_cpu, _, _) in zip(self.round_starts, self.round_starts[1:]):
+            rounds.append({"synapse": name, "queried": queried, "wall_s": next_wall - wall, "cpu_s": next_cpu - cpu})
+        return rounds
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def stage_summary(trace_file: str) -> dict:
+    """
+    Total and mean seconds per span name in a validator trace file.
+    """
+    stages = {}
+    if not os.path.exists(trace_file):
+        return stages
+    with open(trace_file) as f:
+        for line in f:
+            record = json.loads(line)
+            entry = stages.setdefault(record["name"], {"count": 0, "total_s": 0.0})
+            entry["count"] += 1
+            entry["total_s"] += record["duration_s"]
+    for entry in stages.values():
+        entry["mean_s"] = entry["total_s"] / entry["count"]
+    return stages
+
+
+def load_validator():
+    # validator.py is run as a script: its imports expect both the repository and neurons/ on the path.
+    for path in (REPO_DIR, NEURONS_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    return importlib.import_module('validator')
+
+
+def run_fleet(size: int, config, work_dir: str) -> dict:
+    validator = load_validator()
+    fleet = Fleet(size, config.profiles, parse_latency(config.latency), config.items, config.timeout,
+                  config.time_scale, config.rounds, seed=config.seed)
+
+    run_dir = os.path.join(work_dir, f"fleet_{size}")
+    os.makedirs(run_dir, exist_ok=True)
+    shutil.copy(os.path.join(NEURONS_DIR, 'keywords.txt'), os.path.join(run_dir, 'keywords.txt'))
+    argv = ['validator.py', '--netuid', '1', '--logging.logging_dir', run_dir, '--wallet.name', 'fleet', '--wallet.hotkey', 'fleet', '--metrics_port', '0']
+    if config.profile:
+        argv += ['--profile', str(config.profile), '--profile_mode', config.profile_mode]
+    if config.streaming_query:
+        argv += ['--streaming_query', '--query_quorum', str(config.query_quorum), '--query_grace', str(config.query_grace * config.time_scale)]
+
+    originals = (bt.wallet, bt.subtensor, bt.dendrite, bt.__blocktime__, sys.argv, os.getcwd(),
+                 validator.score.twitter_score.twitter_query, validator.score.reddit_score.reddit_query)
+    s3 = LocalS3Client()
+    validator.storage.store.use_client(s3)
+    validator.score.twitter_score.twitter_query = fleet.lookups['twitter']
+    validator.score.reddit_score.reddit_query = fleet.lookups['reddit']
+    try:
+        sys.argv = argv
+        validator_config = validator.get_config()
+        validator_config.auto_update = "no"
+        os.chdir(run_dir)
+        bt.wallet = lambda config=None: MockWallet(fleet, config)
+        bt.subtensor = lambda config=None: MockSubtensor(fleet, config)
+        bt.dendrite = lambda wallet=None: FakeDendrite(fleet, wallet)
+        bt.__blocktime__ = 0
+        start_cpu = time.process_time()
+        try:
+            validator.main(validator_config)
+        except SystemExit:
+            pass
+        cpu = time.process_time() - start_cpu
+        tensors, _ = CheckpointStore(os.path.join(validator_config.full_path, 'validator_state')).load()
+        scores = tensors['scores']
+    finally:
+        (bt.wallet, bt.subtensor, bt.dendrite, bt.__blocktime__, sys.argv, cwd,
+         validator.score.twitter_score.twitter_query, validator.score.reddit_score.reddit_query) = originals
+        os.chdir(cwd)
+        validator.storage.store.use_client(None)
+
+    stages = stage_summary(os.path.join(validator_config.full_path, 'traces.jsonl'))
+    rounds = fleet.rounds_summary()
+    walls = [r["wall_s"] for r in rounds]
+    by_profile = {}
+    for axon in fleet.axons[1:]:
+        entry = by_profile.setdefault(axon.profile, {"miners": 0, "score_sum": 0.0, "queried": 0})
+        entry["miners"] += 1
+        entry["queried"] += axon.served
+        entry["score_sum"] += float(scores[axon.uid])
+    return {
+        "fleet": size,
+        "rounds": len(rounds),
+        "round_p50_s": percentile(walls, 50),
+        "round_p90_s": percentile(walls, 90),
+        "round_p99_s": percentile(walls, 99),
+        "round_max_s": max(walls, default=0.0),
+        "query_p50_s": percentile(fleet.query_seconds, 50),
+        "query_max_s": max(fleet.query_seconds, default=0.0),
+        "cpu_s": cpu,
+        "cpu_per_round_s": sum(r["cpu_s"] for r in rounds) / max(1, len(rounds)),
+        "rss_start_mib": fleet.rss[0] / 2**20 if fleet.rss else 0.0,
+        "rss_end_mib": fleet.rss[-1] / 2**20 if fleet.rss else 0.0,
+        "weights_set": len(fleet.weights),
+        "objects_stored": s3.put_count,
+        "stages": stages,
+        "mean_score_by_profile": {profile: entry["score_sum"] / entry["miners"] for profile, entry in sorted(by_profile.items())},
+        "round_details": rounds,
+    }
+
+
+def parse_profiles(value: str) -> dict:
+    profiles = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in PROFILES:
+            raise argparse.ArgumentTypeError(f"Unknown profile {name}, expected one of {PROFILES}")
+        profiles[name] = float(weight or 1)
+    return profiles
+
+
+def get_config():
+    parser = argparse.ArgumentParser(description="Run the validator loop against a simulated miner fleet.")
+    parser.add_argument('--fleet', type=int, nargs='+', default=[64, 128, 256], help="Fleet sizes (miners) to run.")
+    parser.add_argument('--rounds', type=int, default=8, help="Query rounds per fleet size.")
+    parser.add_argument('--profiles', type=parse_profiles, default=parse_profiles('honest=0.7,lazy=0.05,stale=0.05,fake=0.05,copycat=0.05,slow=0.05,empty=0.05'),
+                        help="Honesty profile mix, e.g. honest=0.8,fake=0.2. Profiles: " + ', '.join(PROFILES))
+    parser.add_argument('--latency', type=str, default='lognormal:3,0.6', help="Miner response latency distribution, see fake_apify.parse_latency.")
+    parser.add_argument('--items', type=int, default=15, help="Items per honest response (payload size).")
+    parser.add_argument('--timeout', type=float, default=60, help="The validator's query timeout, slow miners answer after it.")
+    parser.add_argument('--time_scale', type=float, default=1.0, help="Multiplier on simulated network waits, < 1 runs faster than real time.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', type=int, default=0, help="Profile this many validator rounds, the profiles land in <work dir>/fleet_<size>/.../profiles.")
+    parser.add_argument('--profile_mode', type=str, default='sample', choices=['cprofile', 'sample', 'tracemalloc'])
+    parser.add_argument('--streaming_query', action='store_true', help="Run the validator with streaming queries.")
+    parser.add_argument('--query_quorum', type=float, default=0.8, help="The validator's streaming query quorum.")
+    parser.add_argument('--query_grace', type=float, default=5, help="The validator's streaming query grace seconds (simulated time).")
+    parser.add_argument('--output', type=str, default=None, help="Write the results as json.")
+    return parser.parse_args()
+
+
+def main(config):
+    work_dir = tempfile.mkdtemp(prefix='fleet_')
+    results = []
+    with FakeIndexingServer() as indexing_server, FakeApifyServer() as apify_server:
+        os.environ['INDEXING_API_URL'] = indexing_server.url
+        os.environ['APIFY_API_URL'] = apify_server.url
+        for size in config.fleet:
+            results.append(run_fleet(size, config, work_dir))
+
+    print(f"{'fleet':>6} {'rounds':>6} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'max s':>8} {'cpu/rnd s':>10} {'rss MiB':>9} {'weights':>8}")
+    for r in results:
+        print(f"{r['fleet']:>6} {r['rounds']:>6} {r['round_p50_s']:>8.2f} {r['round_p90_s']:>8.2f} {r['round_p99_s']:>8.2f} {r['round_max_s']:>8.2f} "
+              f"{r['cpu_per_round_s']:>10.3f} {r['rss_end_mib']:>9.1f} {r['weights_set']:>8}")
+    for r in results:
+        stages = ', '.join(f"{name}={entry['mean_s'] * 1000:.1f}ms" for name, entry in sorted(r["stages"].items(), key=lambda kv: -kv[1]["total_s"]))
+        print(f"fleet {r['fleet']} mean stage time: {stages}")
+    for r in results:
+        scores = ', '.join(f"{profile}={score:.3f}" for profile, score in r["mean_score_by_profile"].items())
+        print(f"fleet {r['fleet']} mean score by profile: {scores}")
+    print(f"Validator state written to {work_dir}")
+    if config.output:
+        with open(config.output, 'w') as f:
+            json.dump({"config": {k: v for k, v in vars(config).items()}, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(get_config())
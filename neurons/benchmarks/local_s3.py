@@ -0,0 +1,94 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import threading
+from io import BytesIO
+
+
+class LocalS3Client:
+    """
+    The subset of the boto3 S3 client used by `storage`, backed by a local directory or by memory.
+
+    Install it with `storage.store.use_client(LocalS3Client(...))`.
+    """
+
+    def __init__(self, root: str = None):
+        """
+        Args:
+            root (str): Directory to write objects to, as <root>/<bucket>/<key>. Keeps objects in memory if None.
+        """
+        self.root = root
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.put_count = 0
+        self.put_bytes = 0
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def put_object(self, Bucket: str, Key: str, Body, **kwargs):
+        data = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        with self.lock:
+            self.put_count += 1
+            self.put_bytes += len(data)
+            if self.root is None:
+                self.objects[(Bucket, Key)] = data
+        if self.root is not None:
+            path = self._path(Bucket, Key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        return {}
+
+    def head_bucket(self, Bucket: str, **kwargs):
+        return {}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        if self.root is None:
+            with self.lock:
+                data = self.objects[(Bucket, Key)]
+        else:
+            with open(self._path(Bucket, Key), 'rb') as f:
+                data = f.read()
+        return {'Body': BytesIO(data), 'ContentLength': len(data)}
+
+    def _keys(self, bucket: str) -> list:
+        if self.root is None:
+            with self.lock:
+                return sorted(key for b, key in self.objects if b == bucket)
+        base = os.path.join(self.root, bucket)
+        keys = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                keys.append(os.path.relpath(os.path.join(directory, name), base).replace(os.sep, '/'))
+        return sorted(keys)
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = '', **kwargs):
+        contents = [{'Key': key} for key in self._keys(Bucket) if key.startswith(Prefix)]
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
+
+    def get_paginator(self, operation: str):
+        client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield getattr(client, operation)(**kwargs)
+
+        return Paginator()
@@ -0,0 +1,74 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+
+
+class RecordedTwitterLookup:
+    """
+    Answers spot check url lookups from a fixed set of items instead of the apify actor.
+    """
+
+    def __init__(self, items: list, latency: float = 0.0):
+        """
+        Args:
+            items (list): The items lookups are answered from, keyed by url.
+            latency (float): Seconds each lookup takes, to stand in for the remote call.
+        """
+        self.latency = latency
+        self.calls = 0
+        self.items = {}
+        self.add(items)
+
+    def add(self, items: list):
+        for item in items:
+            self.items.setdefault(item.get('url'), item)
+
+    def searchByUrl(self, urls: list, max_tweets_per_url: int = 1):
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return [self.items[url] for url in urls if url in self.items]
+
+
+class RecordedRedditLookup:
+    """
+    Answers spot check id lookups from a fixed set of items instead of the percipio API.
+    """
+
+    def __init__(self, items: list, latency: float = 0.0):
+        """
+        Args:
+            items (list): The items lookups are answered from, keyed by id.
+            latency (float): Seconds each lookup takes, to stand in for the remote call.
+        """
+        self.latency = latency
+        self.calls = 0
+        self.items = {}
+        self.add(items)
+
+    def add(self, items: list):
+        for item in items:
+            self.items.setdefault(item.get('id'), item)
+
+    def lookup(self, ids) -> list:
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return [self.items[id] for id in ids if id in self.items]
@@ -0,0 +1,169 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Offline replay of rounds recorded by a validator running with --save_scoring.
+#
+# Every recorded round (twitter_block_*/ and reddit_block_*/ directories holding scoring.json and one
+# {search_key}_{uid}.json per miner) is fed through calculateScore and the storage writers. Remote
+# verification is answered from the recorded responses, S3 is replaced by a local directory and the
+# indexing API by a local stand-in. Scores are checked against the recorded ones.
+#
+# Usage:
+#   python -m neurons.benchmarks.replay --path /path/to/validator/cwd --repeat 3 --output replay.json
+
+import argparse
+import copy
+import glob
+import json
+import os
+import tempfile
+from datetime import datetime
+import bittensor as bt
+import neurons.score.twitter_score as twitter_score
+import neurons.score.reddit_score as reddit_score
+from neurons.storage import store, dedup, indexing, metrics_sink
+from neurons.benchmarks.fake_indexing import FakeIndexingServer
+from neurons.benchmarks.local_s3 import LocalS3Client
+from neurons.benchmarks.lookups import RecordedTwitterLookup, RecordedRedditLookup
+from neurons.benchmarks.stages import StageRecorder
+
+
+def load_round(directory: str) -> dict:
+    """
+    Loads one recorded round directory.
+    """
+    with open(os.path.join(directory, 'scoring.json')) as f:
+        scoring = json.load(f)
+    responses = []
+    for uid in scoring['uid']:
+        filename = os.path.join(directory, f"{scoring['search_key']}_{uid}.json")
+        if os.path.exists(filename):
+            with open(filename) as f:
+                responses.append(json.load(f))
+        else:
+            responses.append(None)
+    return {
+        "platform": 'twitter' if os.path.basename(directory).startswith('twitter') else 'reddit',
+        "directory": directory,
+        "scoring": scoring,
+        "responses": responses,
+        # The round was scored right before scoring.json was written; ages are measured from then.
+        "now": datetime.utcfromtimestamp(os.path.getmtime(os.path.join(directory, 'scoring.json'))),
+    }
+
+
+def passed_spot_check(scoring: dict) -> list:
+    # `correct` is normalized as (correct + 1) / (max_correct + 1): 1.0 for passed miners, 0.5 for failed
+    # ones. If nobody passed every value is 1.0 too, and replaying them all as passed gives the same scores.
+    return [value == 1.0 for value in scoring['correct']]
+
+
+def compare(recorded: dict, replayed: dict, tolerance: float) -> dict:
+    """
+    Returns the largest difference per metric between the recorded and the replayed scores, relative for
+    values above 1 (average_age is in seconds and moves with the replay clock).
+    """
+    diffs = {}
+    for key, values in replayed.items():
+        if key not in recorded or not isinstance(recorded[key], list) or len(recorded[key]) != len(values):
+            continue
+        diffs[key] = max((abs(a - b) / max(1.0, abs(a)) for a, b in zip(recorded[key], values)), default=0.0)
+    return {"max_diff": diffs, "match": all(diff <= tolerance for diff in diffs.values())}
+
+
+def replay_round(round: dict, recorder: StageRecorder, dedup_index, indexing_client, scoring_sinks: dict, tolerance: float) -> dict:
+    platform = round["platform"]
+    scoring = round["scoring"]
+    responses = copy.deepcopy(round["responses"])
+    item_count = sum(len(response) for response in responses if response)
+    passed = passed_spot_check(scoring)
+    verified_items = [item for ok, response in zip(passed, responses) if ok and response for item in response]
+
+    if platform == 'twitter':
+        twitter_score.twitter_query = RecordedTwitterLookup(verified_items)
+        with recorder.stage('twitter_score', item_count):
+            replayed = twitter_score.calculateScore(responses=responses, tag=scoring['search_key'], now=round["now"])
+        with recorder.stage('twitter_store', item_count):
+            store.twitter_store(data=responses, search_keys=[scoring['search_key']], dedup_index=dedup_index, indexing_client=indexing_client)
+    else:
+        reddit_score.reddit_query = RecordedRedditLookup(verified_items)
+        with recorder.stage('reddit_score', item_count):
+            replayed = reddit_score.calculateScore(responses=responses, tag=scoring['search_key'], now=round["now"])
+        with recorder.stage('reddit_store', item_count):
+            store.reddit_store(data=responses, search_keys=[scoring['search_key']], dedup_index=dedup_index, indexing_client=indexing_client)
+
+    with recorder.stage('scoring_metrics', 1):
+        scoring_sinks[platform].append({**scoring, **replayed})
+
+    return {"directory": round["directory"], **compare(scoring, replayed, tolerance)}
+
+
+def get_config():
+    parser = argparse.ArgumentParser(description="Replay rounds recorded with --save_scoring through scoring and storage.")
+    parser.add_argument('--path', type=str, default='.', help="Directory containing the twitter_block_*/reddit_block_* round directories.")
+    parser.add_argument('--platform', type=str, default='all', choices=['all', 'twitter', 'reddit'])
+    parser.add_argument('--repeat', type=int, default=1, help="Replay every round this many times.")
+    parser.add_argument('--tolerance', type=float, default=1e-3, help="Largest accepted difference between recorded and replayed scores.")
+    parser.add_argument('--dedup', action='store_true', help="Use a fresh dedup index while storing.")
+    parser.add_argument('--output', type=str, default=None, help="Write the stage summary and round results as json.")
+    return parser.parse_args()
+
+
+def main(config):
+    patterns = ['twitter_block_*', 'reddit_block_*'] if config.platform == 'all' else [f'{config.platform}_block_*']
+    directories = sorted(d for pattern in patterns for d in glob.glob(os.path.join(config.path, pattern)) if os.path.isdir(d))
+    if len(directories) == 0:
+        bt.logging.error(f"No recorded rounds found in {config.path}")
+        return 1
+
+    recorder = StageRecorder()
+    work_dir = tempfile.mkdtemp(prefix='replay_')
+    with recorder.stage('load', len(directories)):
+        rounds = [load_round(directory) for directory in directories]
+
+    store.use_client(LocalS3Client(os.path.join(work_dir, 's3')))
+    dedup_index = dedup.DedupIndex(os.path.join(work_dir, 'stored_ids.sqlite')) if config.dedup else None
+    scoring_sinks = {platform: metrics_sink.ScoringMetricsSink(platform, os.path.join(work_dir, 'scoring_spool')) for platform in ['twitter', 'reddit']}
+    results = []
+    with FakeIndexingServer() as indexing_server:
+        indexing_client = indexing.IndexingClient(api_key='replay', base_url=indexing_server.url)
+        for _ in range(config.repeat):
+            for round in rounds:
+                results.append(replay_round(round, recorder, dedup_index, indexing_client, scoring_sinks, config.tolerance))
+        with recorder.stage('indexing_flush', len(indexing_client.buffer)):
+            indexing_client.close()
+        with recorder.stage('scoring_flush', sum(sink.rounds for sink in scoring_sinks.values())):
+            for sink in scoring_sinks.values():
+                sink.close()
+    store.use_client(None)
+
+    mismatches = [result for result in results if not result["match"]]
+    print(recorder.report())
+    print(f"Replayed {len(results)} rounds from {len(rounds)} recordings, {len(mismatches)} score mismatches (tolerance {config.tolerance}). Objects written to {work_dir}")
+    for result in mismatches:
+        worst = max(result["max_diff"], key=result["max_diff"].get)
+        print(f"  {result['directory']}: {worst} differs by {result['max_diff'][worst]:.6f}")
+    if config.output:
+        with open(config.output, 'w') as f:
+            json.dump({"stages": recorder.summary(), "rounds": results}, f, indent=2)
+    return 0 if len(mismatches) == 0 else 2
+
+
+if __name__ == "__main__":
+    exit(main(get_config()))
@@ -0,0 +1,103 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Synthetic large-scale benchmark of twitter_score/reddit_score.calculateScore and the storage writers.
+#
+# Rounds are generated at every combination of the given scales, verification is answered locally and
+# uploads go to an in-memory S3 stand-in and a local indexing API. Wall time, CPU time, peak memory and net
+# allocated blocks are reported per stage and scale.
+#
+# Usage:
+#   python -m neurons.benchmarks.scoring_benchmark --miners 25 256 --items 50 200 --duplicate_ratio 0.3 --fake_ratio 0.1
+#   python -m neurons.benchmarks.scoring_benchmark --platform reddit --repeat 5 --output bench.json
+
+import argparse
+import itertools
+import json
+import neurons.score.twitter_score as twitter_score
+import neurons.score.reddit_score as reddit_score
+from neurons.storage import store, indexing
+from neurons.benchmarks.fake_indexing import FakeIndexingServer
+from neurons.benchmarks.local_s3 import LocalS3Client
+from neurons.benchmarks.lookups import RecordedTwitterLookup, RecordedRedditLookup
+from neurons.benchmarks.stages import StageRecorder
+from neurons.benchmarks.synthetic import generate_round
+
+SCORERS = {
+    'twitter': (twitter_score, RecordedTwitterLookup, 'twitter_query', store.twitter_store),
+    'reddit': (reddit_score, RecordedRedditLookup, 'reddit_query', store.reddit_store),
+}
+
+
+def run_scale(platform: str, miners: int, items: int, config, recorder: StageRecorder, indexing_client) -> dict:
+    module, lookup_class, query_attr, store_fn = SCORERS[platform]
+    label = f"{platform}/{miners}x{items}"
+    fake_rejected = 0
+    for repeat in range(config.repeat):
+        with recorder.stage(f"{label} generate", miners * items):
+            round = generate_round(platform, miners=miners, items_per_miner=items, duplicate_ratio=config.duplicate_ratio,
+                                   fake_ratio=config.fake_ratio, relevant_ratio=config.relevant_ratio, seed=config.seed + repeat)
+        setattr(module, query_attr, lookup_class(round["truth"], latency=config.verify_latency))
+        item_count = sum(len(response) for response in round["responses"] if response)
+        with recorder.stage(f"{label} score", item_count):
+            metrics = module.calculateScore(responses=round["responses"], tag='bitcoin')
+        fake_rejected += sum(1 for value in metrics['correct'] if value < 1)
+        with recorder.stage(f"{label} store", item_count):
+            store_fn(data=round["responses"], search_keys=['bitcoin'], indexing_client=indexing_client)
+    return {"platform": platform, "miners": miners, "items": items, "failed_spot_checks": fake_rejected}
+
+
+def get_config():
+    parser = argparse.ArgumentParser(description="Benchmark scoring and storage on synthetic miner responses.")
+    parser.add_argument('--platform', type=str, default='all', choices=['all', 'twitter', 'reddit'])
+    parser.add_argument('--miners', type=int, nargs='+', default=[25, 256], help="Miner counts to benchmark.")
+    parser.add_argument('--items', type=int, nargs='+', default=[50, 200], help="Items per miner to benchmark.")
+    parser.add_argument('--duplicate_ratio', type=float, default=0.3, help="Fraction of each response shared with other miners.")
+    parser.add_argument('--fake_ratio', type=float, default=0.1, help="Fraction of miners returning tampered items.")
+    parser.add_argument('--relevant_ratio', type=float, default=0.9, help="Fraction of items containing the search key.")
+    parser.add_argument('--verify_latency', type=float, default=0.0, help="Seconds each stubbed verification call takes.")
+    parser.add_argument('--repeat', type=int, default=3, help="Rounds per scale.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no_trace_memory', action='store_true', help="Disable tracemalloc, it slows Python allocations down.")
+    parser.add_argument('--output', type=str, default=None, help="Write the results as json.")
+    return parser.parse_args()
+
+
+def main(config):
+    platforms = ['twitter', 'reddit'] if config.platform == 'all' else [config.platform]
+    recorder = StageRecorder(trace_memory=not config.no_trace_memory)
+    store.use_client(LocalS3Client())
+    scales = []
+    with FakeIndexingServer() as indexing_server:
+        indexing_client = indexing.IndexingClient(api_key='benchmark', base_url=indexing_server.url)
+        for platform, miners, items in itertools.product(platforms, config.miners, config.items):
+            scales.append(run_scale(platform, miners, items, config, recorder, indexing_client))
+        indexing_client.close()
+    store.use_client(None)
+
+    print(recorder.report())
+    for scale in scales:
+        print(f"{scale['platform']}/{scale['miners']}x{scale['items']}: {scale['failed_spot_checks']} failed spot checks over {config.repeat} rounds")
+    if config.output:
+        with open(config.output, 'w') as f:
+            json.dump({"config": vars(config), "stages": recorder.summary(), "scales": scales}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(get_config())
@@ -0,0 +1,104 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageRecorder:
+    """
+    Accumulates wall time, CPU time, peak traced memory, net allocated blocks and item throughput per named stage.
+
+    Peak memory comes from tracemalloc and net blocks from the interpreter's block count, so both cover Python
+    allocations only (not torch buffers). Net blocks are the blocks still allocated when a stage ends less those at
+    its start: what the stage keeps alive, negative if it freed more than it allocated. Blocks allocated and
+    freed within the stage don't show; the peak does.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        """
+        Records one run of stage `name` processing `items` items.
+        """
+        if self.trace_memory:
+            # reset_peak only exists from python 3.9 on; without it peaks carry over between stages.
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            start_current, _ = tracemalloc.get_traced_memory()
+            start_blocks = _allocated_blocks()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            stats = self.stages.setdefault(name, {"runs": 0, "wall": [], "cpu": 0.0, "items": 0, "peak_bytes": 0, "net_blocks": 0})
+            stats["runs"] += 1
+            stats["wall"].append(wall)
+            stats["cpu"] += cpu
+            stats["items"] += items
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                stats["peak_bytes"] = max(stats["peak_bytes"], peak - start_current)
+                stats["net_blocks"] += _allocated_blocks() - start_blocks
+
+    def summary(self) -> dict:
+        summary = {}
+        for name, stats in self.stages.items():
+            walls = sorted(stats["wall"])
+            total = sum(walls)
+            summary[name] = {
+                "runs": stats["runs"],
+                "wall_total_s": total,
+                "wall_mean_s": total / len(walls),
+                "wall_p50_s": walls[len(walls) // 2],
+                "wall_max_s": walls[-1],
+                "cpu_total_s": stats["cpu"],
+                "items": stats["items"],
+                "items_per_s": stats["items"] / total if total > 0 else 0.0,
+                "peak_bytes": stats["peak_bytes"],
+                "net_blocks": stats["net_blocks"],
+            }
+        return summary
+
+    def report(self) -> str:
+        lines = [f"{'stage':<28} {'runs':>5} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'cpu s':>8} {'items/s':>10} {'peak MiB':>9} {'net blocks':>10}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<28} {stats['runs']:>5} {stats['wall_total_s']:>9.3f} {stats['wall_mean_s'] * 1000:>9.1f} {stats['wall_max_s'] * 1000:>9.1f} "
+                         f"{stats['cpu_total_s']:>8.3f} {stats['items_per_s']:>10.0f} {stats['peak_bytes'] / 2**20:>9.2f} {stats['net_blocks']:>10}")
+        return '\n'.join(lines)
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def _allocated_blocks() -> int:
+    # Memory blocks currently allocated by the interpreter; the difference over a stage is its net block count.
+    return sys.getallocatedblocks()
@@ -0,0 +1,128 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Generators for realistic synthetic miner responses, in the sn3 formats returned by the scrapers.
+
+import copy
+import random
+import string
+from datetime import datetime, timedelta
+
+WORDS = ("market price news update today thread breaking people think about new week launch team community "
+         "token chain network data model open source release volume trading long short bullish bearish").split()
+
+
+def _sentence(rng: random.Random, tag: str, relevant: bool, length: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(length)]
+    if relevant:
+        words.insert(rng.randrange(len(words) + 1), tag if rng.random() < 0.5 else tag.capitalize())
+    text = ' '.join(words)
+    # Real tweets carry links, mentions and html entities that text_for_comparison has to strip.
+    if rng.random() < 0.3:
+        text += f" https://t.co/{''.join(rng.choice(string.ascii_letters) for _ in range(10))}"
+    if rng.random() < 0.2:
+        text = f"@{rng.choice(WORDS)}{rng.randrange(1000)} " + text
+    if rng.random() < 0.1:
+        text += " &amp; more"
+    return text
+
+
+def twitter_item(rng: random.Random, tag: str, now: datetime, relevant: bool = True, max_age_seconds: int = 6 * 3600) -> dict:
+    """
+    Returns one tweet in the format miners return (see TwitterScraperV2.map_item).
+    """
+    id = str(rng.randrange(10 ** 18, 2 * 10 ** 18))
+    username = f"{rng.choice(WORDS)}_{rng.randrange(100000)}"
+    timestamp = now - timedelta(seconds=rng.randrange(max_age_seconds))
+    return {
+        'id': id,
+        'url': f"https://twitter.com/{username}/status/{id}",
+        'text': _sentence(rng, tag, relevant, rng.randrange(8, 40)),
+        'likes': rng.randrange(500),
+        'images': [],
+        'username': username,
+        'hashtags': [f"#{tag}"] if relevant and rng.random() < 0.3 else [],
+        'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S+00:00'),
+    }
+
+
+def reddit_item(rng: random.Random, tag: str, now: datetime, relevant: bool = True, max_age_seconds: int = 24 * 3600) -> dict:
+    """
+    Returns one reddit post or comment in the format miners return (see TrudaxRedditScraper.map).
+    """
+    is_post = rng.random() < 0.5
+    id = ('t3_' if is_post else 't1_') + ''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(7))
+    community = f"r/{rng.choice(WORDS)}"
+    timestamp = now - timedelta(seconds=rng.randrange(max_age_seconds), microseconds=rng.randrange(10 ** 6))
+    return {
+        'id': id,
+        'url': f"https://www.reddit.com/{community}/comments/{id[3:]}/",
+        'text': _sentence(rng, tag, relevant, rng.randrange(10, 80)),
+        'title': _sentence(rng, tag, relevant and rng.random() < 0.5, rng.randrange(4, 12)) if is_post else "",
+        'likes': rng.randrange(500),
+        'dataType': 'post' if is_post else 'comment',
+        'community': community,
+        'username': f"{rng.choice(WORDS)}_{rng.randrange(100000)}",
+        'parent': id,
+        'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+    }
+
+
+def generate_round(platform: str, miners: int = 25, items_per_miner: int = 100, duplicate_ratio: float = 0.3,
+                   fake_ratio: float = 0.1, relevant_ratio: float = 0.9, empty_ratio: float = 0.05,
+                   tag: str = 'bitcoin', seed: int = 0, now: datetime = None) -> dict:
+    """
+    Generates the responses of one round.
+
+    Args:
+        platform (str): 'twitter' or 'reddit'.
+        miners (int): Number of miner responses.
+        items_per_miner (int): Items in each response.
+        duplicate_ratio (float): Fraction of each response drawn from a pool shared by all miners.
+        fake_ratio (float): Fraction of miners whose items are tampered with, so their spot check fails.
+        relevant_ratio (float): Fraction of items that contain the tag.
+        empty_ratio (float): Fraction of miners that return nothing (None).
+        tag (str): The search key of the round.
+        seed (int): Random seed, rounds are reproducible.
+        now (datetime): The (naive, UTC) time item ages are relative to.
+
+    Returns:
+        dict: {"responses": [...], "truth": [...]} where truth holds the untampered items verification answers with.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    make_item = twitter_item if platform == 'twitter' else reddit_item
+    shared_pool = [make_item(rng, tag, now, rng.random() < relevant_ratio) for _ in range(max(1, items_per_miner))]
+    truth = list(shared_pool)
+    responses = []
+    for _ in range(miners):
+        if rng.random() < empty_ratio:
+            responses.append(None)
+            continue
+        shared_count = int(items_per_miner * duplicate_ratio)
+        items = [copy.copy(item) for item in rng.sample(shared_pool, min(shared_count, len(shared_pool)))]
+        own = [make_item(rng, tag, now, rng.random() < relevant_ratio) for _ in range(items_per_miner - len(items))]
+        truth += own
+        items += [copy.copy(item) for item in own]
+        if rng.random() < fake_ratio:
+            for item in items:
+                item['text'] = item['text'] + ' ' + rng.choice(WORDS)
+        rng.shuffle(items)
+        responses.append(items)
+    return {"responses": responses, "truth": truth}
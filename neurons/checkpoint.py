@@ -0,0 +1,150 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Crash-safe checkpoints of the validator state.
+#
+# A checkpoint is a dict of tensors and a JSON-able dict of metadata, written as one safetensors file when the
+# package is installed (loaded memory-mapped) and with torch.save otherwise. Every write goes to a temporary file
+# in the same directory, is fsynced and then renamed over the checkpoint, so a crash leaves either the old or the
+# new file, never half of one. The replaced checkpoint is kept as path.1, path.2, ... for rollback, and a state
+# equal to the last one written is not written again.
+#
+#   store = CheckpointStore(os.path.join(config.full_path, "state"))
+#   tensors, meta = store.load() or ({}, {})
+#   store.save({'scores': scores}, {'round': 12})
+
+import json
+import os
+import shutil
+import torch
+import bittensor as bt
+
+try:
+    import safetensors.torch
+except ImportError:
+    safetensors = None
+
+
+class CheckpointStore:
+    """
+    Writes checkpoints to `path` + '.safetensors' (or '.pt') atomically and keeps `history` earlier ones.
+    """
+
+    def __init__(self, path: str, history: int = 5):
+        """
+        Args:
+            path (str): The checkpoint file, without extension.
+            history (int): Replaced checkpoints to keep.
+        """
+        self.path = path + ('.safetensors' if safetensors is not None else '.pt')
+        self.history = history
+        self.last = None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def paths(self) -> list:
+        """
+        The checkpoint and its history that exist, newest first.
+        """
+        candidates = [self.path] + [f"{self.path}.{index}" for index in range(1, self.history + 1)]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def _unchanged(self, tensors: dict, meta: dict) -> bool:
+        if self.last is None:
+            return False
+        last_tensors, last_meta = self.last
+        return (last_meta == meta and last_tensors.keys() == tensors.keys()
+                and all(last_tensors[name].shape == tensor.shape and torch.equal(last_tensors[name], tensor) for name, tensor in tensors.items()))
+
+    def save(self, tensors: dict, meta: dict = None) -> bool:
+        """
+        Writes a checkpoint unless it equals the last one written or loaded. Returns whether it was written.
+        """
+        # Round-tripped through JSON so that it compares equal to the metadata of a loaded checkpoint.
+        meta = json.loads(json.dumps(meta or {}))
+        tensors = {name: tensor.detach().cpu().contiguous().clone() for name, tensor in tensors.items()}
+        if self._unchanged(tensors, meta):
+            return False
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as file:
+            if safetensors is not None:
+                file.write(safetensors.torch.save(tensors, metadata = {'meta': json.dumps(meta)}))
+            else:
+                torch.save({'tensors': tensors, 'meta': meta}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        self._rotate()
+        os.replace(temp_path, self.path)
+        # The renames and the history link are entries of the directory, which is synced on its own.
+        self._sync_directory()
+        self.last = (tensors, meta)
+        return True
+
+    def _sync_directory(self):
+        try:
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            # Directories can't be opened for an fsync on Windows.
+            return
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _rotate(self):
+        if self.history <= 0 or not os.path.exists(self.path):
+            return
+        for index in range(self.history - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        # The checkpoint stays in place until the new one is renamed over it, a crash in between loses nothing.
+        backup = f"{self.path}.1"
+        if os.path.exists(backup):
+            os.remove(backup)
+        try:
+            os.link(self.path, backup)
+        except OSError:
+            shutil.copyfile(self.path, backup)
+
+    def read(self, path: str):
+        """
+        Returns (tensors, meta) of one checkpoint file.
+        """
+        if safetensors is not None:
+            with safetensors.safe_open(path, framework = 'pt') as file:
+                meta = json.loads((file.metadata() or {}).get('meta', '{}'))
+                tensors = {name: file.get_tensor(name) for name in file.keys()}
+            return tensors, meta
+        checkpoint = torch.load(path)
+        return checkpoint['tensors'], checkpoint['meta']
+
+    def load(self):
+        """
+        Returns (tensors, meta) of the newest checkpoint that can be read, or None if there is none.
+        """
+        for path in self.paths():
+            try:
+                tensors, meta = self.read(path)
+            except Exception as e:
+                bt.logging.warning(f"Skipping unreadable checkpoint {path}: {e}")
+                continue
+            if path != self.path:
+                bt.logging.warning(f"Rolled back to checkpoint {path}")
+            self.last = (tensors, meta)
+            return tensors, meta
+        return None
@@ -0,0 +1,74 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Content keys for the items and responses of a round.
+#
+# Miners running the same code return the same items, and often entire responses that are equal item for item.
+# Each item is keyed once when a round is ingested; checks and parses of an item or a response are then memoized by
+# key, so content seen before in the round costs one dictionary lookup.
+#
+#   check = Memo(check_tweet)
+#   keys = [item_key(tweet) for tweet in response]
+#   results = [check(key, tweet) for key, tweet in zip(keys, response)]
+
+
+def item_key(item):
+    """
+    A hashable key that is equal for items with equal fields, or None for items that cannot be keyed (not a dict, or
+    holding unhashable values). Items with the same fields in another order get different keys and are only checked
+    twice.
+    """
+    try:
+        key = tuple(item.items())
+        hash(key)
+    except (AttributeError, TypeError):
+        return None
+    return key
+
+
+def response_key(keys: list):
+    """
+    The key of a response from the keys of its items, None if one of them could not be keyed.
+    """
+    if any(key is None for key in keys):
+        return None
+    return tuple(keys)
+
+
+class Memo:
+    """
+    Memoizes a function for one round by a content key passed along with its arguments. Calls with a None key are not
+    memoized. Exceptions are not cached.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.results = {}
+        self.hits = 0
+
+    def __call__(self, key, *args):
+        if key is None:
+            return self.function(*args)
+        try:
+            result = self.results[key]
+        except KeyError:
+            result = self.results[key] = self.function(*args)
+            return result
+        self.hits += 1
+        return result
@@ -0,0 +1,178 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Memory growth monitor for long-running neurons.
+#
+# A daemon thread samples the resident set size every `interval` seconds, logs the growth trend over the last
+# `window` samples and warns when it keeps growing. Sizes of known long-lived structures registered with `track`
+# are logged next to it, and with tracemalloc enabled the allocation sites that grew most since startup are too.
+#
+#   monitor = memory.MemoryMonitor('validator', interval = 300)
+#   monitor.track('dedup_index', lambda: len(index))
+#   monitor.start()
+
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import deque
+import bittensor as bt
+from neurons import metrics
+
+
+def current_rss() -> int:
+    """
+    Resident set size of this process in bytes; the peak RSS where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KiB on Linux and in bytes on macOS.
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def growth_per_hour(samples) -> float:
+    """
+    Least squares slope of (timestamp, bytes) samples, in bytes per hour.
+    """
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in samples) / var * 3600
+
+
+class MemoryMonitor:
+    """
+    Growth is "sustained" when the RSS over a full window rose by more than `alert_mib` and the fitted slope is
+    above `alert_mib_per_hour`, so one-off spikes from a large round don't trigger it.
+    """
+
+    def __init__(self, service: str, interval: float = 300, window: int = 12, alert_mib: float = 256,
+                 alert_mib_per_hour: float = 32, trace_allocations: bool = False, top: int = 10):
+        """
+        Args:
+            service (str): Prefix of the exported gauges.
+            interval (float): Seconds between samples.
+            window (int): Samples the trend is fitted over.
+            alert_mib (float): RSS growth over the window that, together with the slope, raises a warning.
+            alert_mib_per_hour (float): Slope that, together with the growth, raises a warning.
+            trace_allocations (bool): Start tracemalloc and log the top growing allocation sites every sample.
+            top (int): Allocation sites logged per sample.
+        """
+        self.service = service
+        self.interval = interval
+        self.samples = deque(maxlen=max(window, 2))
+        self.alert_bytes = alert_mib * 2**20
+        self.alert_bytes_per_hour = alert_mib_per_hour * 2**20
+        self.trace_allocations = trace_allocations
+        self.top = top
+        self.tracked = {}
+        self.baseline = None
+        self.alerting = False
+        self.stopped = threading.Event()
+        self.thread = None
+        self.rss_gauge = metrics.gauge(f"{service}_rss_bytes", "Resident set size of the process.")
+        self.growth_gauge = metrics.gauge(f"{service}_rss_growth_bytes_per_hour", "RSS trend over the monitor window.")
+        self.size_gauge = metrics.gauge(f"{service}_tracked_size", "Length of long-lived structures registered with the memory monitor.", ['structure'])
+
+    def track(self, name: str, size_fn):
+        """
+        Registers a structure whose size is logged each sample. `size_fn` returns a number, e.g. `lambda: len(x)`.
+        """
+        self.tracked[name] = size_fn
+        return self
+
+    def start(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        if self.trace_allocations:
+            self.baseline = tracemalloc.take_snapshot()
+        self.thread = threading.Thread(target=self._run, name=f"{self.service}-memory", daemon=True)
+        self.thread.start()
+        bt.logging.info(f"Memory monitor sampling every {self.interval}s")
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                bt.logging.warning(f"Memory monitor sample failed: {e}")
+            if self.stopped.wait(self.interval):
+                return
+
+    def sample(self) -> dict:
+        rss = current_rss()
+        self.samples.append((time.time(), rss))
+        slope = growth_per_hour(self.samples)
+        self.rss_gauge.set(rss)
+        self.growth_gauge.set(slope)
+
+        sizes = {}
+        for name, size_fn in self.tracked.items():
+            try:
+                sizes[name] = size_fn()
+            except Exception as e:
+                bt.logging.debug(f"Could not size {name}: {e}")
+                continue
+            self.size_gauge.set(sizes[name], structure=name)
+
+        sizes_str = ', '.join(f"{name}={size}" for name, size in sizes.items())
+        bt.logging.info(f"Memory: rss={rss / 2**20:.1f}MiB trend={slope / 2**20:+.1f}MiB/h over {len(self.samples)} samples" + (f" | {sizes_str}" if sizes_str else ""))
+
+        growth = self.samples[-1][1] - self.samples[0][1]
+        sustained = len(self.samples) == self.samples.maxlen and growth > self.alert_bytes and slope > self.alert_bytes_per_hour
+        if sustained:
+            bt.logging.warning(f"Sustained memory growth: +{growth / 2**20:.1f}MiB over the last {len(self.samples)} samples ({slope / 2**20:+.1f}MiB/h)")
+        elif self.alerting:
+            bt.logging.info("Memory growth has levelled off")
+        self.alerting = sustained
+
+        if self.trace_allocations and tracemalloc.is_tracing():
+            self._log_allocations()
+        return {"rss": rss, "growth_per_hour": slope, "sustained": sustained, "sizes": sizes}
+
+    def _log_allocations(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        stats = snapshot.compare_to(self.baseline, 'lineno') if self.baseline is not None else snapshot.statistics('lineno')
+        for stat in stats[:self.top]:
+            bt.logging.info(f"Memory top: {stat}")
+
+
+def add_args(parser):
+    parser.add_argument( '--memory_interval', type = int, default = 300, help = "Seconds between memory samples, 0 disables the memory monitor." )
+    parser.add_argument( '--memory_alert_mib', type = float, default = 256, help = "RSS growth over the monitor window that is reported as sustained growth." )
+    parser.add_argument( '--memory_tracemalloc', action = 'store_true', default = False, help = "Trace allocations and log the sites that grew most each sample. Slows the neuron down." )
+
+
+def from_config(service: str, config) -> MemoryMonitor:
+    return MemoryMonitor(service, interval = config.memory_interval, alert_mib = config.memory_alert_mib, trace_allocations = config.memory_tracemalloc)
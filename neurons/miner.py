@@ -29,6 +29,8 @@ import bittensor as bt
 import scraping
 from typing import Tuple
 import torch
+import functools
+from neurons import memory, metrics, profiling
 from neurons.queries import get_query, QueryType, QueryProvider
 # TODO: Check if all the necessary libraries are installed and up-to-date
 
@@ -45,6 +47,9 @@ def get_config():
     parser.add_argument( '--netuid', type = int, default = 3, help = "The chain subnet uid." )
     #parser.add_argument( '--neuron.not_set_weights', type=bool, default = True, help = "miners can set weights.")
     parser.add_argument( '--auto-update', type = str, default = True, help = "Set to \"no\" to disable auto update.")
+    parser.add_argument( '--metrics_port', type = int, default = 9465, help = "Local port serving request and actor metrics in the Prometheus format, 0 disables it." )
+    profiling.add_args(parser)
+    memory.add_args(parser)
     # Adds subtensor specific arguments i.e. --subtensor.chain_endpoint ... --subtensor.network ...
     bt.subtensor.add_args(parser)
     # Adds logging specific arguments i.e. --logging.debug ..., --logging.trace .. or --logging.logging_dir ...
@@ -77,6 +82,14 @@ def get_config():
 
 # TODO: Add error handling for when the directory for logging cannot be created
 
+# Request metrics, served on --metrics_port next to the apify_actor_* metrics of neurons.apify.actors.
+REQUEST_SECONDS = metrics.histogram('miner_request_seconds', "Time spent serving a validator request.", ['synapse', 'validator_uid'])
+REQUESTS = metrics.counter('miner_requests_total', "Validator requests by outcome (ok, empty, error, outdated_version, update_pending).", ['synapse', 'status'])
+ITEMS_RETURNED = metrics.histogram('miner_items_returned', "Items returned per request.", ['synapse'], buckets = (0, 1, 5, 10, 15, 20, 30, 50, 100))
+TWITTER_RETRIES = metrics.counter('miner_twitter_retry_total', "twitterScrap requests whose first execute returned nothing and were run again.")
+REQUESTS_IN_FLIGHT = metrics.gauge('miner_requests_in_flight', "Requests being served.", ['synapse'])
+AXON_QUEUE_DEPTH = metrics.gauge('miner_axon_queue_depth', "Requests waiting in the axon priority queue.")
+
 import random
 
 def random_line(a_file="keywords.txt"):
@@ -140,6 +153,50 @@ def main( config ):
         my_subnet_uid = metagraph.hotkeys.index(wallet.hotkey.ss58_address)
         bt.logging.info(f"Running miner on uid: {my_subnet_uid}")
 
+    if config.metrics_port:
+        metrics.start_http_server(config.metrics_port)
+    # Requests are profiled on demand, see neurons/profiling.py.
+    profiler = profiling.from_config('miner', config)
+
+    # RSS trend and the size of the scrapers' long-lived state.
+    memory_monitor = memory.from_config('miner', config)
+    memory_monitor.track('twitter_keywords_past', lambda: len(getattr(twitter_query, 'keywords_past', ())))
+    if config.memory_interval:
+        memory_monitor.start()
+
+    def instrumented( name: str ):
+        """
+        Times a forward function and counts its outcome. Outdated versions and pending updates return the synapse
+        without scrap_output and are counted apart from genuinely empty results.
+        """
+        def decorator( forward_fn ):
+            @functools.wraps( forward_fn )
+            def wrapper( synapse ):
+                try:
+                    validator_uid = metagraph.hotkeys.index( synapse.dendrite.hotkey )
+                except ValueError:
+                    validator_uid = -1
+                start = time.perf_counter()
+                REQUESTS_IN_FLIGHT.inc( synapse = name )
+                try:
+                    with profiler.unit( name ):
+                        synapse = forward_fn( synapse )
+                except Exception:
+                    REQUESTS.inc( synapse = name, status = 'error' )
+                    raise
+                finally:
+                    REQUESTS_IN_FLIGHT.inc( -1, synapse = name )
+                    REQUEST_SECONDS.observe( time.perf_counter() - start, synapse = name, validator_uid = validator_uid )
+                if synapse.scrap_output is None:
+                    status = 'update_pending' if scraping.utils.update_flag else 'outdated_version'
+                else:
+                    ITEMS_RETURNED.observe( len(synapse.scrap_output), synapse = name )
+                    status = 'ok' if len(synapse.scrap_output) > 0 else 'empty'
+                REQUESTS.inc( synapse = name, status = status )
+                return synapse
+            return wrapper
+        return decorator
+
     # Set up miner functionalities
     # The blacklist function decides if a request should be ignored.
     def blacklist_twitter( synapse: scraping.protocol.TwitterScrap ) -> Tuple[bool, str]:
@@ -207,6 +264,7 @@ def main( config ):
         bt.logging.trace(f'Prioritizing {synapse.dendrite.hotkey} with value: ', prirority)
         return prirority
 
+    @instrumented( 'twitter' )
     def twitterScrap( synapse: scraping.protocol.TwitterScrap) -> scraping.protocol.TwitterScrap: 
         """
         This function runs after the TwitterScrap synapse has been deserialized (i.e. after synapse.data is available).
@@ -239,6 +297,7 @@ def main( config ):
 
         tweets = twitter_query.execute(search_key, 15, synapse.dendrite.hotkey, validator_version_str, my_subnet_uid)
         if (len(tweets) == 0):
+            TWITTER_RETRIES.inc()
             tweets = twitter_query.execute(search_key, 15, synapse.dendrite.hotkey, validator_version_str, my_subnet_uid)
             
         # Save the tweets associated with that search key
@@ -250,6 +309,7 @@ def main( config ):
         bt.logging.info(f"✅ success: returning {len(synapse.scrap_output)} tweets\n")
         return synapse
     
+    @instrumented( 'reddit' )
     def redditScrap( synapse: scraping.protocol.RedditScrap) -> scraping.protocol.RedditScrap: 
         """
         This function runs after the RedditScrap synapse has been deserialized (i.e. after synapse.data is available).
@@ -342,6 +402,11 @@ def main( config ):
                         bt.logging.success("🔁 Repository updated, exiting miner")
                         exit(0)
             
+            # The axon's priority executor queues requests beyond its max_workers.
+            work_queue = getattr(getattr(axon, 'thread_pool', None), '_work_queue', None)
+            if work_queue is not None:
+                AXON_QUEUE_DEPTH.set(work_queue.qsize())
+
             step += 1
             time.sleep(1)
 
@@ -0,0 +1,224 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# On-demand profiling of a running neuron.
+#
+# The next N rounds (validator) or requests (miner) can be armed with --profile, or at runtime with
+# `kill -USR1 <pid>`, and each armed unit writes one file under {config.full_path}/profiles:
+#   cprofile     <service>-<unit>-<time>.prof    pstats file for snakeviz / flameprof / `python -m pstats`
+#   sample       <service>-<unit>-<time>.folded  folded stacks for flamegraph.pl or speedscope
+#   tracemalloc  <service>-<unit>-<time>.txt     allocation growth over the unit, by line
+#
+#   profiler = profiling.Profiler('validator', config.full_path, mode = 'sample', count = 3)
+#   profiler.install_signal()
+#   with profiler.unit('twitter'):
+#       ...
+
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+import bittensor as bt
+
+MODES = ('cprofile', 'sample', 'tracemalloc')
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread every `interval` seconds from a background thread and counts the stacks in
+    the folded format (`outer;inner;leaf count`). Sees time spent waiting on I/O, which cProfile attributes poorly.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """
+    Profiles armed units one at a time; units entered while another one is profiled, e.g. concurrent miner
+    requests, run unprofiled and stay armed for later.
+    """
+
+    def __init__(self, service: str, output_dir: str, mode: str = 'sample', count: int = 0, interval: float = 0.005, top: int = 50):
+        """
+        Args:
+            service (str): Prefix of the output files.
+            output_dir (str): Directory the profiles directory is created in, normally config.full_path.
+            mode (str): One of MODES, used by units armed from the signal handler.
+            count (int): Units armed at startup.
+            interval (float): Seconds between samples in 'sample' mode.
+            top (int): Lines written by 'tracemalloc' mode.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode}, expected one of {MODES}")
+        self.service = service
+        self.directory = os.path.join(output_dir, "profiles")
+        self.mode = mode
+        self.default_count = max(count, 1)
+        self.interval = interval
+        self.top = top
+        self.lock = threading.Lock()
+        self.remaining = count
+        self.active = False
+        self.sequence = 0
+        # Set by the signal handler, which runs on the main thread between any two bytecodes (possibly while the
+        # main thread holds self.lock), so it only sets the event; the next unit arms.
+        self.signalled = threading.Event()
+
+    def arm(self, count: int = None, mode: str = None):
+        with self.lock:
+            if mode:
+                if mode not in MODES:
+                    raise ValueError(f"Unknown profile mode {mode}, expected one of {MODES}")
+                self.mode = mode
+            self.remaining = count if count is not None else self.default_count
+        bt.logging.info(f"Profiling the next {self.remaining} {self.service} units with {self.mode}, output in {self.directory}")
+
+    def install_signal(self, signum = getattr(signal, 'SIGUSR1', None)):
+        """
+        Arms the default count of units whenever the process receives `signum`. Must be called from the main thread.
+        """
+        if signum is None:
+            bt.logging.warning("Signal triggered profiling is not available on this platform")
+            return
+        signal.signal(signum, lambda *_: self.signalled.set())
+
+    def _take(self):
+        if self.signalled.is_set():
+            self.signalled.clear()
+            self.arm()
+        with self.lock:
+            if self.remaining <= 0 or self.active:
+                return None
+            self.remaining -= 1
+            self.active = True
+            self.sequence += 1
+            return self.mode
+
+    @contextmanager
+    def unit(self, name: str):
+        mode = self._take() if self.remaining > 0 or self.signalled.is_set() else None
+        if mode is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.service}-{name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.sequence}")
+        start = time.perf_counter()
+        try:
+            if mode == 'cprofile':
+                with self._cprofile(path + '.prof'):
+                    yield
+            elif mode == 'sample':
+                with self._sample(path + '.folded'):
+                    yield
+            else:
+                with self._tracemalloc(path + '.txt'):
+                    yield
+        finally:
+            with self.lock:
+                self.active = False
+            bt.logging.info(f"Profiled {self.service} {name} ({time.perf_counter() - start:.2f}s) with {mode}, remaining: {self.remaining}")
+
+    @contextmanager
+    def _cprofile(self, path: str):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(path)
+
+    @contextmanager
+    def _sample(self, path: str):
+        sampler = StackSampler(threading.get_ident(), self.interval).start()
+        try:
+            yield
+        finally:
+            sampler.stop().write(path)
+
+    @contextmanager
+    def _tracemalloc(self, path: str):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(25)
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+            with open(path, 'w') as f:
+                f.write(f"traced current={current / 2**20:.1f}MiB peak={peak / 2**20:.1f}MiB\n")
+                for stat in diff[:self.top]:
+                    f.write(f"{stat}\n")
+
+
+def add_args(parser):
+    parser.add_argument( '--profile', type = int, default = 0, help = "Profile this many rounds/requests after startup. `kill -USR1 <pid>` arms --profile_count more at any time." )
+    parser.add_argument( '--profile_mode', type = str, default = 'sample', choices = MODES, help = "cprofile (.prof), sample (folded stacks for flame graphs) or tracemalloc (allocation growth)." )
+    parser.add_argument( '--profile_count', type = int, default = 3, help = "Units armed by the profiling signal." )
+
+
+def from_config(service: str, config) -> Profiler:
+    profiler = Profiler(service, config.full_path, mode = config.profile_mode, count = config.profile)
+    profiler.default_count = max(config.profile_count, 1)
+    profiler.install_signal()
+    if config.profile:
+        bt.logging.info(f"Profiling the first {config.profile} {service} units with {config.profile_mode}")
+    return profiler
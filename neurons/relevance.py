@@ -0,0 +1,92 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Keyword relevance of scraped items.
+#
+# A RelevanceMatcher is built once per keyword set and tests every field of an item in one scan: the fields are
+# lowercased once, joined by a separator no keyword spans, and searched for all keywords together. The result is
+# the same as `keyword.lower() in field.lower()` for each keyword and field.
+#
+#   matcher = RelevanceMatcher(['bitcoin'])
+#   matcher.matches(item['text'], item.get('title', ''))
+#
+#   matcher = RelevanceMatcher(['bitcoin', 'btc', 'tao'])
+#   matcher.labels(item['text'])   # {'bitcoin', 'btc'}
+
+import re
+
+_SEPARATOR = '\x00'
+
+
+class RelevanceMatcher:
+    """
+    Matches lowercased keywords as substrings. One keyword uses str's substring search, several keywords one
+    compiled alternation; `labels` uses a lookahead alternation, so overlapping keywords are all found.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({str(keyword).lower().replace(_SEPARATOR, '') for keyword in keywords}, key=lambda k: (-len(k), k))
+        if not self.keywords:
+            raise ValueError("RelevanceMatcher needs at least one keyword")
+        self.single = self.keywords[0] if len(self.keywords) == 1 else None
+        alternation = '|'.join(re.escape(keyword) for keyword in self.keywords)
+        self.pattern = re.compile(alternation)
+        # At each position the longest keyword starting there is reported, the shorter ones starting there are
+        # its prefixes.
+        self.lookahead = re.compile(f'(?=({alternation}))')
+        self.prefixes = {keyword: {other for other in self.keywords if keyword.startswith(other)} for keyword in self.keywords}
+
+    @staticmethod
+    def _lowered(fields) -> str:
+        # Fields must be strings, a None title raises like `.lower()` on it did.
+        if len(fields) == 1:
+            return fields[0].lower()
+        return _SEPARATOR.join(fields).lower()
+
+    def matches_lowered(self, text: str) -> bool:
+        """
+        Tests text that is already lowercase, or that should be matched case sensitively.
+        """
+        if self.single is not None:
+            return self.single in text
+        return self.pattern.search(text) is not None
+
+    def matches(self, *fields) -> bool:
+        """
+        True if any keyword occurs in any of the fields, ignoring case.
+        """
+        return self.matches_lowered(self._lowered(fields))
+
+    def labels(self, *fields) -> set:
+        """
+        The keywords that occur in any of the fields, ignoring case.
+        """
+        text = self._lowered(fields)
+        found = set()
+        for match in self.lookahead.finditer(text):
+            keyword = match.group(1)
+            if keyword not in found:
+                found |= self.prefixes[keyword]
+        return found
+
+    def label_many(self, items, fields = ('text',)) -> list:
+        """
+        Labels a batch of items, e.g. the responses of a round that searched several keywords.
+        """
+        return [self.labels(*(item.get(field, '') for field in fields)) for item in items]
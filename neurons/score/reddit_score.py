@@ -24,24 +24,225 @@ from datetime import datetime
 import bittensor as bt
 #from neurons.queries import get_query, QueryType, QueryProvider
 from neurons.services.percipio_reddit_lookup import PercipioRedditLookup
+from neurons.tracing import span
+from neurons import contenthash, similarity, timestamps, trust, verification
+from neurons.relevance import RelevanceMatcher
 import random
+import re
 from dateutil.parser import parse
 
 #reddit_query = get_query(QueryType.REDDIT, QueryProvider.PERCIPIO_REDDIT_LOOKUP)
-reddit_query = PercipioRedditLookup
+reddit_query = PercipioRedditLookup()
+# Reddit fullnames, e.g. t3_17mhoqv
+_REDDIT_ID = re.compile(r'^t\d_[a-z0-9]+$')
 
-def calculateScore(responses = [], tag = 'tao'):
+def _fetch_spot_checks(spot_check_ids: list) -> list:
+    """
+    Looks up the spot check ids. Returns the posts found, [] on errors.
+    """
+    try:
+        bt.logging.info(f"Validating {len(spot_check_ids)} posts.")
+        with span('verify', items = len(spot_check_ids)):
+            return reddit_query.lookup(set(spot_check_ids))
+    except Exception as e:
+        bt.logging.error(f"❌ Error while verifying post: {e}")
+        return []
+
+
+# Spot checks of all rounds are looked up by the validator's verification service, while calculateScore runs the
+# checks that do not depend on them.
+verification.service.register('reddit', _fetch_spot_checks, item_key = lambda post: post['id'])
+
+
+def _check_post(post, now_ts: float, timestamp_of):
+    """
+    Format checks of one post. Returns (fake, bad_format, id), the id is None if the post is not counted.
+    """
+    fake = False
+    try:
+
+        # Check that 'text', 'timestamp' and 'dataType' fields exist
+        post['text'] and post['timestamp'] and post['dataType']
+
+        age = now_ts - timestamp_of(post['timestamp'])
+        if age < 0:
+            bt.logging.warning(f"Faked future post: {post}")
+            fake = True
+
+        post_id = post['id']
+        hash(post_id)
+        return fake, False, post_id
+
+    except Exception as e:
+        bt.logging.error(f"❌ Error while verifying post: {e}: {post}")
+        return fake, True, None
+
+
+def _check_posts(response, keys: list, check_post):
+    """
+    Format checks of one response. Returns (fake, bad_format, ids counted for similarity).
+    """
+    fake = bad_format = False
+    id_list = set()
+    counted_ids = []
+    for post, key in zip(response, keys):
+        post_fake, post_bad_format, post_id = check_post(key, post)
+        fake = fake or post_fake
+        bad_format = bad_format or post_bad_format
+        if post_id is not None:
+            if post_id in id_list:
+                bt.logging.info(f"Duplicated id found: {post_id}")
+                fake = True
+            else:
+                id_list.add(post_id)
+            counted_ids.append(post_id)
+    return fake, bad_format, counted_ids
+
+
+class RoundIngest:
+    """
+    The part of scoring a round that looks at one response at a time: format checks, id counting and the choice of
+    the spot check sample. Responses can be added as they arrive, e.g. by neurons.streaming.query; calculateScore
+    finishes the round with the terms that need all of them.
+    """
+
+    def __init__(self, size: int, tag = 'tao', now: datetime = None, responses: list = None, miners: list = None):
+        """
+        Args:
+            size (int): The number of miners queried.
+            tag (str): The tag of responses.
+            now (datetime): The (naive, UTC) time ages are measured from. Defaults to the current time.
+            responses (list): The list responses are collected in, a new one by default.
+            miners (list): The (uid, hotkey) of each miner queried. The items checked are then planned by
+                trust.sampler from the history of the miner; without them one random item of every response is checked.
+        """
+        self.tag = tag
+        self.miners = miners
+        self.responses = responses if responses is not None else [None] * size
+        self.added = [False] * size
+        self.now_ts = timestamps.epoch(now if now is not None else datetime.utcnow())
+        # Each distinct timestamp is parsed once per round, for both passes and for posts returned by several miners.
+        self.timestamp_of = timestamps.ParseCache(timestamps.parse_iso_timestamp)
+        self.relevance = RelevanceMatcher([tag])
+
+        self.format_score = torch.zeros(size)
+        self.fake_score = torch.zeros(size)
+        self.spot_check_idx = [None] * size
+        self.spot_check_ids = []
+        self.verification = None
+
+        # Miners running the same code return the same posts, and often the same responses. Every post and response
+        # is keyed by content once; each distinct post and response is then checked, and later scored, once per round.
+        check_post = contenthash.Memo(lambda post: _check_post(post, self.now_ts, self.timestamp_of))
+        self.check_response = contenthash.Memo(lambda response, keys: _check_posts(response, keys, check_post))
+        self.item_keys = [None] * size
+        self.response_keys = [None] * size
+        # Count the number of occurrences of each ID
+        self.id_counts = {}
+
+    def select(self, i: int, response):
+        """
+        Takes response i and chooses the items of it that are spot checked.
+        """
+        if response == None:
+            response = []
+            self.format_score[i] = 1
+        self.responses[i] = response
+        # Choose random responses from each miner to compare, and gather their urls
+        if len(response) > 0:
+            if self.miners is None:
+                self.spot_check_idx[i] = [random.randrange(len(response))]
+            else:
+                self.spot_check_idx[i] = trust.sampler.plan(self.miners[i], len(response), 'reddit')
+            for item_idx in self.spot_check_idx[i]:
+                bt.logging.trace(f"Spot checking item {item_idx} of miner {i}: {response[item_idx]}")
+                spot_check_id = response[item_idx].get('id')
+                # Only well-formed fullnames are looked up; the lookup of other ids would share a url with them.
+                if isinstance(spot_check_id, str) and _REDDIT_ID.match(spot_check_id):
+                    self.spot_check_ids.append(spot_check_id)
+
+    def start_verification(self):
+        """
+        Starts looking up the spot check ids chosen so far, the lookup runs while the round is checked and scored.
+        """
+        if self.verification is None and len(self.spot_check_ids) > 0:
+            self.verification = verification.service.submit('reddit', self.spot_check_ids)
+
+    def check(self, i: int):
+        """
+        Format checks of response i, and counts its ids.
+        """
+        response = self.responses[i]
+        keys = [contenthash.item_key(post) for post in response]
+        self.item_keys[i] = keys
+        self.response_keys[i] = contenthash.response_key(keys)
+        fake, bad_format, counted_ids = self.check_response(self.response_keys[i], response, keys)
+        if fake:
+            self.fake_score[i] = 1
+        if bad_format:
+            self.format_score[i] = 1
+        for post_id in counted_ids:
+            self.id_counts[post_id] = self.id_counts.get(post_id, 0) + 1
+        self.added[i] = True
+
+    def record(self, i: int, verified: bool, tampered: bool):
+        """
+        Adds the outcome of the spot check of response i to the history of its miner: a pass if every item checked
+        was verified, a failure if one differed from the original.
+        """
+        if self.miners is None or not self.spot_check_idx[i]:
+            return
+        # Items the lookup didn't return are unverified, not failed: lookups miss items of honest miners too.
+        if tampered:
+            trust.sampler.record(self.miners[i], False)
+        elif verified:
+            trust.sampler.record(self.miners[i], True)
+
+    def add(self, i: int, response):
+        """
+        Ingests response i as it arrives.
+        """
+        self.select(i, response)
+        self.check(i)
+
+    def close(self):
+        """
+        Counts the miners that did not answer as empty responses and starts the spot check lookup.
+        """
+        for i, added in enumerate(self.added):
+            if not added:
+                self.add(i, None)
+        self.start_verification()
+
+
+def calculateScore(responses = [], tag = 'tao', now: datetime = None, ingest: RoundIngest = None, miners: list = None):
     """
     This function calculates the score of responses.
     The score is calculated by the degree of similarity between responses, accuracy and time difference.
     Args:
         responses (list): The list of responses.
         tag (str): The tag of responses.
+        now (datetime): The (naive, UTC) time ages are measured from. Defaults to the current time.
+        ingest (RoundIngest): Responses already ingested as they arrived; responses, tag and now are taken from it.
+        miners (list): The (uid, hotkey) of each response, whose spot check history decides which items are checked.
     Returns:
         list: The list of scores for each response.
     """
+    if ingest is None:
+        ingest = RoundIngest(len(responses), tag, now, responses, miners)
+        for i, response in enumerate(responses):
+            ingest.select(i, response)
+        # Look up spot check ids while the checks below run, they only meet when the samples are compared.
+        ingest.start_verification()
+        for i in range(len(responses)):
+            ingest.check(i)
+    ingest.close()
+    responses = ingest.responses
     if len(responses) == 0:
         return []
+    now_ts, timestamp_of, relevance = ingest.now_ts, ingest.timestamp_of, ingest.relevance
+    format_score, fake_score, id_counts = ingest.format_score, ingest.fake_score, ingest.id_counts
+    item_keys, response_keys, spot_check_idx = ingest.item_keys, ingest.response_keys, ingest.spot_check_idx
 
     
     # Initialize variables
@@ -63,130 +264,58 @@ def calculateScore(responses = [], tag = 'tao'):
     max_length = 0
     relevant_ratio = torch.zeros(len(responses))
 
-    format_score = torch.zeros(len(responses))
-    fake_score = torch.zeros(len(responses))
-    
-    # Count the number of occurrences of each ID
-    id_counts = {}
-    for i, response in enumerate(responses):
-
+    # Items copied from other miners under new ids escape id_counts, they are counted by text instead.
+    with span('near_duplicates'):
+        near_duplicates = similarity.near_duplicate_counts(responses, lambda item: item.get('title', '') + ' ' + item['text'])
 
-        if response == None:
-            responses[i] = []
-            response = []
-            format_score[i] = 1
-        id_list = []
-        for post in response:  
-            try:
-
-                # Check that 'text', 'timestamp' and 'dataType' fields exist
-                post['text'] and post['timestamp'] and post['dataType']
-
-                date_object = datetime.fromisoformat(post['timestamp'].rstrip('Z'))
-                age = datetime.utcnow() - date_object
-                if age.total_seconds() < 0:
-                    bt.logging.warning(f"Faked future post: {post}")
-                    fake_score[i] = 1
-
-                if post['id'] in id_list:
-                    bt.logging.info(f"Duplicated id found: {post['id']} in response {i}")
-                    fake_score[i] = 1
-                else:
-                    id_list.append(post['id'])
-
-                post_id = post['id']
-                id_counts[post_id] = id_counts.get(post_id, 0) + 1
-                
-            except Exception as e:
-                bt.logging.error(f"❌ Error while verifying post: {e}: {post}")
-                format_score[i] = 1
-
-    # Choose random responses from each miner to compare, and gather their urls
-    spot_check_idx = []
-    spot_check_ids = []
-    spot_check_posts = []
-    for i, response in enumerate(responses):
-        if len(response) > 0:
-            item_idx = random.randrange(len(response))
-            print(item_idx)
-            spot_check_idx.append(item_idx)
-            print(response[item_idx])
-            spot_check_id = response[item_idx].get('id')
-            if spot_check_id is not None:
-                spot_check_ids.append(spot_check_id)
-        else:
-            spot_check_idx.append(None)
+    def score_post(item):
+        relevant = relevance.matches(item.get('title', ''), item['text'])
+        # calculate time difference score
+        try:
+            return relevant, now_ts - timestamp_of(item['timestamp'])
+        except Exception as e:
+            return relevant, e
 
-    # Fetch spot check urls
-    if len(spot_check_ids) > 0:
+    def score_posts(response, keys):
+        relevant_count = similarity_score = age_sum = 0
         try:
-            bt.logging.info(f"Validating {len(spot_check_ids)} posts.")
-            spot_check_posts = reddit_query.lookup(set(spot_check_ids))
+            for item, key in zip(response, keys):
+                relevant, age = score_item(key, item)
+                if relevant:
+                    relevant_count += 1
+                # calculate similarity score
+                similarity_score += (id_counts[item['id']] - 1)
+                if isinstance(age, Exception):
+                    raise age
+                age_sum += age
         except Exception as e:
-            bt.logging.error(f"❌ Error while verifying post: {e}")
+            bt.logging.info(f"Bad format: {e}")
+            return relevant_count, similarity_score, age_sum, True
+        return relevant_count, similarity_score, age_sum, False
+
+    score_item = contenthash.Memo(score_post)
+    score_response = contenthash.Memo(score_posts)
 
     # Calculate score for each response
     for i, response in enumerate(responses):
         # initialize variables
-        similarity_score = 0
-        relevant_count = 0
-        age_sum = 0
         total_length += len(response)
 
         # update max_length
         max_length = max(len(response), max_length)
 
-        # Do spot check for this miner
-        correct_score = 0
-        if len(response) > 0:
-            sample_item = response[spot_check_idx[i]]
-            sample_id = sample_item.get('id', "")
-            searched_item = next((post for post in spot_check_posts if post['id'] == sample_id), None)
-            if searched_item:
-                if searched_item['dataType'] == "post" and searched_item.get('title') == sample_item.get('title'):
-                    title_ok = True
-                elif searched_item['dataType'] == "comment" and not searched_item.get('title'):
-                    title_ok = True
-                else:
-                    title_ok = False
-                # Some posts have an empty body, but the apify actor is filling in img/thumbnail in the text
-                # Consider that a match
-                text_ok = len(searched_item['text']) == 0 or searched_item['text'] == sample_item['text']
-                if(title_ok and text_ok and searched_item['timestamp'] == sample_item['timestamp']):
-                    correct_score = 1
-                else:
-                    bt.logging.info(f"Tampered post! {sample_item}")
-                    bt.logging.info(f"Original post: {searched_item}")
-            else: 
-                bt.logging.info(f"No result returned for {sample_item}")
-
-        try:
-            # calculate scores
-            for i_item, item in enumerate(response):
-                if tag.lower() in item.get('title', '').lower():
-                    relevant_count += 1
-                elif tag.lower() in item['text'].lower():
-                    relevant_count += 1
-
-                # calculate similarity score
-                similarity_score += (id_counts[item['id']] - 1)
-                # calculate time difference score
-                date_object = datetime.fromisoformat(item['timestamp'].rstrip('Z'))
-                age = datetime.utcnow() - date_object
-                age_sum += age.total_seconds()
-        except Exception as e:
-            bt.logging.info(f"Bad format: {e}")
+        # calculate scores
+        relevant_count, similarity_score, age_sum, bad_format = score_response(response_keys[i], response, item_keys[i])
+        if bad_format:
             format_score[i] = 1
 
 
+        similarity_score += near_duplicates[i].item()
         if max_similar_count < similarity_score:
             max_similar_count = similarity_score
-        if max_correct_score < correct_score:
-            max_correct_score = correct_score
 
         similarity_list[i] = similarity_score
         length_list[i] = len(response)
-        correct_list[i] = correct_score
 
         if len(response) > 0:
             relevant_ratio[i] = relevant_count / len(response)
@@ -199,6 +328,56 @@ def calculateScore(responses = [], tag = 'tao'):
             max_average_age = average_age
 
         average_age_list[i] = average_age
+
+    spot_check_posts = []
+    if ingest.verification is not None:
+        with span('verify_wait'):
+            # A fetch that fails or doesn't finish in time gives no items, the round's spot checks then zero no miner.
+            spot_check_posts = verification.service.result(ingest.verification, 'reddit')
+
+    skipped = []
+    for i, response in enumerate(responses):
+        # Do spot check for this miner
+        correct_score = 0
+        if len(response) > 0:
+            verified = 0
+            tampered = False
+            for item_idx in spot_check_idx[i]:
+                sample_item = response[item_idx]
+                sample_id = sample_item.get('id', "")
+                searched_item = next((post for post in spot_check_posts if post['id'] == sample_id), None)
+                if searched_item:
+                    if searched_item['dataType'] == "post" and searched_item.get('title') == sample_item.get('title'):
+                        title_ok = True
+                    elif searched_item['dataType'] == "comment" and not searched_item.get('title'):
+                        title_ok = True
+                    else:
+                        title_ok = False
+                    # Some posts have an empty body, but the apify actor is filling in img/thumbnail in the text
+                    # Consider that a match
+                    text_ok = len(searched_item['text']) == 0 or searched_item['text'] == sample_item['text']
+                    if not (title_ok and text_ok and searched_item['timestamp'] == sample_item['timestamp']):
+                        tampered = True
+                        bt.logging.info(f"Tampered post! {sample_item}")
+                        bt.logging.info(f"Original post: {searched_item}")
+                    else:
+                        verified += 1
+                else: 
+                    bt.logging.info(f"No result returned for {sample_item}")
+            # Items the lookup didn't return are unverified, not failed: the miner passes if one of its samples was
+            # found unchanged, and a round where nothing was found scores no miner down.
+            correct_score = 0 if tampered else int(verified > 0)
+            ingest.record(i, verified == len(spot_check_idx[i]), tampered)
+            if not spot_check_idx[i]:
+                # A trusted miner with no item checked this round scores like the best checked miner.
+                skipped.append(i)
+                continue
+
+        if max_correct_score < correct_score:
+            max_correct_score = correct_score
+        correct_list[i] = correct_score
+    for i in skipped:
+        correct_list[i] = max_correct_score
     
     similarity_list = (similarity_list + 1) / (max_similar_count + 1)
     correct_list = (correct_list + 1) / (max_correct_score + 1)
@@ -239,6 +418,7 @@ def calculateScore(responses = [], tag = 'tao'):
     scoring_metrics = {
         "correct": correct_list,
         "similarity": similarity_list,
+        "near_duplicates": near_duplicates,
         "average_age": average_age_list,
         "time_contrib": age_contribution,
         "length": length_list,
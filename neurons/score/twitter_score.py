@@ -27,8 +27,12 @@ import bittensor as bt
 from urllib.parse import urlparse
 import os
 import re
-import html
 from neurons.queries import get_query, QueryType, QueryProvider
+from neurons.tracing import span
+from neurons import contenthash, similarity, timestamps, trust, verification
+# Removes links, leading mentions, whitespace, and convert html entities
+from neurons.textnorm import text_for_comparison
+from neurons.relevance import RelevanceMatcher
 
 twitter_query = get_query(QueryType.TWITTER, QueryProvider.MICROWORLDS_TWITTER_SCRAPER)
 
@@ -39,36 +43,240 @@ def chunk(it, size):
     return iter(lambda: tuple(islice(it, size)), ())
 
 
-# Removes links, leading mentions, whitespace, and convert html entities
-def text_for_comparison(text):
-    # url shorteners can cause problems with tweet verification, so remove urls from the text comparison.
-    text = re.sub(r'(https?://)?\S+\.\S+\/?(\S+)?', '', text)
-    # Some scrapers put the mentions at the front of the text, remove them.
-    text = re.sub(r'^(@\w+\s*)+', '', text)
-    # And some trim trailing whitespace at the end of newlines, so ignore whitespace.
-    text = re.sub(r'\s+', '', text)
-    # And some have special characters escaped as html entities
-    text = html.unescape(text)
-    # The validator apify actor uses the tweet.text field and not the note_tweet field (> 280) charts, so only
-    # use the first 255 chars for comparison.
-    text = text[:255]
-    return text
-
-def parse_date(dateStr: str):
-    return datetime.strptime(dateStr, '%Y-%m-%d %H:%M:%S+00:00')
-
-def calculateScore(responses = [], tag = 'tao'):
+def _fetch_spot_checks(spot_check_urls: list) -> list:
+    """
+    Fetches the spot check urls, 20 per actor run, retrying the missing ones once. Returns the tweets found, [] on
+    errors.
+    """
+    spot_check_tweets = []
+    try:
+        found_urls = set()
+        tries = 0
+        remaining_urls = set(spot_check_urls)
+        while tries < 2 and len(remaining_urls) > 0:
+            max_tweets_per_url = 1 if tries == 0 else 10 
+            # The verification service batches the urls of several rounds, they are fetched in chunks.
+            for urls in chunk(random.sample(sorted(remaining_urls), k=len(remaining_urls)), 20):
+                bt.logging.info(f"Fetching {len(urls)} tweets out of {len(remaining_urls)} remaining to validate.")
+                with span('verify', items = len(urls), attempt = tries):
+                    batch_tweets = twitter_query.searchByUrl(list(urls), max_tweets_per_url)
+                batch_urls = set([tweet['url'] for tweet in batch_tweets])
+                bt.logging.info(f"Fetched {len(batch_urls)}.")
+                remaining_urls = remaining_urls - set(batch_urls)
+                spot_check_tweets += batch_tweets
+            tries += 1
+        found_urls = [tweet['url'] for tweet in spot_check_tweets]
+        missing_urls = set(spot_check_urls) - set(found_urls)
+        bt.logging.info(f"Missing {len(missing_urls)}/{len(spot_check_urls)} tweets.")
+    except Exception as e:
+        bt.logging.trace(traceback.format_exc())
+        bt.logging.error(f"❌ Error while verifying post: {e}")
+    return spot_check_tweets
+
+
+def _status_id(url: str) -> str:
+    return re.search(r"/status/(\d+)", url).group(1)
+
+
+# Spot checks of all rounds are fetched by the validator's verification service, while calculateScore runs the
+# checks that do not depend on them.
+verification.service.register('twitter', _fetch_spot_checks, request_key = _status_id, item_key = lambda tweet: tweet['id'])
+
+
+def _check_tweet(tweet, now_ts: float, timestamp_of):
+    """
+    Format checks of one tweet. Returns (fake, bad_format, id), the id is None if the tweet is not counted.
+    """
+    fake = False
+    try:
+        # A single tweet in the response in the far future can usually skip validation, but
+        # will effect average age significantly and boost score. A future tweet will invalidate
+        # this response.
+        age = now_ts - timestamp_of(tweet['timestamp'])
+        if age < 0:
+            bt.logging.warning(f"Faked future tweet: {tweet}")
+            fake = True
+
+        tweet_id = tweet['id']
+        if tweet_id not in tweet['url']:
+            fake = True
+
+        parsed_url = urlparse(tweet['url'])
+        # Extract the path from the URL 
+        path = parsed_url.path
+        # Get the last component of the path
+        last_component = os.path.basename(path)
+        if last_component != tweet_id:
+            bt.logging.warning(f"id/url mismatch detected: url={tweet['url']}, id={tweet_id}")
+            fake = True
+        return fake, False, tweet_id
+    except Exception as e:
+        bt.logging.warning(f"❌ Bad format for post: {e}, {tweet}")
+        return fake, True, None
+
+
+def _check_tweets(response, keys: list, check_tweet):
+    """
+    Format checks of one response. Returns (fake, bad_format, ids counted for similarity).
+    """
+    fake = bad_format = False
+    id_list = set()
+    counted_ids = []
+    for tweet, key in zip(response, keys):
+        tweet_fake, tweet_bad_format, tweet_id = check_tweet(key, tweet)
+        fake = fake or tweet_fake
+        bad_format = bad_format or tweet_bad_format
+        if tweet_id is not None:
+            if tweet_id in id_list:
+                fake = True
+            else:
+                id_list.add(tweet_id)
+            counted_ids.append(tweet_id)
+    return fake, bad_format, counted_ids
+
+
+class RoundIngest:
+    """
+    The part of scoring a round that looks at one response at a time: format checks, id counting and the choice of
+    the spot check sample. Responses can be added as they arrive, e.g. by neurons.streaming.query; calculateScore
+    finishes the round with the terms that need all of them.
+    """
+
+    def __init__(self, size: int, tag = 'tao', now: datetime = None, responses: list = None, miners: list = None):
+        """
+        Args:
+            size (int): The number of miners queried.
+            tag (str): The tag of responses.
+            now (datetime): The (naive, UTC) time ages are measured from. Defaults to the current time.
+            responses (list): The list responses are collected in, a new one by default.
+            miners (list): The (uid, hotkey) of each miner queried. The items checked are then planned by
+                trust.sampler from the history of the miner; without them one random item of every response is checked.
+        """
+        self.tag = tag
+        self.miners = miners
+        self.responses = responses if responses is not None else [None] * size
+        self.added = [False] * size
+        self.now_ts = timestamps.epoch(now if now is not None else datetime.utcnow())
+        # Each distinct timestamp is parsed once per round, for both passes and for tweets returned by several miners.
+        self.timestamp_of = timestamps.ParseCache(timestamps.parse_twitter_timestamp)
+        self.relevance = RelevanceMatcher([tag])
+
+        self.format_score = torch.zeros(size)
+        self.fake_score = torch.zeros(size)
+        self.spot_check_idx = [None] * size
+        self.spot_check_urls = []
+        self.verification = None
+
+        # Miners running the same code return the same tweets, and often the same responses. Every tweet and response
+        # is keyed by content once; each distinct tweet and response is then checked, and later scored, once per round.
+        check_tweet = contenthash.Memo(lambda tweet: _check_tweet(tweet, self.now_ts, self.timestamp_of))
+        self.check_response = contenthash.Memo(lambda response, keys: _check_tweets(response, keys, check_tweet))
+        self.item_keys = [None] * size
+        self.response_keys = [None] * size
+        # Count the number of occurrences of each ID
+        self.id_counts = {}
+
+    def select(self, i: int, response):
+        """
+        Takes response i and chooses the items of it that are spot checked.
+        """
+        if response == None:
+            response = []
+            self.format_score[i] = 1
+        self.responses[i] = response
+        # Choose random responses from each miner to compare, and gather their urls
+        if len(response) > 0:
+            if self.miners is None:
+                self.spot_check_idx[i] = [random.randrange(len(response))]
+            else:
+                self.spot_check_idx[i] = trust.sampler.plan(self.miners[i], len(response), 'twitter')
+            for item_idx in self.spot_check_idx[i]:
+                url = response[item_idx].get('url')
+                if url and re.search("(twitter.com|x.com)\/\w+\/status\/\d+", url):
+                    self.spot_check_urls.append(url)
+
+    def start_verification(self):
+        """
+        Starts fetching the spot check urls chosen so far, the fetch runs while the round is checked and scored.
+        """
+        if self.verification is None and len(self.spot_check_urls) > 0:
+            self.verification = verification.service.submit('twitter', self.spot_check_urls)
+
+    def check(self, i: int):
+        """
+        Format checks of response i, and counts its ids.
+        """
+        response = self.responses[i]
+        keys = [contenthash.item_key(tweet) for tweet in response]
+        self.item_keys[i] = keys
+        self.response_keys[i] = contenthash.response_key(keys)
+        fake, bad_format, counted_ids = self.check_response(self.response_keys[i], response, keys)
+        if fake:
+            self.fake_score[i] = 1
+        if bad_format:
+            self.format_score[i] = 1
+        for tweet_id in counted_ids:
+            self.id_counts[tweet_id] = self.id_counts.get(tweet_id, 0) + 1
+        self.added[i] = True
+
+    def record(self, i: int, verified: bool, tampered: bool):
+        """
+        Adds the outcome of the spot check of response i to the history of its miner: a pass if every item checked
+        was verified, a failure if one differed from the original.
+        """
+        if self.miners is None or not self.spot_check_idx[i]:
+            return
+        # Items the lookup didn't return are unverified, not failed: lookups miss items of honest miners too.
+        if tampered:
+            trust.sampler.record(self.miners[i], False)
+        elif verified:
+            trust.sampler.record(self.miners[i], True)
+
+    def add(self, i: int, response):
+        """
+        Ingests response i as it arrives.
+        """
+        self.select(i, response)
+        self.check(i)
+
+    def close(self):
+        """
+        Counts the miners that did not answer as empty responses and starts the spot check fetch.
+        """
+        for i, added in enumerate(self.added):
+            if not added:
+                self.add(i, None)
+        self.start_verification()
+
+
+def calculateScore(responses = [], tag = 'tao', now: datetime = None, ingest: RoundIngest = None, miners: list = None):
     """
     This function calculates the score of responses.
     The score is calculated by the degree of similarity between responses, accuracy and time difference.
     Args:
         responses (list): The list of responses.
         tag (str): The tag of responses.
+        now (datetime): The (naive, UTC) time ages are measured from. Defaults to the current time.
+        ingest (RoundIngest): Responses already ingested as they arrived; responses, tag and now are taken from it.
+        miners (list): The (uid, hotkey) of each response, whose spot check history decides which items are checked.
     Returns:
         list: The list of scores for each response.
     """
+    if ingest is None:
+        ingest = RoundIngest(len(responses), tag, now, responses, miners)
+        for i, response in enumerate(responses):
+            ingest.select(i, response)
+        # Fetch spot check urls while the checks below run, they only meet when the samples are compared.
+        ingest.start_verification()
+        for i in range(len(responses)):
+            ingest.check(i)
+    ingest.close()
+    responses = ingest.responses
     if len(responses) == 0:
         return []
+    now_ts, timestamp_of, relevance = ingest.now_ts, ingest.timestamp_of, ingest.relevance
+    format_score, fake_score, id_counts = ingest.format_score, ingest.fake_score, ingest.id_counts
+    item_keys, response_keys, spot_check_idx = ingest.item_keys, ingest.response_keys, ingest.spot_check_idx
     
     # Initialize variables
     # Initialize score list. The length of score list is the same as the length of responses.
@@ -90,143 +298,57 @@ def calculateScore(responses = [], tag = 'tao'):
     max_length = 0
     relevant_ratio = torch.zeros(len(responses))
 
-    format_score = torch.zeros(len(responses))
-    fake_score = torch.zeros(len(responses))
-    
-    # Count the number of occurrences of each ID
-    id_counts = {}
-    for i, response in enumerate(responses):
+    # Items copied from other miners under new ids escape id_counts, they are counted by text instead.
+    with span('near_duplicates'):
+        near_duplicates = similarity.near_duplicate_counts(responses, lambda item: item['text'])
 
-        if response == None:
-            responses[i] = []
-            response = []
-            format_score[i] = 1
-        id_list = []
-        for tweet in response:
-            try:
-                # A single tweet in the response in the far future can usually skip validation, but
-                # will effect average age significantly and boost score. A future tweet will invalidate
-                # this response.
-                date_object = parse_date(tweet['timestamp'])
-                age = datetime.utcnow() - date_object
-                if age.total_seconds() < 0:
-                    bt.logging.warning(f"Faked future tweet: {tweet}")
-                    fake_score[i] = 1
-
-                if tweet['id'] in id_list or tweet['id'] not in tweet['url']:
-                    fake_score[i] = 1
-                else:
-                    id_list.append(tweet['id'])
-                
-                parsed_url = urlparse(tweet['url'])
-                # Extract the path from the URL 
-                path = parsed_url.path
-                # Get the last component of the path
-                last_component = os.path.basename(path)
-                if last_component != tweet['id']:
-                    bt.logging.warning(f"miner {i} id/url mismatch detected: url={tweet['url']}, id={tweet['id']}")
-                    fake_score[i] = 1
-
-                tweet_id = tweet['id']
-                if tweet_id in id_counts:
-                    id_counts[tweet_id] += 1
-                else:
-                    id_counts[tweet_id] = 1
-            except Exception as e:
-                bt.logging.warning(f"❌ Bad format for post: {e}, {tweet}")
-                format_score[i] = 1
-
-    # Choose random responses from each miner to compare, and gather their urls
-    spot_check_idx = []
-    spot_check_urls = []
-    spot_check_tweets = []
-    for i, response in enumerate(responses):
-        if len(response) > 0:
-            item_idx = random.randrange(len(response))
-            spot_check_idx.append(item_idx)
-            url = response[item_idx].get('url')
-            if url and re.search("(twitter.com|x.com)\/\w+\/status\/\d+", url):
-                spot_check_urls.append(url)
-        else:
-            spot_check_idx.append(None)
-
-    # Fetch spot check urls
-    if len(spot_check_urls) > 0:
+    def score_tweet(item):
+        relevant = relevance.matches(item['text']) or relevance.matches_lowered(item.get('username', ''))
+        # calculate time difference score
         try:
-            spot_check_tweets = []
-            found_urls = set()
-            tries = 0
-            remaining_urls = set(spot_check_urls)
-            while tries < 2 and len(remaining_urls) > 0:
-                urls = random.sample(remaining_urls, k=min(20, len(remaining_urls)))
-                bt.logging.info(f"Fetching {len(urls)} tweets out of {len(remaining_urls)} remaining to validate.")
-                max_tweets_per_url = 1 if tries == 0 else 10 
-                batch_tweets = twitter_query.searchByUrl(urls, max_tweets_per_url)
-                batch_urls = set([tweet['url'] for tweet in batch_tweets])
-                bt.logging.info(f"Fetched {len(batch_urls)}.")
-                remaining_urls = remaining_urls - set(batch_urls)
-                spot_check_tweets += batch_tweets
-                tries += 1
-            found_urls = [tweet['url'] for tweet in spot_check_tweets]
-            missing_urls = set(spot_check_urls) - set(found_urls)
-            bt.logging.info(f"Missing {len(missing_urls)}/{len(spot_check_urls)} tweets.")
+            return relevant, now_ts - timestamp_of(item['timestamp'])
         except Exception as e:
-            print(traceback.format_exc())
-            bt.logging.error(f"❌ Error while verifying post: {e}")
+            bt.logging.info(f"Tweet had bad date format: {e}")
+            return relevant, None
+
+    def score_tweets(response, keys):
+        relevant_count = similarity_score = age_sum = 0
+        bad_date = False
+        for item, key in zip(response, keys):
+            relevant, age = score_item(key, item)
+            if relevant:
+                relevant_count += 1
+            # calculate similarity score
+            similarity_score += (id_counts[item['id']] - 1)
+            if age is None:
+                bad_date = True
+            else:
+                age_sum += age
+        return relevant_count, similarity_score, age_sum, bad_date
+
+    score_item = contenthash.Memo(score_tweet)
+    score_response = contenthash.Memo(score_tweets)
 
     # Calculate score for each response
     for i, response in enumerate(responses):
         # initialize variables
-        similarity_score = 0
-        relevant_count = 0
-        age_sum = 0
         total_length += len(response)
         # calculate max_length
         if len(response) > max_length:
             max_length = len(response)
 
-        # Do spot check for this miner
-        correct_score = 0
-        if len(response) > 0:
-            sample_item = response[spot_check_idx[i]]
-            searched_item = next((tweet for tweet in spot_check_tweets if tweet['id'] == sample_item['id']), None)
-            if searched_item:
-                # Normalize text to account for variations in scraped data.
-                miner_text = text_for_comparison(sample_item['text'])
-                verify_text = text_for_comparison(searched_item['text'])
-
-                if(verify_text == miner_text and searched_item['timestamp'] == sample_item['timestamp']):
-                    correct_score = 1
-                else:
-                    bt.logging.info(f"Tampered tweet! (idx = {i}) {sample_item}")
-                    bt.logging.info(f"Original tweet: {searched_item}")
-            else: 
-                bt.logging.info(f"No result returned for {sample_item} (miner_idx={i})")
-
         # calculate scores
-        for item in response:
-            if tag.lower() in item['text'].lower() or tag.lower() in item.get('username', ''):
-                relevant_count += 1
-            # calculate similarity score
-            similarity_score += (id_counts[item['id']] - 1)
-            # calculate time difference score
-            try:
-                date_object = parse_date(item['timestamp'])
-                age = datetime.utcnow() - date_object
-                age_sum += age.total_seconds()
-            except Exception as e:
-                # Mark as fake data if date format incorrect
-                fake_score[i] = 1
-                bt.logging.info(f"Tweet had bad date format: {e}")
+        relevant_count, similarity_score, age_sum, bad_date = score_response(response_keys[i], response, item_keys[i])
+        if bad_date:
+            # Mark as fake data if date format incorrect
+            fake_score[i] = 1
 
+        similarity_score += near_duplicates[i].item()
         if max_similar_count < similarity_score:
             max_similar_count = similarity_score
-        if max_correct_score < correct_score:
-            max_correct_score = correct_score
 
         similarity_list[i] = similarity_score
         length_list[i] = len(response)
-        correct_list[i] = correct_score
 
         if len(response) > 0:
             relevant_ratio[i] = relevant_count / len(response)
@@ -240,6 +362,50 @@ def calculateScore(responses = [], tag = 'tao'):
 
         average_age_list[i] = average_age
 
+    spot_check_tweets = []
+    if ingest.verification is not None:
+        with span('verify_wait'):
+            # A fetch that fails or doesn't finish in time gives no items, the round's spot checks then zero no miner.
+            spot_check_tweets = verification.service.result(ingest.verification, 'twitter')
+
+    skipped = []
+    for i, response in enumerate(responses):
+        # Do spot check for this miner
+        correct_score = 0
+        if len(response) > 0:
+            verified = 0
+            tampered = False
+            for item_idx in spot_check_idx[i]:
+                sample_item = response[item_idx]
+                searched_item = next((tweet for tweet in spot_check_tweets if tweet['id'] == sample_item['id']), None)
+                if searched_item:
+                    # Normalize text to account for variations in scraped data.
+                    miner_text = text_for_comparison(sample_item['text'])
+                    verify_text = text_for_comparison(searched_item['text'])
+
+                    if not (verify_text == miner_text and searched_item['timestamp'] == sample_item['timestamp']):
+                        tampered = True
+                        bt.logging.info(f"Tampered tweet! (idx = {i}) {sample_item}")
+                        bt.logging.info(f"Original tweet: {searched_item}")
+                    else:
+                        verified += 1
+                else: 
+                    bt.logging.info(f"No result returned for {sample_item} (miner_idx={i})")
+            # Items the lookup didn't return are unverified, not failed: the miner passes if one of its samples was
+            # found unchanged, and a round where nothing was found scores no miner down.
+            correct_score = 0 if tampered else int(verified > 0)
+            ingest.record(i, verified == len(spot_check_idx[i]), tampered)
+            if not spot_check_idx[i]:
+                # A trusted miner with no item checked this round scores like the best checked miner.
+                skipped.append(i)
+                continue
+
+        if max_correct_score < correct_score:
+            max_correct_score = correct_score
+        correct_list[i] = correct_score
+    for i in skipped:
+        correct_list[i] = max_correct_score
+
 
     similarity_list = (similarity_list + 1) / (max_similar_count + 1)
     correct_list = (correct_list + 1) / (max_correct_score + 1)
@@ -279,6 +445,7 @@ def calculateScore(responses = [], tag = 'tao'):
     scoring_metrics = {
         "correct": correct_list,
         "similarity": similarity_list,
+        "near_duplicates": near_duplicates,
         "average_age": average_age_list,
         "time_contrib": age_contribution,
         "length": length_list,
@@ -0,0 +1,144 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Per-platform miner scores of the validator.
+#
+# Each platform ('twitter', 'reddit') keeps its own exponential moving average of the normalized scores of its
+# rounds, one row of a (platforms, uids) tensor. A round updates the rows of the miners it queried with one indexed
+# operation; the weights set on chain are the mix of the platform rows. The tensor keeps spare capacity, so uids
+# registered later are zeros already there, and uids whose hotkey changed start over from zero.
+#
+#   state = ScoreState({'twitter': 0.7, 'reddit': 0.7}, mix = {'twitter': 0.5, 'reddit': 0.5})
+#   state.sync(metagraph.hotkeys)
+#   state.update('twitter', dendrites_to_query, scoring_metrics['normalized_scores'])
+#   weights = state.scores() / torch.sum(state.scores())
+
+import torch
+import bittensor as bt
+
+
+class ScoreState:
+    """
+    Moving averages of miner scores per platform and their mix.
+    """
+
+    def __init__(self, alphas: dict, mix: dict = None, size: int = 0, capacity: int = 256):
+        """
+        Args:
+            alphas (dict): Platform name to the weight the previous average keeps in an update, e.g. 0.7.
+            mix (dict): Platform name to its share of the combined scores, normalized to sum to 1. Platforms left
+                out get no share; all platforms share equally without a mix.
+            size (int): Number of uids.
+            capacity (int): Uids the tensor has room for before it is reallocated.
+        """
+        self.platforms = list(alphas)
+        self.index = {platform: row for row, platform in enumerate(self.platforms)}
+        self.alphas = torch.tensor([alphas[platform] for platform in self.platforms], dtype=torch.float32)
+        self.set_mix(mix)
+        self.size = 0
+        self.platform_scores = torch.zeros(len(self.platforms), max(capacity, size), dtype=torch.float32)
+        self.hotkeys = []
+        self.resize(size)
+
+    def set_mix(self, mix: dict = None):
+        shares = torch.tensor([mix.get(platform, 0.0) if mix else 1.0 for platform in self.platforms], dtype=torch.float32)
+        if torch.sum(shares) <= 0:
+            raise ValueError(f"Score mix must have a positive share: {mix}")
+        self.mix = shares / torch.sum(shares)
+
+    def resize(self, size: int):
+        """
+        Sets the number of uids. New uids start at zero; the tensor grows by doubling, not per uid.
+        """
+        capacity = self.platform_scores.shape[1]
+        if size > capacity:
+            grown = torch.zeros(len(self.platforms), max(size, 2 * capacity), dtype=torch.float32)
+            grown[:, :self.size] = self.platform_scores[:, :self.size]
+            self.platform_scores = grown
+        elif size < self.size:
+            # Dropped uids are cleared, so that they start at zero if they come back.
+            self.platform_scores[:, size:self.size] = 0
+        self.size = size
+        self.hotkeys = self.hotkeys[:size] + [None] * (size - len(self.hotkeys))
+
+    def sync(self, hotkeys: list):
+        """
+        Follows the metagraph: adds uids, and clears the scores of uids registered to a new hotkey.
+        """
+        self.resize(len(hotkeys))
+        replaced = [uid for uid, (old, new) in enumerate(zip(self.hotkeys, hotkeys)) if old is not None and old != new]
+        if replaced:
+            bt.logging.info(f"Resetting scores of uids with a new hotkey: {replaced}")
+            self.platform_scores[:, replaced] = 0
+        self.hotkeys = list(hotkeys)
+
+    def seed(self, scores: torch.Tensor):
+        """
+        Starts every platform from combined scores, e.g. ones saved before scores were kept per platform.
+        """
+        scores = torch.as_tensor(scores, dtype=torch.float32).flatten()
+        self.resize(max(self.size, len(scores)))
+        self.platform_scores[:, :len(scores)] = scores
+
+    def update(self, platform: str, uids: list, scores):
+        """
+        Moves the averages of platform for uids towards their scores of a round.
+        """
+        if len(scores) == 0:
+            return
+        row = self.index[platform]
+        uids = torch.as_tensor(uids[:len(scores)], dtype=torch.long)
+        scores = torch.as_tensor(scores, dtype=torch.float32)
+        alpha = self.alphas[row]
+        self.platform_scores[row].index_put_((uids,), alpha * self.platform_scores[row, uids] + (1 - alpha) * scores)
+
+    def mask(self, keep):
+        """
+        Multiplies the scores of every platform by keep, e.g. zeroing uids without an axon ip.
+        """
+        keep = torch.as_tensor(keep, dtype=torch.float32)
+        self.platform_scores[:, :len(keep)] *= keep
+
+    def state_dict(self):
+        """
+        Returns (tensors, meta) to checkpoint the averages with, see neurons/checkpoint.py.
+        """
+        return {'platform_scores': self.platform_scores[:, :self.size]}, {'platforms': self.platforms, 'hotkeys': self.hotkeys}
+
+    def load_state_dict(self, tensors: dict, meta: dict):
+        """
+        Restores averages saved by state_dict. Platforms the checkpoint doesn't have start at zero.
+        """
+        platform_scores = tensors['platform_scores']
+        self.resize(max(self.size, platform_scores.shape[1]))
+        self.platform_scores[:, :self.size] = 0
+        for row, platform in enumerate(meta.get('platforms', [])):
+            if platform in self.index:
+                self.platform_scores[self.index[platform], :platform_scores.shape[1]] = platform_scores[row]
+        hotkeys = meta.get('hotkeys', [])
+        self.hotkeys = hotkeys[:self.size] + [None] * (self.size - len(hotkeys))
+
+    def platform(self, platform: str) -> torch.Tensor:
+        return self.platform_scores[self.index[platform], :self.size]
+
+    def scores(self) -> torch.Tensor:
+        """
+        The mix of the platform scores, one per uid.
+        """
+        return self.mix @ self.platform_scores[:, :self.size]
@@ -1,13 +1,102 @@
-
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import bittensor as bt
+
+DEFAULT_PERCIPIO_API_URL = "https://api.percip.io"
+
+
+def _quote(id) -> str:
+    # Ids come from miners: a '#', '?' or ',' in one must not cut off or split the other ids of its url.
+    return quote(str(id), safe='')
+
 
 class PercipioRedditLookup:
     """
     A class for verifing reddit ids from the percip.io service
+
+    The ids of a lookup are sent comma separated in the url path, split into chunks that keep each url under
+    `max_url_length`. The chunks are fetched in parallel over one pooled session with timeouts and retries, and
+    the posts found are cached by id for `cache_seconds`, so ids looked up again are not fetched again.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, base_url: str = None, max_url_length: int = 2000, max_workers: int = 4,
+                 timeout: tuple = (3.05, 20), retries: int = 3, cache_seconds: float = None, cache_size: int = 20000):
+        """
+        Args:
+            base_url (str): The percipio API url. Defaults to PERCIPIO_API_URL or the production server.
+            max_url_length (int): Length a request url is kept under.
+            max_workers (int): Chunks fetched at the same time, and connections kept alive.
+            timeout (tuple): (connect, read) timeouts in seconds.
+            retries (int): Retries on connection and read errors and 429/5xx responses.
+            cache_seconds (float): Seconds found posts are reused for, 0 disables the cache. Defaults to
+                PERCIPIO_CACHE_SECONDS or 600.
+            cache_size (int): Posts cached at most, the oldest are dropped beyond that.
+        """
+        self.base_url = (base_url or os.getenv("PERCIPIO_API_URL") or DEFAULT_PERCIPIO_API_URL).rstrip('/')
+        self.max_url_length = max_url_length
+        self.timeout = timeout
+        self.cache_seconds = cache_seconds if cache_seconds is not None else float(os.getenv("PERCIPIO_CACHE_SECONDS", 600))
+        self.cache_size = cache_size
+
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"],
+                      raise_on_status=False)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="percipio")
+
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def chunks(self, ids: list) -> list:
+        """
+        Splits ids into lists whose request url stays under max_url_length; an id too long for that is sent alone.
+        """
+        prefix = len(self.base_url + '/reddit_ids/')
+        chunks, current, length = [], [], prefix
+        for id in ids:
+            size = len(_quote(id)) + 1
+            if current and length + size > self.max_url_length:
+                chunks.append(current)
+                current, length = [], prefix
+            current.append(id)
+            length += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _fetch(self, ids: list) -> list:
+        url = self.base_url + '/reddit_ids/' + ','.join(_quote(id) for id in ids)
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            bt.logging.warning(f"Failed to retrieve {len(ids)} reddit ids from percipio: {e}")
+            return []
+        finally:
+            with self.lock:
+                self.requests += 1
+
+        # Check if the request was successful
+        if response.status_code == 200:
+            # Parse JSON data
+            try:
+                return response.json()
+            except ValueError as e:
+                bt.logging.warning(f"Invalid percipio response for {len(ids)} reddit ids: {e}")
+                return []
+        else:
+            bt.logging.warning(f"Failed to retrieve {len(ids)} reddit ids from percipio: HTTP {response.status_code}")
+            return []
 
     def lookup(self, ids: [int] = ["bittensor"]) -> list:
         """
@@ -19,18 +108,29 @@ class PercipioRedditLookup:
         Returns:
             list: A list of reddit posts/comments/etc.
         """
+        ids = list(dict.fromkeys(ids))
+        now = time.monotonic()
+        found, missing = [], []
+        with self.lock:
+            for id in ids:
+                entry = self.cache.get(id)
+                if entry is not None and now - entry[0] <= self.cache_seconds:
+                    found.append(entry[1])
+                else:
+                    missing.append(id)
 
-        ids_str = ','.join(ids)
-        url = 'https://api.percip.io/reddit_ids/' + ids_str
-        response = requests.get(url)
+        for items in self.executor.map(self._fetch, self.chunks(missing)):
+            found += items
+            if self.cache_seconds > 0:
+                with self.lock:
+                    for item in items:
+                        if isinstance(item, dict) and 'id' in item:
+                            self.cache[item['id']] = (now, item)
+                            self.cache.move_to_end(item['id'])
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+        return found
 
-        # Check if the request was successful
-        if response.status_code == 200:
-            # Parse JSON data
-            return response.json()
-        else:
-            print('Failed to retrieve data')
-            return []
 
 if __name__ == '__main__':
     # Initialize the tweet scraper query mechanism with the actor configuration
@@ -0,0 +1,191 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Near-duplicate detection across the items of a round with MinHash and LSH.
+#
+# Each item text is reduced to word 3-gram shingles, every shingle set to a MinHash signature of NUM_PERMUTATIONS
+# values (computed for all items at once with torch), and the signatures are split into BANDS bands. Items sharing
+# a band are candidates; candidates whose signatures agree on at least THRESHOLD of their values are merged into
+# one cluster. The work is linear in the number of shingles and items, not quadratic in the items.
+
+import zlib
+import torch
+from neurons import textnorm
+
+NUM_PERMUTATIONS = 32
+BANDS = 8
+# Estimated Jaccard similarity of the shingle sets from which two texts count as near duplicates. With 8 bands of
+# 4 rows, pairs at 0.7 become candidates with a probability of 0.9 and pairs at 0.3 with one of 0.06.
+THRESHOLD = 0.7
+SHINGLE_SIZE = 3
+
+_PRIME = 2**31 - 1
+_generator = torch.Generator().manual_seed(0x5EED)
+_A = torch.randint(1, _PRIME, (NUM_PERMUTATIONS, 1), generator=_generator, dtype=torch.int64)
+_B = torch.randint(0, _PRIME, (NUM_PERMUTATIONS, 1), generator=_generator, dtype=torch.int64)
+
+
+class _WordHashes(dict):
+    # crc32 rather than hash() keeps shingles the same in every process, so validators agree on the clusters.
+    def __missing__(self, word: str) -> int:
+        value = self[word] = zlib.crc32(word.encode())
+        return value
+
+
+def shingles(texts: list):
+    """
+    Hashes of the word SHINGLE_SIZE-grams of each text, texts of fewer words are one shingle of all of them.
+
+    Returns:
+        (values, segments): int64 tensors of the shingle hashes and of the index of the text each belongs to.
+    """
+    word_hashes = _WordHashes()
+    flat, lengths = [], []
+    for text in texts:
+        tokens = textnorm.words(text)
+        flat.extend(map(word_hashes.__getitem__, tokens))
+        lengths.append(len(tokens))
+    if not flat:
+        return torch.zeros(0, dtype=torch.int64), torch.zeros(0, dtype=torch.int64)
+    lengths = torch.tensor(lengths, dtype=torch.int64)
+    words = torch.tensor(flat, dtype=torch.int64)
+    owner = torch.repeat_interleave(torch.arange(len(texts)), lengths)
+    # Position of each word in its text, a gram starts wherever SHINGLE_SIZE words of the same text follow, or at
+    # the first word of a shorter text.
+    position = torch.arange(len(flat)) - torch.repeat_interleave(torch.cumsum(lengths, 0) - lengths, lengths)
+    text_length = lengths[owner]
+    starts = (position + SHINGLE_SIZE <= text_length) | ((position == 0) & (text_length < SHINGLE_SIZE))
+    values = torch.zeros(int(starts.sum()), dtype=torch.int64)
+    start_index = torch.nonzero(starts).flatten()
+    for offset in range(SHINGLE_SIZE):
+        index = (start_index + offset).clamp(max=len(flat) - 1)
+        # Grams of short texts are padded with zeros instead of running into the next text.
+        same_text = (owner[index] == owner[start_index]) & (start_index + offset < len(flat))
+        values = (values * 1000003 + torch.where(same_text, words[index], 0)) % _PRIME
+    return values, owner[start_index]
+
+
+def signatures(values: torch.Tensor, segments: torch.Tensor, count: int, chunk: int = 8) -> torch.Tensor:
+    """
+    MinHash signatures, a (NUM_PERMUTATIONS, count) int64 tensor. Texts without shingles get all _PRIME.
+    """
+    result = torch.full((NUM_PERMUTATIONS, count), _PRIME, dtype=torch.int64)
+    for start in range(0, NUM_PERMUTATIONS, chunk):
+        hashed = (_A[start:start + chunk] * values + _B[start:start + chunk]) % _PRIME
+        result[start:start + chunk].scatter_reduce_(1, segments.expand(hashed.shape[0], -1), hashed, reduce='amin')
+    return result
+
+
+def _find(parent: list, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def clusters(texts: list) -> list:
+    """
+    Cluster id of each text; texts without a near duplicate are their own cluster. Texts without words are never
+    merged.
+    """
+    # Identical texts are one cluster from the start, only the distinct ones are hashed. Blank texts stay apart.
+    distinct, distinct_texts, text_index = {}, [], []
+    for position, text in enumerate(texts):
+        key = text if text.strip() else ('blank', position)
+        index = distinct.get(key)
+        if index is None:
+            index = distinct[key] = len(distinct_texts)
+            distinct_texts.append(text)
+        text_index.append(index)
+    parent = list(range(len(distinct_texts)))
+    if len(distinct_texts) >= 2:
+        _merge_near_duplicates(distinct_texts, parent)
+    return [_find(parent, i) for i in text_index]
+
+
+def _merge_near_duplicates(texts: list, parent: list):
+    count = len(texts)
+    values, segments = shingles(texts)
+    non_empty = torch.bincount(segments, minlength=count) > 0
+    signature = signatures(values, segments, count)
+    rows = NUM_PERMUTATIONS // BANDS
+    index = torch.arange(count)
+    weights = torch.tensor([1000003 ** power for power in range(rows)], dtype=torch.int64)
+    for band in range(BANDS):
+        # Multiplying wraps around in int64, collisions only make extra candidates that the check below rejects.
+        keys = (signature[band * rows:(band + 1) * rows] * weights[:, None]).sum(0)
+        _, bucket = torch.unique(keys, return_inverse=True)
+        first = torch.full((int(bucket.max()) + 1,), count, dtype=torch.int64).scatter_reduce(0, bucket, index, reduce='amin')
+        representative = first[bucket]
+        candidates = (representative != index) & non_empty
+        if not bool(candidates.any()):
+            continue
+        items, others = index[candidates], representative[candidates]
+        agreement = (signature[:, items] == signature[:, others]).float().mean(0)
+        for item, other in zip(items[agreement >= THRESHOLD].tolist(), others[agreement >= THRESHOLD].tolist()):
+            root_item, root_other = _find(parent, item), _find(parent, other)
+            if root_item != root_other:
+                parent[root_item] = root_other
+
+
+def near_duplicate_counts(responses: list, text_of) -> torch.Tensor:
+    """
+    For each response, the number of its items that have a near duplicate with a different id in another
+    response. Copies under the same id are left to the exact id counting of calculateScore.
+
+    Args:
+        responses (list): The miner responses of a round, lists of item dicts.
+        text_of (function): Returns the text of an item that is compared, e.g. `lambda item: item['text']`.
+    """
+    owners, ids, texts = [], [], []
+    for i, response in enumerate(responses):
+        for item in response or []:
+            try:
+                text, item_id = text_of(item), item['id']
+                hash(item_id)
+            except Exception:
+                continue
+            if isinstance(text, str):
+                owners.append(i)
+                ids.append(item_id)
+                texts.append(text)
+
+    counts = torch.zeros(len(responses))
+    if len(texts) < 2:
+        return counts
+    cluster_of = clusters(texts)
+
+    members = {}
+    for position, cluster in enumerate(cluster_of):
+        members.setdefault(cluster, []).append(position)
+    for positions in members.values():
+        if len(positions) < 2:
+            continue
+        by_owner, by_id, by_owner_id = {}, {}, {}
+        for position in positions:
+            owner, item_id = owners[position], ids[position]
+            by_owner[owner] = by_owner.get(owner, 0) + 1
+            by_id[item_id] = by_id.get(item_id, 0) + 1
+            by_owner_id[(owner, item_id)] = by_owner_id.get((owner, item_id), 0) + 1
+        for position in positions:
+            owner, item_id = owners[position], ids[position]
+            # Members from another response under another id.
+            if len(positions) - by_owner[owner] - by_id[item_id] + by_owner_id[(owner, item_id)] > 0:
+                counts[owner] += 1
+    return counts
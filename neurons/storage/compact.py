@@ -0,0 +1,233 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Compaction job for the date/hour partitioned scraping buckets.
+#
+# Every validator round writes one small object into `<prefix>/dt=YYYY-MM-DD/hour=HH/`. This job merges
+# the small objects of a partition into a few large `compacted/part-NNNNN.csv` files and writes a
+# `_manifest.json` next to them, so readers can decide from the manifest alone whether a partition is
+# relevant (row counts, timestamp ranges) without listing or reading every object.
+# Scoring metrics are batched into block sharded objects by neurons/storage/metrics_sink.py and need no compaction.
+#
+# Usage:
+#   python -m neurons.storage.compact --bucket twitterscrapingbucket --prefix twitter --date 2023-11-20
+
+import argparse
+import csv
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+import bittensor as bt
+from botocore.exceptions import ClientError
+from . import store
+
+MANIFEST_NAME = '_manifest.json'
+COMPACTED_DIR = 'compacted'
+# Indexing rows point at the objects of these buckets by file name, and index readers don't read manifests.
+INDEXED_BUCKETS = {'twitterscrapingbucket', 'redditscrapingbucket'}
+
+
+def partition_prefix(prefix: str, date: str, hour: int) -> str:
+    return f"{prefix}/dt={date}/hour={hour:02}/"
+
+
+def load_manifest(bucket, partition: str) -> dict:
+    """
+    Loads the manifest of a partition, or returns an empty one if the partition was never compacted.
+    Any other error is raised: taking it for "never compacted" would write over the existing parts.
+    """
+    try:
+        body = bucket.Object(partition + MANIFEST_NAME).get()['Body'].read()
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404', 'NotFound'):
+            return {"partition": partition, "parts": [], "sources": []}
+        raise
+    return json.loads(body)
+
+
+def list_small_objects(bucket, partition: str) -> list:
+    """
+    Lists the objects of a partition that still need compaction (everything except compacted parts and the manifest).
+    """
+    keys = []
+    for obj in bucket.objects.filter(Prefix=partition):
+        relative = obj.key[len(partition):]
+        if relative == MANIFEST_NAME or relative.startswith(COMPACTED_DIR + '/'):
+            continue
+        keys.append(obj.key)
+    return sorted(keys)
+
+
+class _CsvPart:
+    def __init__(self):
+        self.header = None
+        self.chunks = []
+        self.size = 0
+        self.rows = 0
+        self.min_timestamp = None
+        self.max_timestamp = None
+
+    def add(self, body: str):
+        # csv.DictWriter terminates rows with \r\n; keep the rows byte for byte, quoted newlines included.
+        terminator = '\r\n' if '\r\n' in body else '\n'
+        header, _, rows = body.partition(terminator)
+        if header == '':
+            return
+        if self.header is None:
+            self.header = header + terminator
+            self.size += len(self.header)
+        fieldnames = header.split(',')
+        timestamp_idx = fieldnames.index('timestamp') if 'timestamp' in fieldnames else None
+        for row in csv.reader(StringIO(rows)):
+            if len(row) == 0:
+                continue
+            self.rows += 1
+            if timestamp_idx is None or len(row) <= timestamp_idx:
+                continue
+            # Timestamps are fixed format strings per platform, so string comparison orders them.
+            ts = row[timestamp_idx]
+            if self.min_timestamp is None or ts < self.min_timestamp:
+                self.min_timestamp = ts
+            if self.max_timestamp is None or ts > self.max_timestamp:
+                self.max_timestamp = ts
+        self.chunks.append(rows)
+        self.size += len(rows)
+
+    def body(self) -> str:
+        return self.header + ''.join(self.chunks)
+
+    def describe(self) -> dict:
+        return {"rows": self.rows, "min_timestamp": self.min_timestamp, "max_timestamp": self.max_timestamp}
+
+
+def _summarize(parts: list) -> dict:
+    summary = {"rows": sum(part["rows"] for part in parts)}
+    for field, fn in [("min_timestamp", min), ("max_timestamp", max)]:
+        values = [part[field] for part in parts if part.get(field) is not None]
+        if len(values) > 0:
+            summary[field] = fn(values)
+    return summary
+
+
+def compact_partition(bucket_name: str, prefix: str, date: str, hour: int, target_size: int = 64 * 1024 * 1024, delete_source: bool = False, dry_run: bool = False) -> dict:
+    """
+    Merges the small objects of one partition into parts of roughly `target_size` bytes and updates its manifest.
+
+    Args:
+        bucket_name (str): The bucket holding the partition, e.g. 'twitterscrapingbucket'.
+        prefix (str): The top level prefix, e.g. 'twitter' or 'reddit'.
+        date (str): The partition date, YYYY-MM-DD.
+        hour (int): The partition hour (UTC).
+        target_size (int): Approximate size in bytes of each compacted part.
+        delete_source (bool): Delete the small objects once the parts and the manifest are written. Refused for
+            INDEXED_BUCKETS, whose indexing rows still point at the small objects.
+        dry_run (bool): Only report what would be compacted.
+
+    Returns:
+        dict: The manifest of the partition.
+    """
+    if delete_source and bucket_name in INDEXED_BUCKETS:
+        raise ValueError(f"Refusing to delete compacted objects of {bucket_name}, indexing rows point at them")
+    bucket = store.get_bucket(bucket_name)
+    partition = partition_prefix(prefix, date, hour)
+    manifest = load_manifest(bucket, partition)
+    # Without --delete_source the small objects stay in place, don't merge them a second time.
+    already_compacted = set(manifest["sources"])
+    keys = [key for key in list_small_objects(bucket, partition) if key not in already_compacted]
+    if len(keys) == 0:
+        bt.logging.info(f"Nothing to compact in {bucket_name}/{partition}")
+        return manifest
+    bt.logging.info(f"Compacting {len(keys)} objects in {bucket_name}/{partition}")
+    if dry_run:
+        return manifest
+
+    next_part = len(manifest["parts"])
+    new_parts = []
+
+    def flush(part):
+        nonlocal next_part
+        key = f"{partition}{COMPACTED_DIR}/part-{next_part:05}.csv"
+        data = part.body()
+        bucket.put_object(Key=key, Body=data)
+        new_parts.append({"key": key, "bytes": len(data), **part.describe()})
+        bt.logging.info(f"Wrote {part.rows} rows to {bucket_name}/{key}")
+        next_part += 1
+
+    part = _CsvPart()
+    for key in keys:
+        if not key.endswith('.csv'):
+            bt.logging.warning(f"Skipping unexpected object {key}")
+            continue
+        body = bucket.Object(key).get()['Body'].read().decode('utf-8')
+        part.add(body)
+        if part.size >= target_size:
+            flush(part)
+            part = _CsvPart()
+    if part.rows > 0:
+        flush(part)
+
+    manifest["parts"] += new_parts
+    manifest["sources"] += keys
+    manifest.update(_summarize(manifest["parts"]))
+    manifest["updated"] = int(time.time())
+    bucket.put_object(Key=partition + MANIFEST_NAME, Body=json.dumps(manifest))
+    bt.logging.info(f"Updated manifest {bucket_name}/{partition}{MANIFEST_NAME}")
+
+    if delete_source:
+        # delete_objects accepts at most 1000 keys per call.
+        for i in range(0, len(keys), 1000):
+            bucket.delete_objects(Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]]})
+        bt.logging.info(f"Deleted {len(keys)} compacted objects from {bucket_name}/{partition}")
+
+    return manifest
+
+
+def get_config():
+    parser = argparse.ArgumentParser(description="Compact a date/hour partitioned scraping bucket.")
+    parser.add_argument('--bucket', type=str, required=True, help="Bucket name, e.g. twitterscrapingbucket or redditscrapingbucket.")
+    parser.add_argument('--prefix', type=str, required=True, help="Top level prefix, e.g. twitter or reddit.")
+    parser.add_argument('--date', type=str, required=True, help="Partition date (UTC), YYYY-MM-DD.")
+    parser.add_argument('--hour', type=int, default=None, help="Partition hour (UTC). Defaults to every closed hour of the date.")
+    parser.add_argument('--target_size_mb', type=int, default=64, help="Approximate size of each compacted part.")
+    parser.add_argument('--delete_source', action='store_true', help="Delete the small objects after compaction. Not allowed for the indexed scraping buckets.")
+    parser.add_argument('--dry_run', action='store_true', help="Only list what would be compacted.")
+    config = parser.parse_args()
+    if config.delete_source and config.bucket in INDEXED_BUCKETS:
+        parser.error(f"--delete_source would delete objects of {config.bucket} that indexing rows point at")
+    return config
+
+
+def main(config):
+    hours = [config.hour] if config.hour is not None else range(24)
+    # The current hour is still being written to, leave it for the next run.
+    open_partition = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    for hour in hours:
+        partition_start = datetime.strptime(config.date, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(hours=hour)
+        if partition_start >= open_partition:
+            bt.logging.info(f"Skipping open or future partition dt={config.date}/hour={hour:02}")
+            continue
+        compact_partition(config.bucket, config.prefix, config.date, hour,
+                          target_size=config.target_size_mb * 1024 * 1024,
+                          delete_source=config.delete_source,
+                          dry_run=config.dry_run)
+
+
+if __name__ == "__main__":
+    main(get_config())
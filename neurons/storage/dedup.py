@@ -0,0 +1,116 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class DedupIndex:
+    """
+    A persistent set of the item ids the validator has already stored, backed by SQLite.
+
+    The same tweet or reddit post is returned by miners round after round. Checking ids against this
+    index before building the csv keeps them from being uploaded and stored again.
+    The index is an exact set, so there are no false positives.
+    """
+
+    def __init__(self, path: str, max_age_seconds: int = 30 * 24 * 3600):
+        """
+        Open (or create) the index.
+
+        Args:
+            path (str): The sqlite database file, usually inside the validator's config.full_path.
+            max_age_seconds (int): Ids older than this are forgotten by `prune`. Defaults to 30 days.
+        """
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stored_ids (source_type TEXT NOT NULL, id TEXT NOT NULL, stored_at INTEGER NOT NULL, PRIMARY KEY (source_type, id)) WITHOUT ROWID")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS stored_ids_stored_at ON stored_ids (stored_at)")
+        self.conn.commit()
+        self.lookups = 0
+        self.hits = 0
+
+    def filter_new(self, source_type: str, ids) -> set:
+        """
+        Returns the subset of `ids` that is not in the index yet.
+        """
+        ids = list({str(id) for id in ids})
+        seen = set()
+        with self.lock:
+            # Stay below SQLITE_MAX_VARIABLE_NUMBER on older sqlite builds.
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(f"SELECT id FROM stored_ids WHERE source_type = ? AND id IN ({placeholders})", [source_type] + batch)
+                seen.update(row[0] for row in rows)
+            self.lookups += len(ids)
+            self.hits += len(seen)
+        return set(ids) - seen
+
+    def add(self, source_type: str, ids):
+        """
+        Records `ids` as stored. Call this only once the upload succeeded.
+        """
+        now = int(time.time())
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO stored_ids (source_type, id, stored_at) VALUES (?, ?, ?)", [(source_type, str(id), now) for id in ids])
+            self.conn.commit()
+
+    def prune(self):
+        """
+        Forgets ids stored more than `max_age_seconds` ago, keeping the index size bounded.
+        """
+        cutoff = int(time.time()) - self.max_age_seconds
+        with self.lock:
+            deleted = self.conn.execute("DELETE FROM stored_ids WHERE stored_at < ?", (cutoff,)).rowcount
+            self.conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the index, its false positive rate and its disk/memory use in bytes.
+        """
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM stored_ids").fetchone()[0]
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            cache_size = self.conn.execute("PRAGMA cache_size").fetchone()[0]
+        # A negative cache_size is a limit in KiB, a positive one a number of pages.
+        cache_bytes = -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+        return {
+            "count": count,
+            "false_positive_rate": 0.0,
+            "disk_bytes": page_size * page_count,
+            "memory_bytes": min(cache_bytes, page_size * page_count),
+            "lookups": self.lookups,
+            "hit_rate": self.hits / self.lookups if self.lookups > 0 else 0.0,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
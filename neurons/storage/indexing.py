@@ -0,0 +1,195 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import bittensor as bt
+from neurons import tracing
+
+DEFAULT_INDEXING_API_URL = "http://45.77.168.167:8000"
+
+
+def _retryable(error: Exception) -> bool:
+    # Connection errors, timeouts, 429 and 5xx answers may pass on a later flush; other 4xx answers never will.
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, requests.RequestException)
+
+
+class IndexingClient:
+    """
+    Buffers indexing rows and sends them to the indexing API from a background thread.
+
+    Rows are flushed when `batch_size` rows are waiting or every `flush_interval` seconds. Requests go
+    through one pooled `requests.Session` with timeouts and retries. If `batch_path` is set the whole
+    batch is sent in a single request as {"rows": [...]}, otherwise each row is posted to `row_path`
+    over the kept-alive connection.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, row_path: str = "/addRow", batch_path: str = None,
+                 batch_size: int = 20, flush_interval: float = 30, max_buffer: int = 10000,
+                 timeout: tuple = (3.05, 20), retries: int = 3, pool_size: int = 4):
+        """
+        Args:
+            api_key (str): The indexing API key. Defaults to the INDEXING_API_KEY env variable.
+            base_url (str): The indexing API url. Defaults to INDEXING_API_URL or the production server.
+            row_path (str): The path accepting a single row.
+            batch_path (str): The path accepting a list of rows, if the server has one. Defaults to INDEXING_BATCH_PATH.
+            batch_size (int): Flush as soon as this many rows are buffered.
+            flush_interval (float): Flush buffered rows at least this often, in seconds.
+            max_buffer (int): Rows kept while the API is unreachable; the oldest are dropped beyond that. Rows the API
+                rejects with a 4xx other than 429 are dropped right away.
+            timeout (tuple): (connect, read) timeouts in seconds.
+            retries (int): Retries on connection errors and 429/5xx responses.
+            pool_size (int): Connections kept alive in the pool.
+        """
+        # The defaults may come from .env, which store only loads once the S3 resource is first used.
+        load_dotenv()
+        self.api_key = api_key if api_key is not None else os.getenv("INDEXING_API_KEY")
+        self.base_url = (base_url or os.getenv("INDEXING_API_URL") or DEFAULT_INDEXING_API_URL).rstrip('/')
+        self.row_path = row_path
+        self.batch_path = batch_path if batch_path is not None else os.getenv("INDEXING_BATCH_PATH")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        # No retries on read errors: the row may have been added already, it is re-sent on the next flush instead.
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["POST"],
+                      raise_on_status=False)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self.buffer = deque(maxlen=max_buffer)
+        self.lock = threading.Lock()
+        # Only one flush talks to the API at a time, so a row is never picked up by two flushes.
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.sent = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="indexing-client", daemon=True)
+        self.thread.start()
+
+    def add_row(self, file_name: str, source_type: str, row_count: int, search_keys: list = []) -> dict:
+        """
+        Queues one indexing row. Returns immediately.
+        """
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                bt.logging.warning(f"Indexing buffer full, dropping row for {self.buffer[0]['file_name']}")
+            self.buffer.append({
+                "file_name": file_name,
+                "source_type": source_type,
+                "row_count": row_count,
+                "search_keys": search_keys,
+            })
+            pending = len(self.buffer)
+        if pending >= self.batch_size:
+            self.wakeup.set()
+        return {"msg": "queued", "file_name": file_name, "pending": pending}
+
+    def flush(self) -> int:
+        """
+        Sends every buffered row. Rows that could not be sent for a reason that may pass stay buffered for the
+        next flush, rows the API rejected are dropped.
+
+        Returns:
+            int: The number of rows sent.
+        """
+        with self.flush_lock:
+            with self.lock:
+                rows = list(self.buffer)
+                self.buffer.clear()
+            if len(rows) == 0:
+                return 0
+            start = time.perf_counter()
+            sent = 0
+            batches = [rows] if self.batch_path else [[row] for row in rows]
+            for index, batch in enumerate(batches):
+                try:
+                    if self.batch_path:
+                        self._post(self.batch_path, {"rows": batch, "api_key": self.api_key})
+                    else:
+                        self._post(self.row_path, {**batch[0], "api_key": self.api_key})
+                    sent += len(batch)
+                except Exception as e:
+                    if not _retryable(e):
+                        self.dropped += len(batch)
+                        bt.logging.error(f"❌ Indexing API rejected {len(batch)} rows, dropping them: {e}")
+                        continue
+                    self.failed_flushes += 1
+                    unsent = [row for pending in batches[index:] for row in pending]
+                    bt.logging.error(f"❌ Error sending {len(unsent)} indexing rows, will retry: {e}")
+                    self._requeue(unsent)
+                    break
+            self.sent += sent
+            # Flushes run on the background thread, outside any round span.
+            tracing.observe('indexing_flush', time.perf_counter() - start, rows = len(rows), sent = sent)
+            if sent > 0:
+                bt.logging.info(f"Sent {sent} indexing rows to {self.base_url}")
+            return sent
+
+    def _requeue(self, rows: list):
+        with self.lock:
+            # Rows added during the flush stay; like add_row, the oldest rows are dropped beyond max_buffer.
+            overflow = len(self.buffer) + len(rows) - self.buffer.maxlen
+            if overflow > 0:
+                bt.logging.warning(f"Indexing buffer full, dropping {min(overflow, len(rows))} unsent rows")
+                self.dropped += min(overflow, len(rows))
+                rows = rows[overflow:]
+            # Put the unsent rows back in front, keeping their order.
+            self.buffer.extendleft(reversed(rows))
+
+    def _post(self, path: str, payload: dict):
+        response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def stats(self) -> dict:
+        with self.lock:
+            pending = len(self.buffer)
+        return {"pending": pending, "sent": self.sent, "failed_flushes": self.failed_flushes, "dropped": self.dropped}
+
+    def close(self):
+        """
+        Stops the background thread and sends what is left in the buffer.
+        """
+        self.stopped.set()
+        self.wakeup.set()
+        self.thread.join(timeout=self.timeout[0] + self.timeout[1])
+        self.flush()
+        self.session.close()
@@ -0,0 +1,201 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import bittensor as bt
+from . import store
+
+# Flushed objects are grouped by block shard (~1 day of 12s blocks) and named after the block range they
+# hold, so a block window is found by listing the shard prefixes it covers and fetched with a GET per object.
+# A flush writes one object per shard its rounds fall in, so no object extends past its shard, however long
+# the spool was kept.
+BLOCKS_PER_SHARD = 7200
+KEY_PATTERN = re.compile(r'(\d{9})-(\d{9})_[a-z]+\.ndjson\.gz$')
+
+
+def shard_prefix(type: str, block: int) -> str:
+    return f"{type}/blocks/{block // BLOCKS_PER_SHARD * BLOCKS_PER_SHARD:09}/"
+
+
+class ScoringMetricsSink:
+    """
+    Buffers the scoring metrics of each round as newline-delimited JSON in a local spool file and uploads
+    them as one gzip compressed object once `max_rounds` rounds, `max_bytes` bytes or `max_age_seconds`
+    seconds have accumulated. The spool file survives restarts, unflushed rounds are picked up again.
+    """
+
+    def __init__(self, type: str, spool_dir: str, bucket: str = 'scoring', max_rounds: int = 30, max_bytes: int = 8 * 1024 * 1024, max_age_seconds: float = 3600):
+        """
+        Args:
+            type (str): The platform, 'twitter' or 'reddit'. Used as the key prefix.
+            spool_dir (str): Directory for the local spool file, usually inside config.full_path.
+            bucket (str): The destination bucket.
+            max_rounds (int): Flush after this many rounds.
+            max_bytes (int): Flush once the uncompressed spool reaches this size.
+            max_age_seconds (float): Flush once the oldest buffered round is this old.
+        """
+        self.type = type
+        self.bucket = bucket
+        self.max_rounds = max_rounds
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_path = os.path.join(spool_dir, f"{type}.ndjson")
+        self.lock = threading.Lock()
+        self._reset()
+        self._recover()
+
+    def _reset(self):
+        self.rounds = 0
+        self.size = 0
+        self.min_block = None
+        self.max_block = None
+        self.first_append = None
+
+    def _track(self, metrics: dict, size: int):
+        block = metrics.get('block')
+        if block is not None:
+            self.min_block = block if self.min_block is None else min(self.min_block, block)
+            self.max_block = block if self.max_block is None else max(self.max_block, block)
+        self.rounds += 1
+        self.size += size
+        if self.first_append is None:
+            self.first_append = time.time()
+
+    def _recover(self):
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path, 'r') as spool:
+            for line in spool:
+                try:
+                    self._track(json.loads(line), len(line))
+                except ValueError:
+                    # A crash can leave a partial last line behind.
+                    continue
+        if self.rounds > 0:
+            bt.logging.info(f"Recovered {self.rounds} unflushed {self.type} scoring rounds from {self.spool_path}")
+
+    def append(self, metrics: dict):
+        """
+        Buffers the metrics of one round, flushing if a threshold is reached.
+        """
+        line = json.dumps(metrics) + '\n'
+        with self.lock:
+            with open(self.spool_path, 'a') as spool:
+                spool.write(line)
+            self._track(metrics, len(line))
+        self.maybe_flush()
+
+    def should_flush(self) -> bool:
+        if self.rounds == 0:
+            return False
+        return self.rounds >= self.max_rounds or self.size >= self.max_bytes or time.time() - self.first_append >= self.max_age_seconds
+
+    def maybe_flush(self):
+        if self.should_flush():
+            self.flush()
+
+    def flush(self) -> str:
+        """
+        Compresses the buffered rounds into one object per block shard, named after their block range, and clears
+        the spool. Rounds of shards that could not be stored stay spooled.
+
+        Returns:
+            str: The last key written, or None if nothing was written.
+        """
+        with self.lock:
+            if self.rounds == 0:
+                return None
+            shards = {}
+            with open(self.spool_path, 'r') as spool:
+                for line in spool:
+                    try:
+                        block = json.loads(line).get('block')
+                    except ValueError:
+                        # A crash can leave a partial last line behind.
+                        continue
+                    block = block if block is not None else 0
+                    shards.setdefault(block // BLOCKS_PER_SHARD, []).append((block, line))
+            key = None
+            for shard in sorted(shards):
+                rounds = shards[shard]
+                min_block = min(block for block, _ in rounds)
+                max_block = max(block for block, _ in rounds)
+                data = ''.join(line for _, line in rounds).encode('utf-8')
+                shard_key = f"{shard_prefix(self.type, min_block)}{min_block:09}-{max_block:09}_{store.generate_random_string(6)}.ndjson.gz"
+                try:
+                    store.put_object(self.bucket, shard_key, gzip.compress(data))
+                except Exception as e:
+                    bt.logging.error(f"❌ Error flushing {len(rounds)} {self.type} scoring rounds, keeping them spooled: {e}")
+                    break
+                bt.logging.info(f"Stored {len(rounds)} {self.type} scoring rounds ({len(data)} bytes) to {self.bucket}/{shard_key}")
+                del shards[shard]
+                key = shard_key
+            if key is None:
+                return None
+            self._reset()
+            if len(shards) == 0:
+                os.remove(self.spool_path)
+                return key
+            # Rewrite the spool with the rounds not stored, so that they are not stored twice.
+            unflushed = [line for shard in sorted(shards) for _, line in shards[shard]]
+            temp_path = self.spool_path + '.tmp'
+            with open(temp_path, 'w') as spool:
+                spool.writelines(unflushed)
+            os.replace(temp_path, self.spool_path)
+            for line in unflushed:
+                self._track(json.loads(line), len(line))
+            return key
+
+    def close(self):
+        self.flush()
+
+
+def list_block_window(type: str, start_block: int, end_block: int, bucket: str = 'scoring') -> list:
+    """
+    Lists the keys of flushed objects holding rounds between `start_block` and `end_block` (inclusive).
+    """
+    keys = []
+    for shard in range(start_block // BLOCKS_PER_SHARD, end_block // BLOCKS_PER_SHARD + 1):
+        prefix = shard_prefix(type, shard * BLOCKS_PER_SHARD)
+        for page in store.get_client().get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                match = KEY_PATTERN.search(obj['Key'])
+                if match and int(match.group(1)) <= end_block and int(match.group(2)) >= start_block:
+                    keys.append(obj['Key'])
+    return keys
+
+
+def fetch_block_window(type: str, start_block: int, end_block: int, bucket: str = 'scoring') -> list:
+    """
+    Returns the scoring metrics of every round between `start_block` and `end_block` (inclusive).
+    """
+    rounds = []
+    for key in list_block_window(type, start_block, end_block, bucket):
+        body = store.get_client().get_object(Bucket=bucket, Key=key)['Body'].read()
+        for line in gzip.decompress(body).decode('utf-8').splitlines():
+            metrics = json.loads(line)
+            if start_block <= metrics.get('block', -1) <= end_block:
+                rounds.append(metrics)
+    return sorted(rounds, key=lambda metrics: metrics.get('block', 0))
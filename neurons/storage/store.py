@@ -1,42 +1,116 @@
-import boto3
 import csv
 import random
 import string
+import threading
 import time
+from datetime import datetime, timezone
 from io import StringIO
 from dotenv import load_dotenv
 import os
 import requests
 import json
 import bittensor as bt
-
-load_dotenv()
-wasabi_endpoint_url = os.getenv("WASABI_ENDPOINT_URL")
-access_key_id = os.getenv("WASABI_ACCESS_KEY_ID")
-secret_access_key = os.getenv("WASABI_ACCESS_KEY")
-indexing_api_key = os.getenv("INDEXING_API_KEY")
-s3 = boto3.resource('s3',
-    endpoint_url=wasabi_endpoint_url,
-    aws_access_key_id=access_key_id,
-    aws_secret_access_key=secret_access_key)
+from neurons.tracing import span
+
+# The S3 resource is created on first use, so importing this module doesn't pay the boto3 start-up cost.
+_s3 = None
+_s3_lock = threading.Lock()
+_buckets = {}
+_client_override = None
+
+def get_s3():
+    """
+    Returns the shared wasabi S3 resource, creating it on first use.
+
+    Pool size, timeouts and retries can be tuned with the S3_MAX_POOL_CONNECTIONS, S3_CONNECT_TIMEOUT,
+    S3_READ_TIMEOUT and S3_MAX_ATTEMPTS environment variables.
+    """
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                import boto3
+                from botocore.config import Config
+                load_dotenv()
+                config = Config(
+                    max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", 20)),
+                    connect_timeout=float(os.getenv("S3_CONNECT_TIMEOUT", 5)),
+                    read_timeout=float(os.getenv("S3_READ_TIMEOUT", 30)),
+                    retries={"total_max_attempts": int(os.getenv("S3_MAX_ATTEMPTS", 5)), "mode": "standard"},
+                )
+                _s3 = boto3.resource('s3',
+                    endpoint_url=os.getenv("WASABI_ENDPOINT_URL"),
+                    aws_access_key_id=os.getenv("WASABI_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("WASABI_ACCESS_KEY"),
+                    config=config)
+    return _s3
+
+def get_client():
+    """
+    Returns the low level S3 client of the shared resource. Unlike resources, clients are thread safe,
+    so this is the one to hand to upload worker threads.
+    """
+    if _client_override is not None:
+        return _client_override
+    return get_s3().meta.client
+
+def use_client(client):
+    """
+    Routes uploads and reads through `client` instead of wasabi, e.g. a local stand-in for replays and
+    benchmarks. Pass None to go back to wasabi.
+    """
+    global _client_override
+    _client_override = client
+
+def get_bucket(name: str):
+    """
+    Returns a cached Bucket handle.
+    """
+    bucket = _buckets.get(name)
+    if bucket is None:
+        bucket = _buckets.setdefault(name, get_s3().Bucket(name))
+    return bucket
+
+def put_object(bucket: str, key: str, body):
+    get_client().put_object(Bucket=bucket, Key=key, Body=body)
+
+def __getattr__(name):
+    # Keep `storage.store.s3` working for existing callers without creating the resource at import time.
+    if name == 's3':
+        return get_s3()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def generate_random_string(length=10):
     return ''.join(random.choice(string.ascii_lowercase) for i in range(length))
 
-def scoring_bucket():
-    return s3.Bucket('scoring')
-
-def store_scoring_metrics(metrics: dict, type: str):
-    block = metrics['block']
-    filename = f"{block:09}_{generate_random_string()}.json"
-    data = json.dumps(metrics)
-    key = f"{type}/{filename}"
-    s3.Bucket('scoring').put_object(Key=key, Body=data)
-    bt.logging.info(f"Stored scoring metrics to {key}")
-
-def twitter_store(data = [], search_keys = []):
-    id_list = []
-    filename = 'twitter_' + generate_random_string() + '.csv'
+def partition_path(timestamp: float = None) -> str:
+    """
+    Returns the date/hour partition (UTC) that objects written at `timestamp` belong to,
+    e.g. 'dt=2023-11-20/hour=13'. Defaults to the current time.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    dt = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return f"dt={dt:%Y-%m-%d}/hour={dt:%H}"
+
+def filter_stored(items: list, source_type: str, dedup_index = None) -> list:
+    """
+    Drops the items whose id was already stored in a previous round, according to `dedup_index`.
+    """
+    if dedup_index is None or len(items) == 0:
+        return items
+    try:
+        new_ids = dedup_index.filter_new(source_type, [item['id'] for item in items])
+    except Exception as e:
+        bt.logging.warning(f"Dedup index lookup failed, storing all items: {e}")
+        return items
+    if len(new_ids) < len(items):
+        bt.logging.info(f"Skipping {len(items) - len(new_ids)}/{len(items)} {source_type} items already stored")
+    return [item for item in items if str(item['id']) in new_ids]
+
+def twitter_store(data = [], search_keys = [], dedup_index = None, indexing_client = None):
+    id_list = set()
+    filename = partition_path() + '/twitter_' + generate_random_string() + '.csv'
 
     csv_buffer = StringIO()
     required_fields = ['id', 'url', 'text', 'likes', 'images', 'timestamp']
@@ -45,7 +119,7 @@ def twitter_store(data = [], search_keys = []):
     writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
 
     writer.writeheader()
-    total_count = 0
+    items = []
     for response in data:
         if response != [] and response != None:
             for item in response:
@@ -57,33 +131,39 @@ def twitter_store(data = [], search_keys = []):
                 if item['id'] in id_list or item['id'] == None:
                     continue
                 else:
-                    id_list.append(item['id'])
+                    id_list.add(item['id'])
                     # Remove any non-standard keys
-                    item = {key: value for key, value in item.items() if key in fieldnames}
-                    writer.writerow(item)
-                    total_count += 1
+                    items.append({key: value for key, value in item.items() if key in fieldnames})
+
+    items = filter_stored(items, 'twitter', dedup_index)
+    for item in items:
+        writer.writerow(item)
+    total_count = len(items)
 
     if total_count > 0:
         bt.logging.info(f"Storing {total_count} results as twitterscrapingbucket/twitter/{filename}")
-        s3.Bucket('twitterscrapingbucket').put_object(Key='twitter/' + filename, Body=csv_buffer.getvalue())
+        with span('upload', items = total_count):
+            put_object('twitterscrapingbucket', 'twitter/' + filename, csv_buffer.getvalue())
 
         csv_buffer.close()
-        indexing_result = save_indexing_row(file_name=filename, source_type="twitter", row_count=total_count, search_keys=search_keys)
+        if dedup_index is not None:
+            dedup_index.add('twitter', [item['id'] for item in items])
+        indexing_result = save_indexing_row(file_name=filename, source_type="twitter", row_count=total_count, search_keys=search_keys, indexing_client=indexing_client)
         return indexing_result
     else:
         return {"msg": "data length is 0"}
 
-def reddit_store(data = [], search_keys = []):
-    id_list = []
-    filename = 'reddit_' + generate_random_string() + '.csv'
+def reddit_store(data = [], search_keys = [], dedup_index = None, indexing_client = None):
+    id_list = set()
+    filename = partition_path() + '/reddit_' + generate_random_string() + '.csv'
 
     csv_buffer = StringIO()
     required_fields = ['id', 'url', 'text', 'likes', 'dataType', 'timestamp']
     fieldnames = ['id', 'url', 'text', 'likes', 'dataType', 'timestamp', 'username', 'parent', 'community', 'title', 'num_comments', 'user_id']
 
     writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
-    total_count = 0
     writer.writeheader()
+    items = []
     for response in data:
         if response != [] and response != None:
             for item in response:
@@ -96,41 +176,48 @@ def reddit_store(data = [], search_keys = []):
                 if item['id'] in id_list or item['id'] == None:
                     continue
                 else:
-                    id_list.append(item['id'])
+                    id_list.add(item['id'])
                     # Remove any non-standard keys
-                    item = {key: value for key, value in item.items() if key in fieldnames}
-                    writer.writerow(item)
-                    total_count += 1
+                    items.append({key: value for key, value in item.items() if key in fieldnames})
   
+    items = filter_stored(items, 'reddit', dedup_index)
+    for item in items:
+        writer.writerow(item)
+    total_count = len(items)
+
     if total_count > 0:
         bt.logging.info(f"Storing {total_count} results as redditscrapingbucket/reddit/{filename}")
-        s3.Bucket('redditscrapingbucket').put_object(Key='reddit/' + filename, Body=csv_buffer.getvalue())
+        with span('upload', items = total_count):
+            put_object('redditscrapingbucket', 'reddit/' + filename, csv_buffer.getvalue())
 
         csv_buffer.close()
-        indexing_result = save_indexing_row(file_name=filename, source_type="reddit", row_count=total_count, search_keys=search_keys)
+        if dedup_index is not None:
+            dedup_index.add('reddit', [item['id'] for item in items])
+        indexing_result = save_indexing_row(file_name=filename, source_type="reddit", row_count=total_count, search_keys=search_keys, indexing_client=indexing_client)
         return indexing_result
     else:
         return {"msg": "data length is 0"}
 
-def save_indexing_row(file_name, source_type, row_count, search_keys = []):
+def save_indexing_row(file_name, source_type, row_count, search_keys = [], indexing_client = None):
+    # Queue the row on the batching client when there is one, it is sent from its own thread.
+    if indexing_client is not None:
+        return indexing_client.add_row(file_name=file_name, source_type=source_type, row_count=row_count, search_keys=search_keys)
 
-
-    url = "http://45.77.168.167:8000/addRow"
+    load_dotenv()
+    url = (os.getenv("INDEXING_API_URL") or "http://45.77.168.167:8000").rstrip('/') + "/addRow"
     
     payload = json.dumps({
     "file_name": file_name,
     "source_type": source_type,
     "row_count": row_count,
     "search_keys": search_keys,
-    "api_key": indexing_api_key
+    "api_key": os.getenv("INDEXING_API_KEY")
     })
     headers = {
     'Content-Type': 'application/json'
     }
 
-    response = requests.request("POST", url, headers=headers, data=payload)
+    with span('indexing', rows = 1):
+        response = requests.request("POST", url, headers=headers, data=payload, timeout=(3.05, 30))
 
     return response.text
-
-
-
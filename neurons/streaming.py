@@ -0,0 +1,110 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Streaming dendrite queries.
+#
+# dendrite.query returns once every axon has answered or timed out, so one slow miner holds up the round. query()
+# sends the same requests but hands each response to a callback as it arrives, and stops waiting for the rest once
+# a quorum of the axons has answered with data and a grace period has passed.
+#
+#   ingest = score.twitter_score.RoundIngest(len(axons), tag = search_key)
+#   streaming.query(dendrite, axons, synapse, on_response = ingest.add, timeout = 60, quorum = 0.8, grace = 5)
+#   scoring_metrics = score.twitter_score.calculateScore(ingest = ingest)
+
+import asyncio
+import math
+import bittensor as bt
+from neurons import metrics
+
+RESPONSES = metrics.counter('validator_query_responses_total', "Miner responses of streaming queries by outcome.", ['synapse', 'outcome'])
+QUORUM_SECONDS = metrics.histogram('validator_query_quorum_seconds', "Seconds until the quorum of a streaming query answered.", ['synapse'])
+
+
+def _event_loop():
+    # The loop dendrite.query runs on, its aiohttp session is bound to it.
+    try:
+        return asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        return loop
+
+
+def query(dendrite, axons: list, synapse, on_response = None, timeout: float = 60, quorum: float = 1.0, grace: float = 0.0, deserialize: bool = True) -> list:
+    """
+    Queries axons like dendrite.query and returns one response per axon, None for axons that did not answer.
+
+    Args:
+        dendrite: The dendrite whose `call` coroutine sends one request.
+        axons (list): The axons to query.
+        synapse: The request, copied for each axon.
+        on_response (function): Called as on_response(index, response) for each response as it arrives. Axons cut
+            off or timed out are not reported.
+        timeout (float): Seconds each request may take.
+        quorum (float): Fraction of the axons that must answer with data before the rest are cut off.
+        grace (float): Seconds the rest still get once the quorum has answered.
+    """
+    return _event_loop().run_until_complete(_query(dendrite, axons, synapse, on_response, timeout, quorum, grace, deserialize))
+
+
+async def _query(dendrite, axons, synapse, on_response, timeout, quorum, grace, deserialize) -> list:
+    name = type(synapse).__name__
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = {
+        asyncio.ensure_future(dendrite.call(target_axon = axon, synapse = synapse.copy(), timeout = timeout, deserialize = deserialize)): i
+        for i, axon in enumerate(axons)
+    }
+    responses = [None] * len(axons)
+    needed = math.ceil(quorum * len(axons))
+    answered = 0
+    deadline = None
+    pending = set(tasks)
+    while pending:
+        wait = None if deadline is None else max(0.0, deadline - loop.time())
+        done, pending = await asyncio.wait(pending, timeout = wait, return_when = asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for task in done:
+            i = tasks[task]
+            try:
+                responses[i] = task.result()
+            except Exception as e:
+                bt.logging.debug(f"Query of axon {i} failed: {e}")
+            if responses[i] is None:
+                RESPONSES.inc(synapse = name, outcome = 'empty')
+                continue
+            answered += 1
+            RESPONSES.inc(synapse = name, outcome = 'answered')
+            if on_response is not None:
+                try:
+                    on_response(i, responses[i])
+                except Exception as e:
+                    bt.logging.error(f"❌ Error while ingesting response {i}: {e}")
+        if deadline is None and needed > 0 and answered >= needed:
+            QUORUM_SECONDS.observe(loop.time() - start, synapse = name)
+            deadline = loop.time() + grace
+
+    if pending:
+        bt.logging.info(f"Cutting off {len(pending)} of {len(axons)} miners, {answered} answered.")
+        RESPONSES.inc(len(pending), synapse = name, outcome = 'cut_off')
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions = True)
+    return responses
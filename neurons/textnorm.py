@@ -0,0 +1,89 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Text normalization for comparing scraped posts.
+#
+# text_for_comparison is the tweet comparison form of twitter_score: links, leading mentions and whitespace are
+# removed, html entities are decoded and the result is cut to 255 chars. It works on the whitespace split tokens
+# in one pass instead of three regular expression substitutions, the link pattern among them backtracking over
+# every token of long texts, and memoizes results since the same texts are normalized again and again.
+
+import html
+import re
+from functools import lru_cache
+
+# `(@\w+\s*)+` at the start of a text, applied to one token.
+_MENTIONS = re.compile(r'(?:@\w+)+')
+
+CACHE_SIZE = 8192
+
+
+def _is_link(token: str) -> bool:
+    # The tokens `(https?://)?\S+\.\S+\/?(\S+)?` matched: a dot with at least one char on either side.
+    return '.' in token[1:-1]
+
+
+def _normalize(text: str) -> str:
+    words = text.split()
+    tokens = [token for token in words if not _is_link(token)]
+    # Leading mentions are only stripped when the text starts with them, not when it starts with whitespace or a
+    # link that was removed before them.
+    if tokens and not _is_link(words[0]) and not text[0].isspace():
+        start = 0
+        while start < len(tokens):
+            match = _MENTIONS.match(tokens[start])
+            if match is None:
+                break
+            if match.end() < len(tokens[start]):
+                tokens[start] = tokens[start][match.end():]
+                break
+            start += 1
+        tokens = tokens[start:]
+    # Scrapers differ in whitespace, escaping and in whether they return the long note_tweet text (> 280 chars)
+    # or the 255 char tweet.text field the validator's actor uses.
+    return html.unescape(''.join(tokens))[:255]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def text_for_comparison(text: str) -> str:
+    """
+    Removes links, leading mentions and whitespace, decodes html entities and keeps the first 255 chars.
+    """
+    return _normalize(text)
+
+
+def words(text: str) -> list:
+    """
+    Lowercased words of a text without its links, the shingling input of neurons.similarity.
+    """
+    return [token for token in text.lower().split() if '.' not in token[1:-1]]
+
+
+def normalize_many(texts) -> list:
+    """
+    Normalizes a batch of texts, e.g. all items of a round, computing each distinct text once.
+    """
+    normalized = {}
+    result = []
+    for text in texts:
+        value = normalized.get(text)
+        if value is None:
+            value = normalized[text] = text_for_comparison(text)
+        result.append(value)
+    return result
@@ -0,0 +1,170 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Fixed-format timestamp parsing and formatting shared by the scrapers and the scorers.
+#
+# Parsers return epoch seconds (float, UTC). The formats the scrapers produce are matched by one precompiled
+# pattern and converted by fromisoformat or integer arithmetic instead of strptime; anything else falls back to the
+# datetime call the code used before, so accepted and rejected inputs are unchanged.
+#
+#   parse_twitter_timestamp('2023-12-01 10:20:30+00:00')      tweet 'timestamp' field
+#   parse_iso_timestamp('2023-12-01T10:20:30.123Z')           reddit 'timestamp' field
+#   parse_twitter_created_at('Fri Dec 01 10:20:30 +0000 2023') apify tweet 'createdAt'
+#   parse_offset_timestamp('2023-12-01T10:20:30.123000+0000')  apify reddit 'created_at'
+
+import re
+import time
+from datetime import datetime, timezone
+
+EPOCH = datetime(1970, 1, 1)
+
+_DAYS_BEFORE_MONTH = (0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_MONTHS = {name: index for index, name in enumerate(('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+_WEEKDAYS = {'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'}
+
+_TWITTER_TIMESTAMP = re.compile(r'(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\+00:00', re.ASCII)
+_OFFSET_TIMESTAMP = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)\.(\d{1,6})([+-])(\d\d):?(\d\d)', re.ASCII)
+_CREATED_AT = re.compile(r'([A-Z][a-z]{2}) ([A-Z][a-z]{2}) (\d\d) (\d\d):(\d\d):(\d\d) ([+-])(\d\d)(\d\d) (\d{4})', re.ASCII)
+
+
+def _is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def _to_epoch(year: int, month: int, day: int, hour: int, minute: int, second: int):
+    """
+    Seconds since 1970-01-01 for a UTC wall time, or None if a field is out of range.
+    """
+    if not (1 <= month <= 12 and 1 <= day and hour < 24 and minute < 60 and second < 60 and year >= 1):
+        return None
+    if day > _DAYS_IN_MONTH[month] and not (month == 2 and day == 29 and _is_leap(year)):
+        return None
+    y = year - 1
+    days = y * 365 + y // 4 - y // 100 + y // 400 + _DAYS_BEFORE_MONTH[month] + day - 1
+    if month > 2 and _is_leap(year):
+        days += 1
+    # 719162 days from 0001-01-01 to 1970-01-01.
+    return (days - 719162) * 86400 + hour * 3600 + minute * 60 + second
+
+
+def epoch(dt: datetime) -> float:
+    """
+    Epoch seconds of a datetime; naive datetimes are taken to be UTC, as datetime.utcnow() returns them.
+    """
+    if dt.tzinfo is None:
+        return (dt - EPOCH).total_seconds()
+    return dt.timestamp()
+
+
+def parse_twitter_timestamp(value: str) -> float:
+    """
+    Parses '%Y-%m-%d %H:%M:%S+00:00', the timestamp format of mapped tweets.
+    """
+    # The pattern keeps the accepted format that of strptime, the conversion is done by the C fromisoformat.
+    if _TWITTER_TIMESTAMP.fullmatch(value):
+        return datetime.fromisoformat(value).timestamp()
+    return epoch(datetime.strptime(value, '%Y-%m-%d %H:%M:%S+00:00'))
+
+
+def parse_iso_timestamp(value: str) -> float:
+    """
+    Parses a naive UTC ISO 8601 timestamp with an optional 'Z', e.g. '2023-12-01T10:20:30.123Z' of mapped reddit posts.
+    Timestamps with an offset are rejected, ages are measured against a naive UTC clock.
+    """
+    dt = datetime.fromisoformat(value.rstrip('Z'))
+    if dt.tzinfo is not None:
+        raise ValueError(f"Timestamp has an offset: {value}")
+    return (dt - EPOCH).total_seconds()
+
+
+def parse_offset_timestamp(value: str) -> float:
+    """
+    Parses '%Y-%m-%dT%H:%M:%S.%f%z', e.g. '2023-12-01T10:20:30.123000+0000' of the trudax reddit actor.
+    """
+    match = _OFFSET_TIMESTAMP.fullmatch(value)
+    if match:
+        year, month, day, hour, minute, second, fraction, sign, offset_hours, offset_minutes = match.groups()
+        seconds = _to_epoch(int(year), int(month), int(day), int(hour), int(minute), int(second))
+        if seconds is not None and int(offset_minutes) < 60:
+            offset = (int(offset_hours) * 3600 + int(offset_minutes) * 60) * (1 if sign == '+' else -1)
+            return seconds - offset + int(fraction) / 10 ** len(fraction)
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z').timestamp()
+
+
+def parse_twitter_created_at(value: str) -> float:
+    """
+    Parses '%a %b %d %H:%M:%S %z %Y', e.g. 'Fri Dec 01 10:20:30 +0000 2023' of the apify tweet actors.
+    """
+    match = _CREATED_AT.fullmatch(value)
+    if match:
+        weekday, month_name, day, hour, minute, second, sign, offset_hours, offset_minutes, year = match.groups()
+        month = _MONTHS.get(month_name)
+        seconds = _to_epoch(int(year), month, int(day), int(hour), int(minute), int(second)) if month else None
+        if weekday in _WEEKDAYS and seconds is not None and int(offset_minutes) < 60:
+            offset = (int(offset_hours) * 3600 + int(offset_minutes) * 60) * (1 if sign == '+' else -1)
+            return float(seconds - offset)
+    return datetime.strptime(value, '%a %b %d %H:%M:%S %z %Y').timestamp()
+
+
+def _split_micros(seconds: float):
+    # Rounds to whole microseconds first so that e.g. .123 isn't formatted as .122999.
+    micros = round(seconds * 1_000_000)
+    whole, micros = divmod(micros, 1_000_000)
+    return time.gmtime(whole), micros
+
+
+def format_twitter_timestamp(seconds: float) -> str:
+    """
+    '%Y-%m-%d %H:%M:%S+00:00', the inverse of parse_twitter_timestamp. Fractions of a second are dropped.
+    """
+    t, _ = _split_micros(seconds)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}+00:00"
+
+
+def format_iso_timestamp(seconds: float) -> str:
+    """
+    '%Y-%m-%dT%H:%M:%S.mmmZ' with truncated milliseconds, the timestamp format of mapped reddit posts.
+    """
+    t, micros = _split_micros(seconds)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}.{micros // 1000:03d}Z"
+
+
+class ParseCache:
+    """
+    Memoizes a parser for one round: the same timestamp string, e.g. a tweet returned by several miners or checked
+    in both scoring passes, is parsed once. Errors are cached and raised again.
+    """
+
+    def __init__(self, parse):
+        self.parse = parse
+        self.values = {}
+
+    def __call__(self, value) -> float:
+        try:
+            result = self.values[value]
+        except KeyError:
+            try:
+                result = self.parse(value)
+            except (ValueError, TypeError, OverflowError) as e:
+                result = e
+            self.values[value] = result
+        if isinstance(result, Exception):
+            raise result
+        return result
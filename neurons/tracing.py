@@ -0,0 +1,178 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Structured spans around the stages of a round.
+#
+# Every finished span is observed in the `{service}_stage_seconds{stage,platform}` histogram of
+# neurons.metrics and, once a trace file is configured, written as one JSON line:
+#   {"trace": "...", "span": "...", "parent": "...", "name": "query", "start": 1700000000.0, "duration_s": 2.1, "attrs": {...}}
+#
+#   from neurons.tracing import span
+#   with span('round', platform='twitter'):
+#       with span('query') as s:
+#           ...
+#           s.set(responses=25)
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import bittensor as bt
+from neurons import metrics
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attrs', 'start', 'start_perf', 'duration', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, attrs: dict):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.start_perf = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        record = {"trace": self.trace_id, "span": self.span_id, "parent": self.parent_id, "name": self.name,
+                  "start": round(self.start, 6), "duration_s": round(self.duration, 6), "attrs": self.attrs}
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Tracer:
+    """
+    Produces spans for one service ('validator', 'miner'). Spans nest per thread; the platform attribute of the
+    outermost span labels the histograms of the spans inside it.
+    """
+
+    def __init__(self, service: str = 'validator'):
+        self.service = service
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.path = None
+        self.file = None
+        self.max_bytes = 0
+        self.backups = 0
+
+    def configure(self, service: str = None, path: str = None, max_bytes: int = 50 * 2**20, backups: int = 3):
+        """
+        Args:
+            service (str): Prefix of the exported metric names.
+            path (str): JSONL file spans are appended to, None keeps spans in the histograms only.
+            max_bytes (int): Size at which the file is rotated to path.1, path.2, ...
+            backups (int): Rotated files to keep.
+        """
+        with self.lock:
+            if service:
+                self.service = service
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.path = path
+            self.max_bytes = max_bytes
+            self.backups = backups
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.file = open(path, 'a', buffering=1)
+        return self
+
+    def _stack(self) -> list:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = Span(name, parent.trace_id if parent else uuid.uuid4().hex, parent.span_id if parent else None, attrs)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start_perf
+            stack.pop()
+            platform = span.attrs.get('platform') or (stack[0].attrs.get('platform', '') if stack else '')
+            self._finish(span, platform)
+
+    def observe(self, name: str, seconds: float, **attrs):
+        """
+        Records a stage that was timed elsewhere, e.g. on a background thread.
+        """
+        span = Span(name, uuid.uuid4().hex, None, attrs)
+        span.start -= seconds
+        span.duration = seconds
+        self._finish(span, attrs.get('platform', ''))
+
+    def _finish(self, span: Span, platform: str):
+        metrics.histogram(f"{self.service}_stage_seconds", f"Duration of {self.service} stages in seconds.", ['stage', 'platform']).observe(span.duration, stage=span.name, platform=platform)
+        if span.error:
+            metrics.counter(f"{self.service}_stage_errors_total", f"{self.service} stages that raised.", ['stage', 'platform']).inc(stage=span.name, platform=platform)
+        if self.file is None:
+            return
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self.lock:
+            if self.file is None:
+                return
+            try:
+                self.file.write(line)
+                if self.max_bytes and self.file.tell() >= self.max_bytes:
+                    self._rotate()
+            except (OSError, ValueError) as e:
+                bt.logging.warning(f"Could not write trace to {self.path}: {e}")
+
+    def _rotate(self):
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, 'a', buffering=1)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+tracer = Tracer()
+span = tracer.span
+observe = tracer.observe
+configure = tracer.configure
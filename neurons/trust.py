@@ -0,0 +1,181 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Trust-aware choice of the items that are spot checked.
+#
+# Every miner used to have one random item verified per round. Here each miner, keyed by (uid, hotkey) so that a
+# re-registered uid starts over, keeps a record of its spot checks:
+#   new        fewer than `min_history` passed checks: `new_samples` items are verified every round.
+#   suspicious a check failed within the last `suspicion_rounds` rounds it was checked: `max_samples` items.
+#   trusted    otherwise: one item, verified with a probability that halves every `half_life` passes in a row
+#              but never drops below the floor that keeps the detection guarantee.
+#
+# The guarantee: a miner that fabricates at least `cheat_fraction` of its items is caught within `window` rounds
+# with probability at least `detection`, however long its honest record is. One sampled item is fabricated with
+# probability cheat_fraction, so the verification probability p needs 1 - (1 - p * cheat_fraction) ** window >= detection.
+#
+#   samples = trust.sampler.plan((uid, hotkey), len(response))
+#   ...
+#   trust.sampler.record((uid, hotkey), passed)
+
+import math
+import random
+import threading
+from neurons import metrics
+
+SAMPLES = metrics.counter('validator_spot_check_samples_total', "Items spot checked, by platform and miner trust tier.", ['platform', 'tier'])
+SKIPPED = metrics.counter('validator_spot_check_skipped_total', "Trusted miner responses left unverified, by platform.", ['platform'])
+
+
+def verify_probability_floor(detection: float, window: int, cheat_fraction: float) -> float:
+    """
+    The smallest per-round verification probability that catches a miner fabricating cheat_fraction of its items
+    within window rounds with probability detection.
+    """
+    if detection <= 0:
+        return 0.0
+    if detection >= 1 or cheat_fraction <= 0 or window <= 0:
+        return 1.0
+    per_round = 1 - (1 - detection) ** (1 / window)
+    return min(1.0, per_round / min(1.0, cheat_fraction))
+
+
+class _Record:
+    __slots__ = ('passes', 'streak', 'since_fail')
+
+    def __init__(self):
+        self.passes = 0
+        self.streak = 0
+        self.since_fail = None
+
+
+class TrustSampler:
+    """
+    Chooses the items of each response that are spot checked from the pass/fail history of the miner.
+    """
+
+    def __init__(self, detection: float = 0.99, window: int = 30, cheat_fraction: float = 0.5, min_history: int = 3,
+                 new_samples: int = 2, max_samples: int = 4, suspicion_rounds: int = 10, half_life: float = 5,
+                 max_miners: int = 4096):
+        """
+        Args:
+            detection (float): Probability with which a miner fabricating cheat_fraction of its items is caught
+                within window rounds.
+            window (int): Rounds (in which the miner is queried) the guarantee is given for.
+            cheat_fraction (float): Fraction of fabricated items the guarantee is given for.
+            min_history (int): Passed checks before a miner is trusted.
+            new_samples (int): Items verified per round of a new miner.
+            max_samples (int): Items verified per round of a suspicious miner.
+            suspicion_rounds (int): Checked rounds a miner stays suspicious after a failed check.
+            half_life (float): Passes in a row after which the verification probability of a trusted miner halves.
+            max_miners (int): Miners remembered at most, the least recently seen are forgotten beyond that.
+        """
+        self.new_samples = new_samples
+        self.max_samples = max_samples
+        self.min_history = min_history
+        self.suspicion_rounds = suspicion_rounds
+        self.half_life = half_life
+        self.max_miners = max_miners
+        self.records = {}
+        self.lock = threading.Lock()
+        self.configure(detection, window, cheat_fraction)
+
+    def configure(self, detection: float = None, window: int = None, cheat_fraction: float = None):
+        if detection is not None:
+            self.detection = detection
+        if window is not None:
+            self.window = window
+        if cheat_fraction is not None:
+            self.cheat_fraction = cheat_fraction
+        self.floor = verify_probability_floor(self.detection, self.window, self.cheat_fraction)
+        return self
+
+    def _record(self, key) -> _Record:
+        record = self.records.pop(key, None) or _Record()
+        # Reinserted so that the dict stays ordered by last use.
+        self.records[key] = record
+        while len(self.records) > self.max_miners:
+            del self.records[next(iter(self.records))]
+        return record
+
+    def tier(self, key) -> str:
+        with self.lock:
+            record = self.records.get(key)
+            return self._tier(record) if record else 'new'
+
+    def _tier(self, record: _Record) -> str:
+        if record.since_fail is not None and record.since_fail < self.suspicion_rounds:
+            return 'suspicious'
+        if record.passes < self.min_history:
+            return 'new'
+        return 'trusted'
+
+    def verify_probability(self, key) -> float:
+        """
+        The probability that a response of a trusted miner is verified this round; 1 for new and suspicious miners.
+        """
+        with self.lock:
+            record = self.records.get(key)
+            if record is None or self._tier(record) != 'trusted':
+                return 1.0
+            return self._probability(record)
+
+    def _probability(self, record: _Record) -> float:
+        trusted_streak = max(0, record.streak - self.min_history)
+        return max(self.floor, 0.5 ** (trusted_streak / self.half_life)) if self.half_life > 0 else self.floor
+
+    def plan(self, key, size: int, platform: str = '') -> list:
+        """
+        Returns the indices of the items of a response of `size` items that are verified this round.
+        """
+        if size <= 0:
+            return []
+        with self.lock:
+            record = self._record(key)
+            tier = self._tier(record)
+            if tier == 'suspicious':
+                count = self.max_samples
+            elif tier == 'new':
+                count = self.new_samples
+            else:
+                count = 1 if random.random() < self._probability(record) else 0
+        if count == 0:
+            SKIPPED.inc(platform = platform)
+            return []
+        count = min(count, size)
+        SAMPLES.inc(count, platform = platform, tier = tier)
+        return random.sample(range(size), count)
+
+    def record(self, key, passed: bool):
+        """
+        Records the outcome of the spot check of a miner's response.
+        """
+        with self.lock:
+            record = self._record(key)
+            if passed:
+                record.passes += 1
+                record.streak += 1
+                if record.since_fail is not None:
+                    record.since_fail += 1
+            else:
+                record.streak = 0
+                record.since_fail = 0
+
+
+sampler = TrustSampler()
@@ -33,8 +33,13 @@ import sys
 import score.reddit_score
 import score.twitter_score
 import storage.store
+import storage.dedup
+import storage.indexing
+import storage.metrics_sink
 from apify_client import ApifyClient
 from neurons.queries import get_query, QueryType, QueryProvider
+from neurons import checkpoint, memory, metrics, profiling, scorestate, streaming, tracing, trust, verification
+from neurons.tracing import span
 
 
 # This function is responsible for setting up and parsing command-line arguments.
@@ -49,6 +54,25 @@ def get_config():
     # Adds override arguments for network and netuid.
     parser.add_argument( '--netuid', type = int, default = 1, help = "The chain subnet uid." )
     parser.add_argument( '--save_scoring', type = bool, default = False, help = "Write scoring debug data to csv files" )
+    parser.add_argument( '--scoring_flush_rounds', type = int, default = 30, help = "Upload buffered scoring metrics after this many rounds." )
+    parser.add_argument( '--scoring_flush_seconds', type = int, default = 3600, help = "Upload buffered scoring metrics at least this often." )
+    parser.add_argument( '--dedup_max_age_days', type = int, default = 30, help = "Days an already stored item id is remembered and skipped on upload." )
+    parser.add_argument( '--metrics_port', type = int, default = 9464, help = "Local port serving stage histograms in the Prometheus format, 0 disables it." )
+    parser.add_argument( '--trace_file', type = str, default = None, help = "JSONL file round spans are written to. Defaults to traces.jsonl in the logging directory, 'none' disables it." )
+    parser.add_argument( '--trace_max_mb', type = int, default = 50, help = "Size at which the trace file is rotated." )
+    parser.add_argument( '--streaming_query', action = 'store_true', help = "Check each miner response as it arrives and stop waiting for slow miners once a quorum has answered." )
+    parser.add_argument( '--query_quorum', type = float, default = 0.8, help = "Fraction of the queried miners that must answer before a streaming query cuts off the rest." )
+    parser.add_argument( '--query_grace', type = float, default = 5, help = "Seconds the remaining miners still get once the quorum has answered." )
+    parser.add_argument( '--verification_linger', type = float, default = 0, help = "Seconds spot check jobs wait for jobs of other rounds to be fetched with. Jobs queued during a fetch are always batched." )
+    parser.add_argument( '--verification_cache_minutes', type = float, default = 10, help = "Minutes fetched spot check items are reused across rounds, 0 disables it." )
+    parser.add_argument( '--verification_timeout', type = float, default = 150, help = "Seconds a round waits for its spot checks. If they are not fetched in time, no miner is zeroed by the spot checks of that round." )
+    parser.add_argument( '--twitter_score_share', type = float, default = 0.5, help = "Share of the twitter score average in the weights set on chain." )
+    parser.add_argument( '--reddit_score_share', type = float, default = 0.5, help = "Share of the reddit score average in the weights set on chain." )
+    parser.add_argument( '--spot_check_detection', type = float, default = 0.99, help = "Probability with which a miner fabricating --spot_check_cheat_fraction of its items is caught within --spot_check_window rounds, however trusted. 1 checks every miner every round." )
+    parser.add_argument( '--spot_check_window', type = int, default = 30, help = "Rounds a miner is queried in that the spot check detection guarantee is given for." )
+    parser.add_argument( '--spot_check_cheat_fraction', type = float, default = 0.5, help = "Fraction of fabricated items the spot check detection guarantee is given for." )
+    profiling.add_args(parser)
+    memory.add_args(parser)
 
     # Adds subtensor specific arguments i.e. --subtensor.chain_endpoint ... --subtensor.network ...
     bt.subtensor.add_args(parser)
@@ -98,7 +122,7 @@ def main( config ):
 
     # Check access to Apify
     try:
-        client = ApifyClient(os.getenv("APIFY_API_KEY"))
+        client = ApifyClient(os.getenv("APIFY_API_KEY"), api_url = os.getenv("APIFY_API_URL") or None)
         client.actors().list()
     except Exception as e:
         bt.logging.error(f"{e}")
@@ -107,7 +131,7 @@ def main( config ):
 
     # Check access to storage
     try:
-        storage.store.s3.Bucket('twitterscrapingbucket').Acl().owner
+        storage.store.get_client().head_bucket(Bucket = 'twitterscrapingbucket')
     except Exception as e:
         bt.logging.error(f"{e}")
         bt.logging.error(f"Unable to connect to wasabi storage. Check your dotenv file and make sure your WASABI_ACCESS_KEY_ID, WASABI_ACCESS_KEY, and INDEXING_API_KEY are set correctly.")
@@ -147,33 +171,90 @@ def main( config ):
     redditAlpha = 0.7
     twitterAlpha = 0.7
 
-    # Restore weights, or initialize weights for each miner to 0.
-    scores_file = "scores.pt"
-    try:
-        scores = torch.load(scores_file)
-        bt.logging.info(f"Loaded scores from save file: {scores}")
-    except:
-        scores = torch.zeros_like(metagraph.S, dtype=torch.float32)
-        bt.logging.info(f"Initialized all scores to 0")
+    # Each platform keeps its own score average, the weights mix them, see neurons/scorestate.py.
+    score_state = scorestate.ScoreState({'twitter': twitterAlpha, 'reddit': redditAlpha}, mix = {'twitter': config.twitter_score_share, 'reddit': config.reddit_score_share})
 
+    # Scores, their per-platform averages, the last weights set and round counters are checkpointed in the
+    # validator directory, see neurons/checkpoint.py.
+    state_store = checkpoint.CheckpointStore(os.path.join(config.full_path, "validator_state"))
+    state_meta = {}
+    last_weight_uids, last_weights = torch.zeros(0, dtype=torch.long), torch.zeros(0)
+    # Restore weights, or initialize weights for each miner to 0.
+    restored = state_store.load()
+    if restored is not None:
+        tensors, state_meta = restored
+        score_state.load_state_dict(tensors, state_meta)
+        last_weight_uids, last_weights = tensors.get('last_weight_uids', last_weight_uids), tensors.get('last_weights', last_weights)
+        bt.logging.info(f"Loaded scores from {state_store.path}: {score_state.scores()}")
+    else:
+        # Earlier versions saved the combined scores to scores.pt in the working directory.
+        scores_file = "scores.pt"
+        try:
+            scores = torch.load(scores_file)
+            score_state.seed(scores)
+            bt.logging.info(f"Loaded scores from save file: {scores}")
+        except Exception:
+            score_state.resize(len(metagraph.S))
+            bt.logging.info(f"Initialized all scores to 0")
+    score_state.sync(metagraph.hotkeys)
+    rounds = {'twitter': 0, 'reddit': 0, **state_meta.get('rounds', {})}
+
+
+    # Ids already uploaded in previous rounds are not stored again.
+    dedup_index = storage.dedup.DedupIndex(os.path.join(config.full_path, "stored_ids.sqlite"), max_age_seconds = config.dedup_max_age_days * 24 * 3600)
+    bt.logging.info(f"Dedup index: {dedup_index.stats()}")
+
+    # Indexing rows are batched and sent from a background thread.
+    indexing_client = storage.indexing.IndexingClient()
+
+    # Scoring metrics are spooled locally and uploaded as one compressed object per block range.
+    scoring_sinks = {
+        type: storage.metrics_sink.ScoringMetricsSink(type, os.path.join(config.full_path, "scoring_spool"), max_rounds = config.scoring_flush_rounds, max_age_seconds = config.scoring_flush_seconds)
+        for type in ['twitter', 'reddit']
+    }
+
+    # Spot checks of every round are batched and fetched by one long-lived service, see neurons/verification.py.
+    verification.service.configure(linger = config.verification_linger, cache_seconds = config.verification_cache_minutes * 60, timeout = config.verification_timeout)
+    # Miners with a clean spot check history are checked less often, new and suspicious ones more, see neurons/trust.py.
+    trust.sampler.configure(detection = config.spot_check_detection, window = config.spot_check_window, cheat_fraction = config.spot_check_cheat_fraction)
+    bt.logging.info(f"Trusted miners are spot checked with probability >= {trust.sampler.floor:.3f}")
+
+    # Stage timings feed the histograms on the metrics endpoint and the rolling trace file.
+    trace_file = config.trace_file or os.path.join(config.full_path, "traces.jsonl")
+    tracing.configure(service = 'validator', path = None if trace_file == 'none' else trace_file, max_bytes = config.trace_max_mb * 2**20)
+    if config.metrics_port:
+        metrics.start_http_server(config.metrics_port)
+    # Rounds are profiled on demand, see neurons/profiling.py.
+    profiler = profiling.from_config('validator', config)
+
+    # RSS trend and the size of the structures that live for the whole run.
+    memory_monitor = memory.from_config('validator', config)
+    memory_monitor.track('indexing_buffer', lambda: len(indexing_client.buffer))
+    for type, sink in scoring_sinks.items():
+        memory_monitor.track(f'{type}_scoring_spool_rounds', lambda sink = sink: sink.rounds)
+    memory_monitor.track('verification_cache', lambda: len(verification.service.cache))
+    memory_monitor.track('trust_records', lambda: len(trust.sampler.records))
+    if config.memory_interval:
+        memory_monitor.start()
 
     curr_block = subtensor.block
 
     # all nodes with more than 1e3 total stake are set to 0 (sets validators weights to 0)
 
     # set all nodes without ips set to 0
-    scores = scores * torch.Tensor([metagraph.neurons[uid].axon_info.ip != '0.0.0.0' for uid in metagraph.uids])
+    score_state.mask(torch.Tensor([metagraph.neurons[uid].axon_info.ip != '0.0.0.0' for uid in metagraph.uids]))
     step = 0
     
     # Fetch protocol version for inclusion in queries
     my_version = scraping.utils.get_my_version()
 
-    bt.logging.info(f"Initial scores: {scores}")
+    bt.logging.info(f"Initial scores: {score_state.scores()}")
     bt.logging.info("Starting validator loop.")
     
     total_dendrites_per_query = 25
     minimum_dendrites_per_query = 3
-    last_updated_block = 0 #curr_block - (curr_block % 100)
+    # Restored, so that a restart doesn't set weights again before the interval is over.
+    last_updated_block = state_meta.get('last_updated_block', 0) #curr_block - (curr_block % 100)
     last_reset_weights_block = curr_block
 
 
@@ -187,16 +268,11 @@ def main( config ):
         # If the metagraph has changed, update the weights.
         # Get the uids of all miners in the network.
         uids = metagraph.uids.tolist()
-        # If there are more uids than scores, add more weights.
-        if len(uids) > len(scores):
-            bt.logging.trace("Adding more weights")
-            size_difference = len(uids) - len(scores)
-            new_scores = torch.zeros(size_difference, dtype=torch.float32)
-            scores = torch.cat((scores, new_scores))
-            del new_scores
+        # New uids start at 0, uids registered to a new hotkey start over.
+        score_state.sync(metagraph.hotkeys)
         # If there are less uids than scores, remove some weights.
         queryable_uids = (metagraph.total_stake >= 0)
-        bt.logging.info(f"queryable_uids:{queryable_uids}")
+        bt.logging.trace(f"queryable_uids:{queryable_uids}")
         
         # Remove the weights of miners that are not queryable.
         queryable_uids = queryable_uids * torch.Tensor([metagraph.neurons[uid].axon_info.ip != '0.0.0.0' for uid in uids])
@@ -218,192 +294,237 @@ def main( config ):
         # zip uids and queryable_uids, filter only the uids that are queryable, unzip, and get the uids
         zipped_uids = list(zip(uids, queryable_uids))
         filtered_uids = list(zip(*filter(lambda x: x[1], zipped_uids)))[0]
-        bt.logging.info(f"filtered_uids:{filtered_uids}")
+        bt.logging.trace(f"filtered_uids:{filtered_uids}")
         dendrites_to_query = random.sample( filtered_uids, min( dendrites_per_query, len(filtered_uids) ) )
         bt.logging.info(f"dendrites_to_query:{dendrites_to_query}")
+        # Spot check history is kept per uid and hotkey, a re-registered uid starts over.
+        miners = [(uid, metagraph.hotkeys[uid]) for uid in dendrites_to_query]
         
         # every 2 minutes, query the miners
         try:
             # Filter metagraph.axons by indices saved in dendrites_to_query list
             filtered_axons = [metagraph.axons[i] for i in dendrites_to_query]
-            bt.logging.info(f"filtered_axons: {filtered_axons}")
+            bt.logging.trace(f"filtered_axons: {filtered_axons}")
+            bt.logging.info(f"Querying {len(filtered_axons)} of {len(filtered_uids)} queryable miners")
             # Broadcast a GET_DATA query to filtered miners on the network.
 
             # * every 10 minutes, query the miners for twitter data
             if step % 4 == 2:
                 search_key = random_line()
-                bt.logging.info(f"\033[92m 𝕏 ⏩ Sending tweeter query ({search_key}). \033[0m")
-                responses = dendrite.query(
-                    filtered_axons,
-                    # Construct a scraping query.
-                    scraping.protocol.TwitterScrap(scrap_input = {"search_key" : [search_key]}, version = my_version), # Construct a scraping query.
-                    # All responses have the deserialize function called on them before returning.
-                    deserialize = True, 
-                    timeout = 60
-                )
-
-                # Update score
-                new_scores = []
-                try:
-                    if(len(responses) > 0 and responses is not None):
-                        scoring_metrics = score.twitter_score.calculateScore(responses = responses, tag = search_key)
-                        for metric in scoring_metrics:
-                            bt.logging.info(f'{metric} = {scoring_metrics[metric]}')
-
-                        new_scores = scoring_metrics["normalized_scores"]
-                        bt.logging.info(f"✅ new_scores: {new_scores}")
-                        scoring_metrics["uid"] = dendrites_to_query
-                        scoring_metrics['search_key'] = search_key
-                        scoring_metrics['validator_hotkey'] = metagraph.hotkeys[my_subnet_uid]
-                        scoring_metrics['block'] = subtensor.block
-
-                        if config.save_scoring:
-                            dir = f'twitter_block_{subtensor.block}'
-                            os.mkdir(dir)
-                            with open(f'{dir}/scoring.json', 'w') as output:
-                                json.dump(scoring_metrics, output)
-
-                            for idx, node in enumerate(dendrites_to_query):
-                                filename = f"{dir}/{search_key}_{node}.json"
-                                bt.logging.info(f"Writing results to: {filename}")
-                                with open(filename , "w") as write:
-                                    json.dump(responses[idx], write)
-
-                        storage.store.store_scoring_metrics(scoring_metrics, 'twitter')
+                with span('round', platform = 'twitter', search_key = search_key), profiler.unit('twitter'):
+                    bt.logging.info(f"\033[92m 𝕏 ⏩ Sending tweeter query ({search_key}). \033[0m")
+                    ingest = None
+                    with span('query', miners = len(filtered_axons)):
+                        if config.streaming_query:
+                            # Responses are checked as they arrive, scoring finishes the round with what arrived.
+                            ingest = score.twitter_score.RoundIngest(len(filtered_axons), tag = search_key, miners = miners)
+                            streaming.query(dendrite, filtered_axons, scraping.protocol.TwitterScrap(scrap_input = {"search_key" : [search_key]}, version = my_version),
+                                            on_response = ingest.add, timeout = 60, quorum = config.query_quorum, grace = config.query_grace)
+                            responses = ingest.responses
+                        else:
+                            responses = dendrite.query(
+                                filtered_axons,
+                                # Construct a scraping query.
+                                scraping.protocol.TwitterScrap(scrap_input = {"search_key" : [search_key]}, version = my_version), # Construct a scraping query.
+                                # All responses have the deserialize function called on them before returning.
+                                deserialize = True, 
+                                timeout = 60
+                            )
+
+                    # Update score
+                    new_scores = []
+                    try:
+                        if(len(responses) > 0 and responses is not None):
+                            with span('score'):
+                                scoring_metrics = score.twitter_score.calculateScore(responses = responses, tag = search_key, ingest = ingest, miners = miners)
+                            for metric in scoring_metrics:
+                                bt.logging.info(f'{metric} = {scoring_metrics[metric]}')
+
+                            new_scores = scoring_metrics["normalized_scores"]
+                            bt.logging.info(f"✅ new_scores: {new_scores}")
+                            scoring_metrics["uid"] = dendrites_to_query
+                            scoring_metrics['search_key'] = search_key
+                            scoring_metrics['validator_hotkey'] = metagraph.hotkeys[my_subnet_uid]
+                            scoring_metrics['block'] = subtensor.block
+
+                            if config.save_scoring:
+                                dir = f'twitter_block_{subtensor.block}'
+                                os.mkdir(dir)
+                                with open(f'{dir}/scoring.json', 'w') as output:
+                                    json.dump(scoring_metrics, output)
+
+                                for idx, node in enumerate(dendrites_to_query):
+                                    filename = f"{dir}/{search_key}_{node}.json"
+                                    bt.logging.info(f"Writing results to: {filename}")
+                                    with open(filename , "w") as write:
+                                        json.dump(responses[idx], write)
+
+                            with span('scoring_metrics'):
+                                scoring_sinks['twitter'].append(scoring_metrics)
 
                         
-                except Exception as e:
-                    bt.logging.error(f"❌ Error in twitterScore: {e}")
-                for i, score_i in enumerate(new_scores):
-                    scores[dendrites_to_query[i]] = twitterAlpha * scores[dendrites_to_query[i]] + (1 - twitterAlpha) * score_i
-                bt.logging.info(f"\033[92m ✓ Updated Scores: {scores} \033[0m")
+                    except Exception as e:
+                        bt.logging.error(f"❌ Error in twitterScore: {e}")
+                    with span('update_scores'):
+                        score_state.update('twitter', dendrites_to_query, new_scores)
+                        rounds['twitter'] += 1
+                    bt.logging.trace(f"Updated twitter scores: {score_state.platform('twitter')}")
+                    bt.logging.info(f"\033[92m ✓ Updated Scores for {len(new_scores)} miners \033[0m")
                 
-                try:
-                    if len(responses) > 0:
-                        indexing_result = storage.store.twitter_store(data = responses, search_keys=[search_key])
-                        bt.logging.info(f"\033[92m saving index info: {indexing_result} \033[0m")
-                    else:
-                        bt.logging.warning("\033[91m ⚠ No twitter data found in responses \033[0m")
-                except Exception as e:
-                    bt.logging.error(f"❌ Error in store_Twitter: {e}")
+                    try:
+                        if len(responses) > 0:
+                            with span('store'):
+                                indexing_result = storage.store.twitter_store(data = responses, search_keys=[search_key], dedup_index = dedup_index, indexing_client = indexing_client)
+                            bt.logging.info(f"\033[92m saving index info: {indexing_result} \033[0m")
+                        else:
+                            bt.logging.warning("\033[91m ⚠ No twitter data found in responses \033[0m")
+                    except Exception as e:
+                        bt.logging.error(f"❌ Error in store_Twitter: {e}")
+                    # Don't keep the round's payloads alive until the next query overwrites them.
+                    responses = scoring_metrics = None
 
                     
                         
-                current_block = subtensor.block
-                if current_block - last_updated_block > 100:
+                    current_block = subtensor.block
+                    if current_block - last_updated_block > 100:
                     
-                    weights = scores / torch.sum(scores)
-                    bt.logging.info(f"Setting weights: {weights}")
-                    # Miners with higher scores (or weights) receive a larger share of TAO rewards on this subnet.
-                    (
-                        processed_uids,
-                        processed_weights,
-                    ) = bt.utils.weight_utils.process_weights_for_netuid(
-                        uids=metagraph.uids,
-                        weights=weights,
-                        netuid=config.netuid,
-                        subtensor=subtensor
-                    )
-                    bt.logging.info(f"Processed weights: {processed_weights}")
-                    bt.logging.info(f"Processed uids: {processed_uids}")
-                    result = subtensor.set_weights(
-                        netuid = config.netuid, # Subnet to set weights on.
-                        wallet = wallet, # Wallet to sign set weights using hotkey.
-                        uids = processed_uids, # Uids of the miners to set weights for.
-                        weights = processed_weights, # Weights to set for the miners.
-                    )
-                    last_updated_block = current_block
-                    if result: bt.logging.success('✅ Successfully set weights.')
-                    else: bt.logging.error('Failed to set weights.')
+                        with span('set_weights'):
+                            scores = score_state.scores()
+                            weights = scores / torch.sum(scores)
+                            bt.logging.info(f"Setting weights: {weights}")
+                            # Miners with higher scores (or weights) receive a larger share of TAO rewards on this subnet.
+                            (
+                                processed_uids,
+                                processed_weights,
+                            ) = bt.utils.weight_utils.process_weights_for_netuid(
+                                uids=metagraph.uids,
+                                weights=weights,
+                                netuid=config.netuid,
+                                subtensor=subtensor
+                            )
+                            bt.logging.info(f"Processed weights: {processed_weights}")
+                            bt.logging.info(f"Processed uids: {processed_uids}")
+                            result = subtensor.set_weights(
+                                netuid = config.netuid, # Subnet to set weights on.
+                                wallet = wallet, # Wallet to sign set weights using hotkey.
+                                uids = processed_uids, # Uids of the miners to set weights for.
+                                weights = processed_weights, # Weights to set for the miners.
+                            )
+                        last_updated_block = current_block
+                        if result:
+                            bt.logging.success('✅ Successfully set weights.')
+                            last_weight_uids, last_weights = torch.as_tensor(processed_uids, dtype=torch.long), torch.as_tensor(processed_weights, dtype=torch.float32)
+                        else: bt.logging.error('Failed to set weights.')
 
             # Periodically update the weights on the Bittensor blockchain.
             if step % 4 == 0:
-                bt.logging.info(f"\033[92m ᕕ ⏩ Sending reddit query. \033[0m")
                 search_key = random_line()
-                responses = dendrite.query(
-                    filtered_axons,
-                    # Construct a scraping query.
-                    scraping.protocol.RedditScrap(scrap_input = {"search_key" : [search_key]}, version = my_version), # Construct a scraping query.
-                    # All responses have the deserialize function called on them before returning.
-                    deserialize = True,
-                    timeout = 60 
-                )
-
-                # Update score
-                new_scores = []
-                try:
-                    if(len(responses) > 0 and responses is not None):
-                        scoring_metrics = score.reddit_score.calculateScore(responses = responses, tag = search_key)
-                        for metric in scoring_metrics:
-                            bt.logging.info(f'{metric} = {scoring_metrics[metric]}')
-
-                        new_scores = scoring_metrics["normalized_scores"]
-                        bt.logging.info(f"✅ new_scores: {new_scores}")
-                        scoring_metrics["uid"] = dendrites_to_query
-                        scoring_metrics['search_key'] = search_key
-                        scoring_metrics['validator_hotkey'] = metagraph.hotkeys[my_subnet_uid]
-                        scoring_metrics['block'] = subtensor.block
-
-                        if config.save_scoring:
-                            dir = f'reddit_block_{subtensor.block}'
-                            os.mkdir(dir)
-                            with open(f'{dir}/scoring.json', 'w') as output:
-                                json.dump(scoring_metrics, output)
-
-                            for idx, node in enumerate(dendrites_to_query):
-                                filename = f"{dir}/{search_key}_{node}.json"
-                                bt.logging.info(f"Writing results to: {filename}")
-                                with open(filename , "w") as write:
-                                    json.dump(responses[idx], write)
-
-                        storage.store.store_scoring_metrics(scoring_metrics, 'reddit')
-
-
-                except Exception as e:
-                    bt.logging.error(f"❌ Error in redditScore: {e}")
-                    traceback.print_exc()
-
-                for i, score_i in enumerate(new_scores):
-                    scores[dendrites_to_query[i]] = redditAlpha * scores[dendrites_to_query[i]] + (1 - redditAlpha) * score_i
-                bt.logging.info(f"\033[92m ✓ Updated Scores: {scores} \033[0m")
-                try:
-                    if len(responses) > 0:
-                        indexing_result = storage.store.reddit_store(data = responses, search_keys=[search_key])
-                        bt.logging.info(f"\033[92m saving index info: {indexing_result} \033[0m")
-                    else:
-                        bt.logging.warning("\033[91m ⚠ No reddit data found in responses \033[0m")
-                except Exception as e:
-                    bt.logging.error(f"❌ Error in store_reddit: {e}")            
+                with span('round', platform = 'reddit', search_key = search_key), profiler.unit('reddit'):
+                    bt.logging.info(f"\033[92m ᕕ ⏩ Sending reddit query. \033[0m")
+                    ingest = None
+                    with span('query', miners = len(filtered_axons)):
+                        if config.streaming_query:
+                            # Responses are checked as they arrive, scoring finishes the round with what arrived.
+                            ingest = score.reddit_score.RoundIngest(len(filtered_axons), tag = search_key, miners = miners)
+                            streaming.query(dendrite, filtered_axons, scraping.protocol.RedditScrap(scrap_input = {"search_key" : [search_key]}, version = my_version),
+                                            on_response = ingest.add, timeout = 60, quorum = config.query_quorum, grace = config.query_grace)
+                            responses = ingest.responses
+                        else:
+                            responses = dendrite.query(
+                                filtered_axons,
+                                # Construct a scraping query.
+                                scraping.protocol.RedditScrap(scrap_input = {"search_key" : [search_key]}, version = my_version), # Construct a scraping query.
+                                # All responses have the deserialize function called on them before returning.
+                                deserialize = True,
+                                timeout = 60 
+                            )
+
+                    # Update score
+                    new_scores = []
+                    try:
+                        if(len(responses) > 0 and responses is not None):
+                            with span('score'):
+                                scoring_metrics = score.reddit_score.calculateScore(responses = responses, tag = search_key, ingest = ingest, miners = miners)
+                            for metric in scoring_metrics:
+                                bt.logging.info(f'{metric} = {scoring_metrics[metric]}')
+
+                            new_scores = scoring_metrics["normalized_scores"]
+                            bt.logging.info(f"✅ new_scores: {new_scores}")
+                            scoring_metrics["uid"] = dendrites_to_query
+                            scoring_metrics['search_key'] = search_key
+                            scoring_metrics['validator_hotkey'] = metagraph.hotkeys[my_subnet_uid]
+                            scoring_metrics['block'] = subtensor.block
+
+                            if config.save_scoring:
+                                dir = f'reddit_block_{subtensor.block}'
+                                os.mkdir(dir)
+                                with open(f'{dir}/scoring.json', 'w') as output:
+                                    json.dump(scoring_metrics, output)
+
+                                for idx, node in enumerate(dendrites_to_query):
+                                    filename = f"{dir}/{search_key}_{node}.json"
+                                    bt.logging.info(f"Writing results to: {filename}")
+                                    with open(filename , "w") as write:
+                                        json.dump(responses[idx], write)
+
+                            with span('scoring_metrics'):
+                                scoring_sinks['reddit'].append(scoring_metrics)
+
+
+                    except Exception as e:
+                        bt.logging.error(f"❌ Error in redditScore: {e}")
+                        traceback.print_exc()
+
+                    with span('update_scores'):
+                        score_state.update('reddit', dendrites_to_query, new_scores)
+                        rounds['reddit'] += 1
+                    bt.logging.trace(f"Updated reddit scores: {score_state.platform('reddit')}")
+                    bt.logging.info(f"\033[92m ✓ Updated Scores for {len(new_scores)} miners \033[0m")
+                    try:
+                        if len(responses) > 0:
+                            with span('store'):
+                                indexing_result = storage.store.reddit_store(data = responses, search_keys=[search_key], dedup_index = dedup_index, indexing_client = indexing_client)
+                            bt.logging.info(f"\033[92m saving index info: {indexing_result} \033[0m")
+                        else:
+                            bt.logging.warning("\033[91m ⚠ No reddit data found in responses \033[0m")
+                    except Exception as e:
+                        bt.logging.error(f"❌ Error in store_reddit: {e}")            
+                    # Don't keep the round's payloads alive until the next query overwrites them.
+                    responses = scoring_metrics = None
                 
-                # If the metagraph has changed, update the weights.
-                # Adjust the scores based on responses from miners.
-                # weights = torch.nn.functional.normalize(scores, p=1.0, dim=0)
-                current_block = subtensor.block
-                if current_block - last_updated_block > 100:
+                    # If the metagraph has changed, update the weights.
+                    # Adjust the scores based on responses from miners.
+                    # weights = torch.nn.functional.normalize(scores, p=1.0, dim=0)
+                    current_block = subtensor.block
+                    if current_block - last_updated_block > 100:
                     
-                    weights = scores / torch.sum(scores)
-                    bt.logging.info(f"Setting weights: {weights}")
-                    # Miners with higher scores (or weights) receive a larger share of TAO rewards on this subnet.
-                    (
-                        processed_uids,
-                        processed_weights,
-                    ) = bt.utils.weight_utils.process_weights_for_netuid(
-                        uids=metagraph.uids,
-                        weights=weights,
-                        netuid=config.netuid,
-                        subtensor=subtensor
-                    )
-                    bt.logging.info(f"Processed weights: {processed_weights}")
-                    bt.logging.info(f"Processed uids: {processed_uids}")
-                    result = subtensor.set_weights(
-                        netuid = config.netuid, # Subnet to set weights on.
-                        wallet = wallet, # Wallet to sign set weights using hotkey.
-                        uids = processed_uids, # Uids of the miners to set weights for.
-                        weights = processed_weights, # Weights to set for the miners.
-                    )
-                    last_updated_block = current_block
-                    if result: bt.logging.success('✅ Successfully set weights.')
-                    else: bt.logging.error('Failed to set weights.')
+                        with span('set_weights'):
+                            scores = score_state.scores()
+                            weights = scores / torch.sum(scores)
+                            bt.logging.info(f"Setting weights: {weights}")
+                            # Miners with higher scores (or weights) receive a larger share of TAO rewards on this subnet.
+                            (
+                                processed_uids,
+                                processed_weights,
+                            ) = bt.utils.weight_utils.process_weights_for_netuid(
+                                uids=metagraph.uids,
+                                weights=weights,
+                                netuid=config.netuid,
+                                subtensor=subtensor
+                            )
+                            bt.logging.info(f"Processed weights: {processed_weights}")
+                            bt.logging.info(f"Processed uids: {processed_uids}")
+                            result = subtensor.set_weights(
+                                netuid = config.netuid, # Subnet to set weights on.
+                                wallet = wallet, # Wallet to sign set weights using hotkey.
+                                uids = processed_uids, # Uids of the miners to set weights for.
+                                weights = processed_weights, # Weights to set for the miners.
+                            )
+                        last_updated_block = current_block
+                        if result:
+                            bt.logging.success('✅ Successfully set weights.')
+                            last_weight_uids, last_weights = torch.as_tensor(processed_uids, dtype=torch.long), torch.as_tensor(processed_weights, dtype=torch.float32)
+                        else: bt.logging.error('Failed to set weights.')
 
             step += 1
 
@@ -413,17 +534,30 @@ def main( config ):
 
                 
                 # set all nodes without ips set to 0
-                scores = scores * torch.Tensor([metagraph.neurons[uid].axon_info.ip != '0.0.0.0' for uid in metagraph.uids])
+                score_state.mask(torch.Tensor([metagraph.neurons[uid].axon_info.ip != '0.0.0.0' for uid in metagraph.uids]))
+
+                pruned = dedup_index.prune()
+                bt.logging.info(f"Pruned {pruned} ids from dedup index: {dedup_index.stats()}")
 
             # Resync our local state with the latest state from the blockchain.
             metagraph = subtensor.metagraph(config.netuid)
-            torch.save(scores, scores_file)
-            bt.logging.info(f"Saved weights to \"{scores_file}\"")
+            with span('save_scores'):
+                tensors, meta = score_state.state_dict()
+                tensors.update(scores = score_state.scores(), last_weight_uids = last_weight_uids, last_weights = last_weights)
+                meta.update(rounds = rounds, last_updated_block = last_updated_block)
+                # Nothing is written in loops that changed nothing.
+                saved = state_store.save(tensors, meta)
+            if saved:
+                bt.logging.info(f"Saved weights to \"{state_store.path}\"")
             
             # Check for auto update
             if config.auto_update != "no":
                 if scraping.utils.update_repository(config.auto_update):
                     bt.logging.success("🔁 Repository updated, exiting validator")
+                    indexing_client.close()
+                    for sink in scoring_sinks.values(): sink.close()
+                    verification.service.close()
+                    tracing.tracer.close()
                     exit(0)
             # Sleep for a duration equivalent to the block time (i.e., time between successive blocks).
             time.sleep(bt.__blocktime__ * 10)
@@ -438,6 +572,10 @@ def main( config ):
         # If the user interrupts the program, gracefully exit.
         except KeyboardInterrupt:
             bt.logging.success("Keyboard interrupt detected. Exiting validator.")
+            indexing_client.close()
+            for sink in scoring_sinks.values(): sink.close()
+            verification.service.close()
+            tracing.tracer.close()
             exit()
         
 # The main function parses the configuration and runs the validator.
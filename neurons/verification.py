@@ -0,0 +1,256 @@
+"""
+The MIT License (MIT)
+Copyright © 2023 Chris Wilson
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# A long-lived verification service shared by every round of the validator.
+#
+# Spot check fetches used to be made by the scoring call that needed them, one small batch per round. Here each
+# provider ('twitter', 'reddit') has a worker thread that takes the jobs of all rounds queued while its previous
+# fetch ran (and optionally those arriving within `linger` seconds) into one fetch, skips keys another job already
+# has in flight, and answers keys fetched recently from a cache. Scoring code gets a Future and joins it when it
+# compares its samples.
+#
+#   verification.service.register('reddit', fetch_posts, request_key = lambda id: id, item_key = lambda post: post['id'])
+#   future = verification.service.submit('reddit', ['t3_17mhoqv'])
+#   posts = verification.service.result(future)
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+import bittensor as bt
+from neurons import metrics, tracing
+
+KEYS = metrics.counter('validator_verification_keys_total', "Spot check keys by provider and where their result came from.", ['provider', 'source'])
+TIMEOUTS = metrics.counter('validator_verification_timeouts_total', "Spot check jobs given up on, by provider.", ['provider'])
+BATCH_JOBS = metrics.histogram('validator_verification_batch_jobs', "Jobs served by one verification fetch.", ['provider'], buckets = (1, 2, 3, 4, 6, 8, 12, 16))
+
+
+class _Provider:
+    def __init__(self, name: str, fetch, request_key, item_key):
+        self.name = name
+        self.fetch = fetch
+        self.request_key = request_key
+        self.item_key = item_key
+        self.jobs = queue.Queue()
+        self.serving = []
+        self.thread = None
+
+
+def _settle(future: Future, result = None, error: Exception = None):
+    # close() may have failed the future already.
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class VerificationService:
+    """
+    Batches spot check fetches across rounds, one worker thread per provider.
+
+    A provider is a `fetch(requests) -> items` function together with `request_key(request)` and `item_key(item)`,
+    which map a request (e.g. a tweet url) and a fetched item to the same key (the tweet id). Results are cached by
+    key for `cache_seconds`; keys that were not found are not cached.
+    """
+
+    def __init__(self, linger: float = 0.0, max_batch: int = 100, cache_seconds: float = 600, cache_size: int = 20000, timeout: float = 150):
+        """
+        Args:
+            linger (float): Seconds a worker waits for more jobs after the first one before fetching.
+            max_batch (int): Requests fetched together at most; more wait for the next fetch.
+            cache_seconds (float): Seconds fetched items are reused for, 0 disables the cache.
+            cache_size (int): Keys cached at most, the oldest are dropped beyond that.
+            timeout (float): Seconds result() waits for a job. The default leaves a twitter batch room for a few
+                45 second actor runs, and for a fetch of other rounds queued before it.
+        """
+        self.linger = linger
+        self.max_batch = max_batch
+        self.cache_seconds = cache_seconds
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.providers = {}
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def configure(self, linger: float = None, cache_seconds: float = None, timeout: float = None):
+        if linger is not None:
+            self.linger = linger
+        if cache_seconds is not None:
+            self.cache_seconds = cache_seconds
+        if timeout is not None:
+            self.timeout = timeout
+        return self
+
+    def register(self, provider: str, fetch, request_key = lambda request: request, item_key = lambda item: item['id']):
+        """
+        Registers (or replaces) the fetch function of a provider. Its worker starts with the first job.
+        """
+        with self.lock:
+            existing = self.providers.get(provider)
+            if existing is not None:
+                existing.fetch, existing.request_key, existing.item_key = fetch, request_key, item_key
+            else:
+                self.providers[provider] = _Provider(provider, fetch, request_key, item_key)
+
+    def submit(self, provider: str, requests: list) -> Future:
+        """
+        Queues the requests of one round. The future resolves to the fetched items for them, [] if the fetch failed.
+        """
+        future = Future()
+        with self.lock:
+            entry = self.providers[provider]
+            if entry.thread is None:
+                entry.thread = threading.Thread(target = self._run, args = (entry,), name = f"{provider}-verification", daemon = True)
+                entry.thread.start()
+        entry.jobs.put((list(requests), future))
+        return future
+
+    def result(self, future: Future, provider: str = '') -> list:
+        """
+        Waits up to `timeout` seconds for a submitted job. A job that times out or failed gives [], which leaves its
+        samples unverified rather than failed; a late fetch still fills the cache for later rounds.
+        """
+        try:
+            return future.result(timeout = self.timeout)
+        except FutureTimeout:
+            TIMEOUTS.inc(provider = provider)
+            bt.logging.warning(f"{provider} spot checks not fetched within {self.timeout}s, leaving them unverified")
+        except Exception as e:
+            bt.logging.warning(f"{provider} spot checks failed, leaving them unverified: {e}")
+        return []
+
+    def _cached(self, key, now: float):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        fetched_at, items = entry
+        if now - fetched_at > self.cache_seconds:
+            del self.cache[key]
+            return None
+        return items
+
+    def _collect(self, provider: _Provider) -> list:
+        jobs = [provider.jobs.get()]
+        requests = len(jobs[0][0])
+        deadline = time.monotonic() + self.linger
+        while requests < self.max_batch:
+            # Jobs queued while the previous fetch ran are always taken along, waiting for more is up to linger.
+            wait = deadline - time.monotonic()
+            try:
+                job = provider.jobs.get(timeout = wait) if wait > 0 else provider.jobs.get_nowait()
+            except queue.Empty:
+                break
+            jobs.append(job)
+            requests += len(job[0])
+        return jobs
+
+    def _run(self, provider: _Provider):
+        while not self.stopped.is_set():
+            jobs = self._collect(provider)
+            with self.lock:
+                provider.serving = jobs
+            if self.stopped.is_set():
+                self._fail(jobs)
+                break
+            try:
+                self._serve(provider, jobs)
+            except Exception as e:
+                bt.logging.error(f"❌ Error in {provider.name} verification: {e}")
+                for _, future in jobs:
+                    _settle(future, [])
+            with self.lock:
+                provider.serving = []
+
+    def _serve(self, provider: _Provider, jobs: list):
+        now = time.monotonic()
+        found, to_fetch, fetching = {}, [], set()
+        with self.lock:
+            for requests, _ in jobs:
+                for request in requests:
+                    key = provider.request_key(request)
+                    if key in found or key in fetching:
+                        KEYS.inc(provider = provider.name, source = 'shared')
+                        continue
+                    items = self._cached(key, now) if self.cache_seconds > 0 else None
+                    if items is not None:
+                        found[key] = items
+                        KEYS.inc(provider = provider.name, source = 'cached')
+                    else:
+                        fetching.add(key)
+                        to_fetch.append(request)
+                        KEYS.inc(provider = provider.name, source = 'fetched')
+
+        BATCH_JOBS.observe(len(jobs), provider = provider.name)
+        fetched = []
+        if to_fetch:
+            # The worker serves several rounds at once, the platform label stands in for their round spans.
+            with tracing.span('verify_batch', platform = provider.name, jobs = len(jobs), requests = len(to_fetch)):
+                fetched = provider.fetch(to_fetch) or []
+
+        by_key = {}
+        for item in fetched:
+            try:
+                by_key.setdefault(provider.item_key(item), []).append(item)
+            except Exception:
+                continue
+        with self.lock:
+            for key, items in by_key.items():
+                found[key] = items
+                if self.cache_seconds > 0:
+                    self.cache[key] = (now, items)
+                    self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last = False)
+
+        for requests, future in jobs:
+            items = []
+            for key in dict.fromkeys(provider.request_key(request) for request in requests):
+                items += found.get(key, [])
+            _settle(future, items)
+
+    def _fail(self, jobs: list):
+        for _, future in jobs:
+            _settle(future, error = RuntimeError("Verification service closed"))
+
+    def close(self):
+        """
+        Stops the workers. Jobs still queued or being fetched fail, so nothing waits on them.
+        """
+        self.stopped.set()
+        with self.lock:
+            providers = list(self.providers.values())
+        for provider in providers:
+            while True:
+                try:
+                    self._fail([provider.jobs.get_nowait()])
+                except queue.Empty:
+                    break
+            with self.lock:
+                serving = provider.serving
+            self._fail(serving)
+            # Wakes a worker waiting for its first job.
+            provider.jobs.put(([], Future()))
+
+
+service = VerificationService()
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("bittensor")
+
+from neurons.benchmarks.fake_indexing import FakeIndexingServer
+from neurons.storage.indexing import IndexingClient
+
+
+def make_client(server, **kwargs):
+    # A long flush interval keeps the background thread out of the way, the tests flush themselves.
+    return IndexingClient(api_key="key", base_url=server.url, flush_interval=3600, batch_size=10**6, retries=0, **kwargs)
+
+
+def add_rows(client, names):
+    for name in names:
+        client.add_row(name, "twitter", 1, ["tao"])
+
+
+def test_rejected_row_is_dropped_and_the_rest_are_sent():
+    with FakeIndexingServer(reject_files={"b"}) as server:
+        client = make_client(server)
+        add_rows(client, ["a", "b", "c"])
+        assert client.flush() == 2
+        assert [row["file_name"] for row in server.rows] == ["a", "c"]
+        assert client.stats()["pending"] == 0
+        assert client.stats()["dropped"] == 1
+        client.close()
+
+
+def test_client_errors_do_not_block_the_queue():
+    with FakeIndexingServer(failure_rate=1.0, failure_status=401) as server:
+        client = make_client(server)
+        add_rows(client, ["a", "b"])
+        assert client.flush() == 0
+        assert client.stats()["pending"] == 0
+        server.failure_rate = 0.0
+        add_rows(client, ["c"])
+        assert client.flush() == 1
+        assert [row["file_name"] for row in server.rows] == ["c"]
+        client.close()
+
+
+def test_server_errors_are_requeued_in_order():
+    with FakeIndexingServer(failure_rate=1.0, failure_status=503) as server:
+        client = make_client(server)
+        add_rows(client, ["a", "b"])
+        assert client.flush() == 0
+        assert client.stats()["pending"] == 2
+        server.failure_rate = 0.0
+        add_rows(client, ["c"])
+        assert client.flush() == 3
+        assert [row["file_name"] for row in server.rows] == ["a", "b", "c"]
+        client.close()
+
+
+def test_requeue_overflow_keeps_the_newest_rows():
+    with FakeIndexingServer(failure_rate=1.0, failure_status=503) as server:
+        client = make_client(server, max_buffer=3)
+        add_rows(client, ["a", "b", "c"])
+        assert client.flush() == 0
+        assert client.stats()["pending"] == 3
+        # Rows added while the flush was failing are kept over the oldest unsent ones.
+        client.buffer.clear()
+        add_rows(client, ["d", "e"])
+        client._requeue([{"file_name": name} for name in ["a", "b", "c"]])
+        assert [row["file_name"] for row in client.buffer] == ["c", "d", "e"]
+        assert client.stats()["dropped"] == 2
+        client.close()
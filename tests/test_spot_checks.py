@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("bittensor")
+pytest.importorskip("torch")
+
+from neurons import trust
+from neurons.benchmarks.lookups import RecordedRedditLookup, RecordedTwitterLookup
+from neurons.benchmarks.synthetic import generate_round
+from neurons.score import reddit_score, twitter_score
+
+PLATFORMS = [
+    ("twitter", twitter_score, "twitter_query", RecordedTwitterLookup),
+    ("reddit", reddit_score, "reddit_query", RecordedRedditLookup),
+]
+
+TRUSTED = 3
+
+
+@pytest.fixture
+def miners(monkeypatch):
+    # Without a floor or half life, trusted miners are never checked.
+    sampler = trust.TrustSampler(detection=0.0, half_life=0)
+    monkeypatch.setattr(trust, "sampler", sampler)
+    miners = [(uid, f"hotkey-{uid}") for uid in range(2 * TRUSTED)]
+    for miner in miners[:TRUSTED]:
+        for _ in range(sampler.min_history):
+            sampler.record(miner, True)
+    return miners
+
+
+def score_round(monkeypatch, platform, module, query, lookup, miners, seed, found=True, tampered=()):
+    generated = generate_round(platform, miners=len(miners), items_per_miner=20, fake_ratio=0.0,
+                               relevant_ratio=1.0, empty_ratio=0.0, seed=seed)
+    for i in tampered:
+        for item in generated["responses"][i]:
+            item["text"] = item["text"] + " tampered"
+    monkeypatch.setattr(module, query, lookup(generated["truth"] if found else []))
+    return module.calculateScore(generated["responses"], tag="bitcoin", miners=miners)
+
+
+@pytest.mark.parametrize("platform,module,query,lookup", PLATFORMS)
+def test_unverified_round_scores_no_miner_down(monkeypatch, miners, platform, module, query, lookup):
+    result = score_round(monkeypatch, platform, module, query, lookup, miners, seed=1, found=False)
+    assert all(correct == 1 for correct in result["correct"])
+    assert all(score > 0 for score in result["filtered_scores"])
+
+
+@pytest.mark.parametrize("platform,module,query,lookup", PLATFORMS)
+def test_only_tampered_miners_are_zeroed(monkeypatch, miners, platform, module, query, lookup):
+    result = score_round(monkeypatch, platform, module, query, lookup, miners, seed=2, tampered=[len(miners) - 1])
+    assert result["filtered_scores"][-1] == 0
+    assert all(score > 0 for score in result["filtered_scores"][:-1])